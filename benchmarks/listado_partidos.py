@@ -0,0 +1,97 @@
+'''
+Benchmark del listado de partidos: página con objetos del ORM (PartidoSQL con sus dos EquipoSQL)
+contra la proyección de columnas (PartidoResumen), recorriendo todas las páginas de una base
+SQLite temporal. Mide tiempo total y memoria reservada (pico de tracemalloc).
+
+Uso: python -m benchmarks.listado_partidos [cantidad_partidos ...]
+'''
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import EquipoSQL, PartidoSQL, Fases, Grupos, Paises
+from operations import (COLUMNAS_ESTADISTICAS_PARTIDO, TAMANO_PAGINA_MAXIMO, obtener_pagina_partidos,
+                        obtener_pagina_partidos_resumen)
+
+TAMANOS_POR_DEFECTO = [1_000, 10_000, 50_000]
+
+
+async def poblar(session: AsyncSession, cantidad_partidos: int, semilla: int = 2024) -> None:
+    rng = random.Random(semilla)
+    paises, grupos = list(Paises), list(Grupos)
+    await session.execute(insert(EquipoSQL), [
+        {"nombre": f"equipo {i:02d}", "pais": paises[i % len(paises)], "grupo": grupos[i % len(grupos)],
+         "logo_url": f"img/{i}.png", "puntos": 0, "tarjetas_amarillas": 0, "tarjetas_rojas": 0,
+         "tiros_esquina": 0, "tiros_libres": 0, "goles_a_favor": 0, "goles_en_contra": 0}
+        for i in range(1, 33)
+    ])
+    fases = list(Fases)
+    filas = []
+    for _ in range(cantidad_partidos):
+        local, visitante = rng.sample(range(1, 33), 2)
+        fila = {columna: rng.randint(0, 10) for columna in COLUMNAS_ESTADISTICAS_PARTIDO}
+        fila.update(equipo_local_id=local, equipo_visitante_id=visitante, fase=rng.choice(fases))
+        filas.append(fila)
+    await session.execute(insert(PartidoSQL), filas)
+    await session.commit()
+
+
+async def recorrer(fabrica_sesion, obtener_pagina) -> tuple:
+    """Lee todas las páginas en una sesión nueva; retorna (filas, segundos, pico de memoria en bytes)."""
+    async with fabrica_sesion() as session:
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        filas, cursor = 0, None
+        while True:
+            pagina = await obtener_pagina(session, TAMANO_PAGINA_MAXIMO, cursor)
+            # Se tocan los mismos atributos que la plantilla partidos.html
+            for partido in pagina.items:
+                _ = (partido.equipo_local.nombre, partido.equipo_visitante.logo_url, partido.goles_local)
+            filas += len(pagina.items)
+            cursor = pagina.siguiente
+            if cursor is None:
+                break
+        segundos = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return filas, segundos, pico
+
+
+async def medir(cantidad_partidos: int) -> None:
+    with tempfile.TemporaryDirectory() as carpeta:
+        motor = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(carpeta, 'bench.db')}")
+        async with motor.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        fabrica_sesion = sessionmaker(motor, class_=AsyncSession, expire_on_commit=False)
+        async with fabrica_sesion() as session:
+            await poblar(session, cantidad_partidos)
+
+        filas_orm, tiempo_orm, memoria_orm = await recorrer(fabrica_sesion, obtener_pagina_partidos)
+        filas_proy, tiempo_proy, memoria_proy = await recorrer(fabrica_sesion, obtener_pagina_partidos_resumen)
+        await motor.dispose()
+
+    if filas_orm != filas_proy:
+        raise SystemExit(f"Los listados no coinciden: {filas_orm} filas con ORM, {filas_proy} con proyección")
+    print(f"{cantidad_partidos:>10} | {tiempo_orm:>8.3f} | {tiempo_proy:>10.3f} | {tiempo_orm / tiempo_proy:>6.1f}x | "
+          f"{memoria_orm / 2**20:>8.1f} | {memoria_proy / 2**20:>10.1f}")
+
+
+def main(tamanos):
+    print(f"{'partidos':>10} | {'orm (s)':>8} | {'proyección':>10} | {'acel.':>7} | {'orm (MiB)':>8} | "
+          f"{'proy (MiB)':>10}")
+    for cantidad in tamanos:
+        asyncio.run(medir(cantidad))
+
+
+if __name__ == "__main__":
+    main([int(valor) for valor in sys.argv[1:]] or TAMANOS_POR_DEFECTO)
@@ -0,0 +1,119 @@
+'''
+Benchmark de las búsquedas por ID: sentencia construida en cada llamada (como antes) contra la
+sentencia preconstruida del registro (utils/sentencias.py).
+
+Mide dos cosas:
+  1. preparación: construir la sentencia y obtener su clave de caché, sin tocar la base;
+  2. búsquedas concurrentes: varias tareas con su propia sesión sobre una base SQLite temporal.
+
+Uso: python -m benchmarks.sentencias [tareas_concurrentes ...]
+'''
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker, selectinload
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import EquipoSQL, PartidoSQL, Fases, Grupos, Paises
+from operations import COLUMNAS_ESTADISTICAS_PARTIDO, _sql_equipo_activo_por_id, _sql_partido_por_id
+from utils.sentencias import SENTENCIAS
+
+CONCURRENCIAS_POR_DEFECTO = [1, 8, 32]
+BUSQUEDAS_POR_TAREA = 200
+REPETICIONES_PREPARACION = 20_000
+EQUIPOS, PARTIDOS = 32, 200
+
+
+def construir_equipo(equipo_id: int):
+    return select(EquipoSQL).where(EquipoSQL.id == equipo_id, EquipoSQL.esta_activo == True)
+
+
+def construir_partido(partido_id: int):
+    return (select(PartidoSQL).where(PartidoSQL.id == partido_id)
+            .options(selectinload(PartidoSQL.equipo_local), selectinload(PartidoSQL.equipo_visitante)))
+
+
+def medir_preparacion() -> None:
+    print(f"{'preparación':<24} | {'por llamada (µs)':>16}")
+    casos = [
+        ("equipo, construida", lambda i: construir_equipo(i)._generate_cache_key()),
+        ("equipo, registro", lambda i: _sql_equipo_activo_por_id()._generate_cache_key()),
+        ("partido, construida", lambda i: construir_partido(i)._generate_cache_key()),
+        ("partido, registro", lambda i: _sql_partido_por_id()._generate_cache_key()),
+    ]
+    for nombre, caso in casos:
+        inicio = time.perf_counter()
+        for i in range(REPETICIONES_PREPARACION):
+            caso(i)
+        microsegundos = (time.perf_counter() - inicio) / REPETICIONES_PREPARACION * 1e6
+        print(f"{nombre:<24} | {microsegundos:>16.1f}")
+
+
+async def poblar(fabrica_sesion) -> None:
+    paises, grupos, fases = list(Paises), list(Grupos), list(Fases)
+    async with fabrica_sesion() as session:
+        await session.execute(insert(EquipoSQL), [
+            {"nombre": f"equipo {i:02d}", "pais": paises[i % len(paises)], "grupo": grupos[i % len(grupos)],
+             "puntos": 0, "tarjetas_amarillas": 0, "tarjetas_rojas": 0, "tiros_esquina": 0, "tiros_libres": 0,
+             "goles_a_favor": 0, "goles_en_contra": 0}
+            for i in range(1, EQUIPOS + 1)
+        ])
+        await session.execute(insert(PartidoSQL), [
+            {**{columna: 1 for columna in COLUMNAS_ESTADISTICAS_PARTIDO},
+             "equipo_local_id": 1 + i % EQUIPOS, "equipo_visitante_id": 1 + (i + 1) % EQUIPOS,
+             "fase": fases[i % len(fases)]}
+            for i in range(PARTIDOS)
+        ])
+        await session.commit()
+
+
+async def tarea(fabrica_sesion, registro: bool, desplazamiento: int) -> None:
+    async with fabrica_sesion() as session:
+        for i in range(BUSQUEDAS_POR_TAREA):
+            equipo_id = 1 + (i + desplazamiento) % EQUIPOS
+            partido_id = 1 + (i + desplazamiento) % PARTIDOS
+            if registro:
+                await session.execute(_sql_equipo_activo_por_id(), {"equipo_id": equipo_id})
+                await session.execute(_sql_partido_por_id(), {"partido_id": partido_id})
+            else:
+                await session.execute(construir_equipo(equipo_id))
+                await session.execute(construir_partido(partido_id))
+            session.expunge_all()  # Que cada búsqueda cargue filas, como en una petición nueva
+
+
+async def medir_concurrencia(concurrencias) -> None:
+    with tempfile.TemporaryDirectory() as carpeta:
+        motor = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(carpeta, 'bench.db')}",
+                                    pool_size=max(concurrencias), max_overflow=0)
+        async with motor.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        fabrica_sesion = sessionmaker(motor, class_=AsyncSession, expire_on_commit=False)
+        await poblar(fabrica_sesion)
+
+        print(f"\n{'tareas':>6} | {'construida (µs)':>15} | {'registro (µs)':>13} | {'ahorro':>6}")
+        for concurrencia in concurrencias:
+            tiempos = {}
+            for registro in (False, True):
+                inicio = time.perf_counter()
+                await asyncio.gather(*(tarea(fabrica_sesion, registro, k) for k in range(concurrencia)))
+                busquedas = concurrencia * BUSQUEDAS_POR_TAREA * 2
+                tiempos[registro] = (time.perf_counter() - inicio) / busquedas * 1e6
+            ahorro = 1 - tiempos[True] / tiempos[False]
+            print(f"{concurrencia:>6} | {tiempos[False]:>15.1f} | {tiempos[True]:>13.1f} | {ahorro:>6.1%}")
+        await motor.dispose()
+
+
+def main(concurrencias):
+    medir_preparacion()
+    asyncio.run(medir_concurrencia(concurrencias))
+    print(f"\nRegistro: {SENTENCIAS.estadisticas()}")
+
+
+if __name__ == "__main__":
+    main([int(valor) for valor in sys.argv[1:]] or CONCURRENCIAS_POR_DEFECTO)
@@ -0,0 +1,55 @@
+'''
+Benchmark del cálculo de la tabla de posiciones: versión Python (partido a partido)
+contra la versión vectorizada con NumPy, sobre partidos sintéticos.
+
+Uso: python -m benchmarks.tabla_posiciones [cantidad_partidos ...]
+'''
+import random
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from models import Grupos
+from operations import tabla_posiciones_python, tabla_posiciones_numpy
+
+Partido = namedtuple("Partido", "equipo_local_id equipo_visitante_id goles_local goles_visitante")
+
+TAMANOS_POR_DEFECTO = [10_000, 100_000, 1_000_000]
+
+
+def generar_datos(cantidad_partidos: int, semilla: int = 2024):
+    rng = random.Random(semilla)
+    grupos = list(Grupos)
+    # 32 equipos activos (4 por grupo); los IDs 33-36 simulan equipos inactivos que deben ignorarse
+    equipos = [(i, f"equipo {i:02d}", grupos[(i - 1) % len(grupos)], f"img/{i}.png") for i in range(1, 33)]
+    matriz = np.empty((cantidad_partidos, 4), dtype=np.int64)
+    for fila in range(cantidad_partidos):
+        local, visitante = rng.sample(range(1, 37), 2)
+        matriz[fila] = (local, visitante, rng.randint(0, 5), rng.randint(0, 5))
+    partidos = [Partido(*fila) for fila in matriz.tolist()]
+    return equipos, partidos, matriz
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def main(tamanos):
+    print(f"{'partidos':>10} | {'python (s)':>10} | {'numpy (s)':>10} | {'aceleración':>11} | iguales")
+    for cantidad in tamanos:
+        equipos, partidos, matriz = generar_datos(cantidad)
+        esperado, tiempo_python = medir(tabla_posiciones_python, equipos, partidos)
+        obtenido, tiempo_numpy = medir(tabla_posiciones_numpy, equipos, matriz)
+        iguales = esperado == obtenido
+        print(f"{cantidad:>10} | {tiempo_python:>10.3f} | {tiempo_numpy:>10.3f} | "
+              f"{tiempo_python / tiempo_numpy:>10.1f}x | {iguales}")
+        if not iguales:
+            raise SystemExit(f"La versión vectorizada no coincide con la de Python para {cantidad} partidos")
+
+
+if __name__ == "__main__":
+    main([int(valor) for valor in sys.argv[1:]] or TAMANOS_POR_DEFECTO)
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, Form
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, UploadFile, File, Form, Query
+from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from shutil import copyfileobj
@@ -18,6 +18,14 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlalchemy.orm import sessionmaker
 from typing import List, Optional
 from utils.connection_db import *
+from utils.transacciones import unidad_de_trabajo, confirmar_cambios, iniciar_contadores
+from utils.migraciones import aplicar_migraciones
+from utils.sentencias import SENTENCIAS
+from utils.catalogo_equipos import CATALOGO_EQUIPOS
+from utils.cache import CACHE
+from utils.vuelo_unico import VUELO_UNICO
+from utils.paginas import CACHE_PAGINAS, llave_pagina, version_de_peticion
+from utils.versiones import AMBITO_EQUIPOS, AMBITO_PARTIDOS, AMBITO_REPORTES, CABECERAS_CONDICIONALES, NoModificado, condicional
 from contextlib import asynccontextmanager
 from operations import *
 
@@ -26,15 +34,65 @@ from operations import *
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    await aplicar_migraciones(engine)
+    # Sincronizar la tabla de posiciones y el cubo de estadísticas con los partidos existentes
+    async with async_session() as session, unidad_de_trabajo(session):
+        await reconstruir_posiciones_grupos(session)
+        await reconstruir_cubo_estadisticas(session)
+        await asegurar_snapshot_base(session)
+    await CACHE.iniciar()
     yield
+    await CACHE.cerrar()
 
 
 templates = Jinja2Templates(directory="templates")
 app = FastAPI(lifespan=lifespan)
 UPLOAD_DIR = "static/logos"
+LIMITE_MAXIMO_CLASIFICACION = 100
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
+async def renderizar_cacheado(request: Request, plantilla: str, obtener_contexto) -> HTMLResponse:
+    """
+    Sirve la página de CACHE_PAGINAS si ya se renderizó con la versión de datos vigente; si no, consulta,
+    renderiza y la guarda. La versión se leyó antes que los datos, así que nunca queda guardado un cuerpo
+    más viejo que su versión. Las páginas leídas de la réplica se sirven desde la caché pero no la llenan:
+    la guardan solo las peticiones que leyeron de la primaria.
+    """
+    version = version_de_peticion(request)
+    llave = llave_pagina(request, plantilla)
+    if version is not None:
+        cuerpo = CACHE_PAGINAS.obtener(llave, version)
+        if cuerpo is not None:
+            return HTMLResponse(cuerpo)
+    respuesta = templates.TemplateResponse(plantilla, {"request": request, **await obtener_contexto()})
+    if version is not None and not getattr(request.state, "lectura_replica", False):
+        CACHE_PAGINAS.guardar(llave, version, bytes(respuesta.body))
+    return respuesta
+
+
+@app.middleware("http")
+async def cabeceras_condicionales(request: Request, call_next):
+    """Agrega el ETag y Last-Modified que calculó la dependencia condicional() del endpoint."""
+    response = await call_next(request)
+    cabeceras = getattr(request.state, CABECERAS_CONDICIONALES, None)
+    if cabeceras and response.status_code == 200:
+        response.headers.update(cabeceras)
+    return response
+
+
+@app.middleware("http")
+async def contar_transacciones(request: Request, call_next):
+    """Cuenta los commits y refrescos de cada petición y los expone en las cabeceras de la respuesta."""
+    contadores = iniciar_contadores()
+    response = await call_next(request)
+    response.headers["X-DB-Commits"] = str(contadores["commits"])
+    response.headers["X-DB-Refrescos"] = str(contadores["refrescos"])
+    if contadores["commits"] and engine_lectura is not None:
+        marcar_escritura(response)  # Sus próximas lecturas irán a la primaria mientras la réplica se pone al día
+    return response
+
+
 # Archivos estáticos (CSS, imágenes, etc.)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -52,7 +110,7 @@ async def formulario_equipo(request: Request):
 
 # NEW ENDPOINT: Display form to restore inactive matches
 @app.get("/partidos/restaurar", response_class=HTMLResponse)
-async def mostrar_formulario_restaurar_partido(request: Request, session: AsyncSession = Depends(get_session)):
+async def mostrar_formulario_restaurar_partido(request: Request, session: AsyncSession = Depends(get_read_session)):
     partidos_inactivos = await obtener_todos_los_partidos_inactivos(session)
     return templates.TemplateResponse("restaurar_partidos.html", {"request": request, "partidos": partidos_inactivos})
 
@@ -61,9 +119,8 @@ async def mostrar_formulario_equipo(request: Request):
     return templates.TemplateResponse("formulario_equipo.html", {"request": request})
 
 @app.get("/partido/formulario", response_class=HTMLResponse)
-async def mostrar_formulario_partido(request: Request, session: AsyncSession = Depends(get_session)):
-    result = await session.execute(select(EquipoSQL))
-    equipos = result.scalars().all()
+async def mostrar_formulario_partido(request: Request, session: AsyncSession = Depends(get_read_session)):
+    equipos = await obtener_catalogo_equipos(session)  # Solo activos: no se programan partidos de equipos dados de baja
     return templates.TemplateResponse("formulario_partido.html", {"request": request, "equipos": equipos})
 
 @app.get("/equipo-agregado", name="mostrar_equipo_agregado", response_class=HTMLResponse)
@@ -78,17 +135,17 @@ async def mostrar_equipo_agregado(request: Request, nombre: str, grupo: str, pai
 
 
 @app.get("/formulario-actualizar-equipo", response_class=HTMLResponse)
-async def mostrar_formulario_actualizar_equipo(request: Request, session: AsyncSession = Depends(get_session)):
-    equipos = await obtener_todos_los_equipos(session)
+async def mostrar_formulario_actualizar_equipo(request: Request, session: AsyncSession = Depends(get_read_session)):
+    equipos = await obtener_catalogo_equipos(session)
     return templates.TemplateResponse("formulario_actualizar_equipo.html", {"request": request, "equipos": equipos})
 
 @app.get("/formulario-buscar-equipo", response_class=HTMLResponse)
-async def mostrar_formulario_buscar_equipo(request: Request, session: AsyncSession = Depends(get_session)):
-    equipos = await obtener_todos_los_equipos(session) # Se usa para el select del formulario
+async def mostrar_formulario_buscar_equipo(request: Request, session: AsyncSession = Depends(get_read_session)):
+    equipos = await obtener_catalogo_equipos(session) # Se usa para el select del formulario
     return templates.TemplateResponse("Formulario_buscar_equipo.html", {"request": request, "equipos": equipos})
 
 @app.get("/formulario-buscar-partido/", response_class=HTMLResponse)
-async def mostrar_formulario_buscar_partido(request: Request, session: AsyncSession = Depends(get_session)):
+async def mostrar_formulario_buscar_partido(request: Request, session: AsyncSession = Depends(get_read_session)):
     # No necesitamos cargar equipos para este formulario, solo el ID
     return templates.TemplateResponse("formulario_buscar_partido.html", {"request": request})
 
@@ -97,17 +154,17 @@ async def mostrar_formulario_modificar_partido(request: Request):
     return templates.TemplateResponse("formulario_modificar_partido.html", {"request": request})
 
 @app.get("/formulario-eliminar-equipo", response_class=HTMLResponse)
-async def mostrar_formulario_eliminar_equipo(request: Request, session: AsyncSession = Depends(get_session)):
-    equipos = await obtener_todos_los_equipos(session)  # Necesitamos la lista de equipos para el select
+async def mostrar_formulario_eliminar_equipo(request: Request, session: AsyncSession = Depends(get_read_session)):
+    equipos = await obtener_catalogo_equipos(session)  # Necesitamos la lista de equipos para el select
     return templates.TemplateResponse("formulario_eliminar_equipo.html", {"request": request, "equipos": equipos})
 
 @app.get("/formulario-eliminar-partido/", response_class=HTMLResponse)
-async def mostrar_formulario_eliminar_partido(request: Request, session: AsyncSession = Depends(get_session)):
+async def mostrar_formulario_eliminar_partido(request: Request, session: AsyncSession = Depends(get_read_session)):
     """
     Muestra el formulario para eliminar un partido, con una lista de todos los partidos.
     """
-    # Obtener todos los partidos para el selector, cargando equipos para nombres
-    partidos = await obtener_todos_los_partidos(session)
+    # Obtener todos los partidos para el selector; de cada equipo solo hacen falta el nombre y el logo
+    partidos = await obtener_resumen_partidos(session)
     return templates.TemplateResponse("formulario_eliminar_partido.html", {"request": request, "partidos": partidos})
 
 @app.post("/buscar-equipo/", response_class=HTMLResponse)
@@ -127,14 +184,14 @@ async def buscar_equipo_html(
             }
         )
     except HTTPException as e:
-        equipos = await obtener_todos_los_equipos(session)
+        equipos = await obtener_catalogo_equipos(session)
         return templates.TemplateResponse(
             "formulario_buscar_equipo.html",
             {"request": request, "equipos": equipos, "error_message": e.detail}
         )
     except Exception as e:
 
-        equipos = await obtener_todos_los_equipos(session)
+        equipos = await obtener_catalogo_equipos(session)
         return templates.TemplateResponse(
             "formulario_buscar_equipo.html",
             {"request": request, "equipos": equipos, "error_message": f"Error interno del servidor: {e}"}
@@ -170,7 +227,7 @@ async def actualizar_equipo_html(
             )
 
         except HTTPException as e:
-            equipos = await obtener_todos_los_equipos(session)
+            equipos = await obtener_catalogo_equipos(session)
             return templates.TemplateResponse(
                 "formulario_actualizar_equipo.html",
                 {"request": request, "equipos": equipos, "error_message": e.detail}
@@ -263,7 +320,7 @@ async def eliminar_equipo_html(
     except HTTPException as e:
         print(f"DEBUG (main): HTTPException capturada: {e.detail}")
         # Captura la excepción lanzada si el equipo no se encuentra
-        equipos = await obtener_todos_los_equipos(session)
+        equipos = await obtener_catalogo_equipos(session)
         return templates.TemplateResponse(
             "formulario_eliminar_equipo.html",
             {"request": request, "equipos": equipos, "error_message": e.detail}
@@ -271,7 +328,7 @@ async def eliminar_equipo_html(
     except Exception as e:
         print(f"DEBUG (main): ERROR INESPERADO: {e}")
         # Para cualquier otro error inesperado
-        equipos = await obtener_todos_los_equipos(session)
+        equipos = await obtener_catalogo_equipos(session)
         return templates.TemplateResponse(
             "formulario_eliminar_equipo.html",
             {"request": request, "equipos": equipos, "error_message": f"Error interno del servidor: {e}"}
@@ -279,22 +336,43 @@ async def eliminar_equipo_html(
 
 # NEW ENDPOINT: Listar partidos inactivos (HTML)
 @app.get("/partidos/inactivos", response_class=HTMLResponse)
-async def listar_partidos_inactivos_html(request: Request, session: AsyncSession = Depends(get_session)):
-    partidos_inactivos = await obtener_todos_los_partidos_inactivos(session)
-    return templates.TemplateResponse("lista_partidos_inactivos.html", {"request": request, "partidos": partidos_inactivos})
+async def listar_partidos_inactivos_html(
+        request: Request,
+        limite: int = Query(TAMANO_PAGINA, ge=1, le=TAMANO_PAGINA_MAXIMO),
+        despues_de: Optional[int] = None,
+        antes_de: Optional[int] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    pagina = await obtener_pagina_partidos_resumen(session, limite, despues_de, antes_de, activos=False)
+    return templates.TemplateResponse("lista_partidos_inactivos.html", {"request": request, "partidos": pagina.items, "pagina": pagina})
 
 
 
 @app.get("/equipos-html", response_class=HTMLResponse)
-async def mostrar_equipos(request: Request, session: AsyncSession = Depends(get_session)):
-    equipos = await obtener_todos_los_equipos(session)
-    return templates.TemplateResponse("equipos.html", {"request": request, "equipos": equipos})
+async def mostrar_equipos(
+        request: Request,
+        limite: int = Query(TAMANO_PAGINA, ge=1, le=TAMANO_PAGINA_MAXIMO),
+        despues_de: Optional[int] = None,
+        antes_de: Optional[int] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    pagina = await obtener_pagina_equipos(session, limite, despues_de, antes_de)
+    return templates.TemplateResponse("equipos.html", {"request": request, "equipos": pagina.items, "pagina": pagina})
 
 
-@app.get("/partidos/", response_class=HTMLResponse)
-async def mostrar_partidos(request: Request, session: AsyncSession = Depends(get_session)):
-    partidos = await obtener_todos_los_partidos(session)
-    return templates.TemplateResponse("partidos.html", {"request": request, "partidos": partidos})
+@app.get("/partidos/", response_class=HTMLResponse, dependencies=[condicional(AMBITO_PARTIDOS, AMBITO_EQUIPOS)])
+async def mostrar_partidos(
+        request: Request,
+        limite: int = Query(TAMANO_PAGINA, ge=1, le=TAMANO_PAGINA_MAXIMO),
+        despues_de: Optional[int] = None,
+        antes_de: Optional[int] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    async def contexto():
+        pagina = await obtener_pagina_partidos_resumen(session, limite, despues_de, antes_de)
+        return {"partidos": pagina.items, "pagina": pagina}
+
+    return await renderizar_cacheado(request, "partidos.html", contexto)
 
 
 
@@ -333,12 +411,15 @@ async def buscar_partido_para_modificar(
         )
 
 @app.get("/partidos/activos", response_class=HTMLResponse)
-async def listar_partidos_activos_html(request: Request, session: AsyncSession = Depends(get_session)):
-    # This function will fetch active matches and render a template
-    # You need a template file named 'lista_partidos_activos.html' (or similar)
-    # in your 'templates' directory.
-    partidos = await obtener_todos_los_partidos(session) # This should fetch only active ones if implemented in operations.py
-    return templates.TemplateResponse("lista_partidos_activos.html", {"request": request, "partidos": partidos})
+async def listar_partidos_activos_html(
+        request: Request,
+        limite: int = Query(TAMANO_PAGINA, ge=1, le=TAMANO_PAGINA_MAXIMO),
+        despues_de: Optional[int] = None,
+        antes_de: Optional[int] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    pagina = await obtener_pagina_partidos_resumen(session, limite, despues_de, antes_de, activos=True)
+    return templates.TemplateResponse("lista_partidos_activos.html", {"request": request, "partidos": pagina.items, "pagina": pagina})
 
 @app.post("/modificar-partido/{partido_id}", response_class=HTMLResponse)
 async def procesar_modificacion_partido(
@@ -495,13 +576,13 @@ async def obtener_equipo_por_id_incluir_inactivo(session: AsyncSession, equipo_i
 
 
 @app.get("/equipos-inactivos/", response_class=HTMLResponse)
-async def mostrar_equipos_inactivos(request: Request, session: AsyncSession = Depends(get_session)):
+async def mostrar_equipos_inactivos(request: Request, session: AsyncSession = Depends(get_read_session)):
     equipos_inactivos = await obtener_todos_los_equipos_inactivos(session)
     return templates.TemplateResponse("equipos_inactivos.html", {"request": request, "equipos": equipos_inactivos})
 
 
 @app.get("/formulario-restaurar-equipo/", response_class=HTMLResponse)
-async def mostrar_formulario_restaurar_equipo(request: Request, session: AsyncSession = Depends(get_session)):
+async def mostrar_formulario_restaurar_equipo(request: Request, session: AsyncSession = Depends(get_read_session)):
     equipos_inactivos = await obtener_todos_los_equipos_inactivos(session)  # Solo muestra inactivos para restaurar
     return templates.TemplateResponse("formulario_restaurar_equipo.html",
                                       {"request": request, "equipos": equipos_inactivos})
@@ -551,6 +632,10 @@ async def manejar_excepciones_http(request, exc):
         },
     )
 
+@app.exception_handler(NoModificado)
+async def responder_no_modificado(request, exc):
+    return Response(status_code=304, headers=exc.cabeceras)
+
 @app.get("/error")
 async def lanzar_error():
     raise HTTPException(status_code=400)
@@ -611,19 +696,68 @@ async def crear_partido(
     return RedirectResponse(url=url, status_code=303)
 
 
-@app.get("/equipos/", response_model=List[EquipoSQL])
-async def listar_equipos(session: AsyncSession = Depends(get_session)):
-    return await obtener_todos_los_equipos(session)
+@app.post("/equipos/importar")
+async def importar_equipos_endpoint(
+    manifiesto: UploadFile = File(...),
+    logos: Optional[UploadFile] = File(None),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Alta masiva de equipos. El manifiesto es CSV o JSON con nombre, pais, grupo, puntos (opcional)
+    y logo (nombre del archivo dentro del zip, opcional); los logos llegan juntos en un .zip.
+    """
+    try:
+        registros = leer_manifiesto_equipos(await manifiesto.read(), manifiesto.filename or "")
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Manifiesto ilegible: {e}")
+    contenido_zip = await logos.read() if logos else None
+    return await importar_equipos(session, registros, contenido_zip)
+
+
+@app.get("/equipos/", response_model=Pagina[EquipoSQL], dependencies=[condicional(AMBITO_EQUIPOS)])
+async def listar_equipos(
+        limite: int = Query(TAMANO_PAGINA, ge=1, le=TAMANO_PAGINA_MAXIMO),
+        despues_de: Optional[int] = None,
+        antes_de: Optional[int] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    return await obtener_pagina_equipos(session, limite, despues_de, antes_de)
 
 
 @app.get("/equipos/{equipo_id}", response_model=EquipoSQL)
-async def obtener_equipo(equipo_id: int, session: AsyncSession = Depends(get_session)):
+async def obtener_equipo(equipo_id: int, session: AsyncSession = Depends(get_read_session)):
     equipo = await obtener_equipo_por_id(session, equipo_id)
     if not equipo:
         raise HTTPException(status_code=404, detail="Equipo no encontrado")
     return equipo
 
 
+@app.get("/equipos/{equipo_id}/verificar-estadisticas")
+async def verificar_estadisticas(equipo_id: int, session: AsyncSession = Depends(get_session)):
+    """
+    Compara las estadísticas acumuladas del equipo con un recálculo completo desde sus partidos.
+    Solo lee: la reparación es POST /equipos/{equipo_id}/reparar-estadisticas.
+    """
+    diferencias = await verificar_estadisticas_equipo(session, equipo_id)
+    return {"equipo_id": equipo_id, "consistente": not diferencias, "diferencias": diferencias}
+
+
+@app.post("/equipos/{equipo_id}/reparar-estadisticas")
+async def reparar_estadisticas(equipo_id: int, session: AsyncSession = Depends(get_session)):
+    """Sobrescribe los contadores del equipo con el recálculo desde sus partidos si no coinciden."""
+    diferencias = await verificar_estadisticas_equipo(session, equipo_id)
+    if diferencias:
+        await recalcular_estadisticas_equipo(session, equipo_id)
+    return {"equipo_id": equipo_id, "consistente": not diferencias, "diferencias": diferencias, "reparado": bool(diferencias)}
+
+
+@app.post("/equipos/recalcular-estadisticas")
+async def recalcular_estadisticas(equipo_ids: Optional[List[int]] = None, session: AsyncSession = Depends(get_session)):
+    """Recalcula en bloque las estadísticas de los equipos indicados, o de todos si no se envía ninguno."""
+    actualizados = await recalcular_estadisticas_equipos(session, equipo_ids if equipo_ids else "todos")
+    return {"equipos_actualizados": actualizados}
+
+
 @app.put("/equipos/{equipo_id}/actualizar-grupo-puntos")
 async def actualizar_equipo(
     equipo_id: int,
@@ -719,8 +853,25 @@ async def crear_partido(
 
 
 
+@app.post("/partidos/importar")
+async def importar_partidos_endpoint(
+    request: Request,
+    formato: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Carga masiva de partidos. El cuerpo es NDJSON (un objeto por línea) o CSV con encabezado,
+    según ?formato= o el Content-Type (text/csv). Se lee en streaming; las filas con error se
+    informan sin detener el resto.
+    """
+    if formato is None:
+        formato = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    filas = filas_importacion(leer_lineas(request.stream()), formato)
+    return await importar_partidos(session, filas)
+
+
 @app.get("/partido_agregado/{partido_id}", response_class=HTMLResponse)
-async def mostrar_partido_agregado(partido_id: int, request: Request, session: AsyncSession = Depends(get_session)):
+async def mostrar_partido_agregado(partido_id: int, request: Request, session: AsyncSession = Depends(get_read_session)):
     partido = await obtener_partido_por_id(session, partido_id)
     if not partido:
         raise HTTPException(status_code=404, detail="Partido no encontrado")
@@ -739,9 +890,14 @@ async def mostrar_partido_agregado(partido_id: int, request: Request, session: A
 
     return templates.TemplateResponse("partido_agregado.html", {"request": request, "partido": partido_con_equipos})
 
-@app.get("/partidos/", response_model=List[PartidoSQL])
-async def listar_partidos(session: AsyncSession = Depends(get_session)):
-    return await obtener_todos_los_partidos(session)
+@app.get("/partidos/", response_model=Pagina[PartidoSQL], dependencies=[condicional(AMBITO_PARTIDOS)])
+async def listar_partidos(
+        limite: int = Query(TAMANO_PAGINA, ge=1, le=TAMANO_PAGINA_MAXIMO),
+        despues_de: Optional[int] = None,
+        antes_de: Optional[int] = None,
+        session: AsyncSession = Depends(get_read_session)
+):
+    return await obtener_pagina_partidos(session, limite, despues_de, antes_de)
 
 
 
@@ -780,13 +936,25 @@ async def buscar_partido_html(
 
 
 @app.get("/partidos/{partido_id}", response_model=PartidoSQL)
-async def obtener_partido(partido_id: int, session: AsyncSession = Depends(get_session)):
+async def obtener_partido(partido_id: int, session: AsyncSession = Depends(get_read_session)):
     partido = await obtener_partido_por_id(session, partido_id)
     if not partido:
         raise HTTPException(status_code=404, detail="Partido no encontrado")
     return partido
 
 
+@app.post("/partidos/eliminar-lote")
+async def eliminar_partidos_lote(partido_ids: List[int], session: AsyncSession = Depends(get_session)):
+    """Anula varios partidos a la vez; responde el resultado de cada ID."""
+    return {"resultados": await cambiar_estado_partidos(session, partido_ids, activar=False)}
+
+
+@app.post("/partidos/restaurar-lote")
+async def restaurar_partidos_lote(partido_ids: List[int], session: AsyncSession = Depends(get_session)):
+    """Restaura varios partidos inactivos a la vez; responde el resultado de cada ID."""
+    return {"resultados": await cambiar_estado_partidos(session, partido_ids, activar=True)}
+
+
 @app.put("/partidos/{partido_id}/fase")
 async def actualizar_partido_endpoint(
     partido_id: int,
@@ -805,6 +973,28 @@ async def eliminar_partido(partido_id: int, session: AsyncSession = Depends(get_
     return {"ok": True}
 
 
+@app.get("/partidos/{partido_id}/eventos", response_model=List[EventoPartidoSQL])
+async def eventos_partido(partido_id: int, session: AsyncSession = Depends(get_read_session)):
+    """Historial de escrituras del partido (creación, cambios, eliminación y restauración)."""
+    return await obtener_eventos_partido(session, partido_id)
+
+
+@app.post("/eventos/snapshot")
+async def guardar_snapshot_eventos(session: AsyncSession = Depends(get_session)):
+    snapshot = await tomar_snapshot_agregados(session)
+    await confirmar_cambios(session)
+    return {"snapshot_id": snapshot.id, "ultimo_evento_id": snapshot.ultimo_evento_id}
+
+
+@app.post("/eventos/reconstruir")
+async def reconstruir_agregados_desde_eventos(session: AsyncSession = Depends(get_session)):
+    """
+    Rehace las estadísticas de los equipos desde el último snapshot más los eventos nuevos; posiciones,
+    cubo y reportes se reconstruyen recorriendo los partidos (campo "recorrido_completo").
+    """
+    return await reconstruir_desde_eventos(session)
+
+
 # ----------- REPORTES --------------
 @app.get("/reportes/pais", response_class=HTMLResponse)
 async def mostrar_formulario_reporte_pais(request: Request):
@@ -823,7 +1013,8 @@ async def generar_reporte_pais_html(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al generar reporte: {e}")
 
-@app.get("/reportes/pais/{pais_nombre}", response_class=HTMLResponse)
+@app.get("/reportes/pais/{pais_nombre}", response_class=HTMLResponse,
+         dependencies=[condicional(AMBITO_REPORTES, lectura=False)])
 async def ver_reporte_pais_html(
     request: Request,
     pais_nombre: Paises, # FastAPI will automatically convert string to Paises enum
@@ -839,18 +1030,39 @@ async def ver_reporte_pais_html(
 
     return templates.TemplateResponse("reporte_pais_detalle.html", {"request": request, "reporte": reporte})
 
-@app.get("/reportes/todos", response_class=HTMLResponse)
-async def listar_todos_los_reportes_html(request: Request, session: AsyncSession = Depends(get_session)):
-    reportes = await obtener_todos_los_reportes_por_pais(session)
-    return templates.TemplateResponse("lista_reportes_todos.html", {"request": request, "reportes": reportes})
+@app.get("/reportes/todos", response_class=HTMLResponse, dependencies=[condicional(AMBITO_REPORTES)])
+async def listar_todos_los_reportes_html(request: Request, session: AsyncSession = Depends(get_read_session)):
+    async def contexto():
+        return {"reportes": await obtener_todos_los_reportes_por_pais(session)}
+
+    return await renderizar_cacheado(request, "lista_reportes_todos.html", contexto)
+
+@app.get("/reportes/cubo")
+async def consultar_cubo(
+    por: List[DimensionesCubo] = Query([]),
+    pais: Optional[Paises] = None,
+    fase: Optional[Fases] = None,
+    grupo: Optional[Grupos] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """
+    Estadísticas pre-agregadas por país × fase × grupo.
+    Ej.: /reportes/cubo?por=fase&por=pais (goles por fase y país), /reportes/cubo?por=grupo&fase=Octavos.
+    """
+    return await consultar_cubo_estadisticas(session, por, pais=pais, fase=fase, grupo=grupo)
+
+@app.post("/reportes/regenerar")
+async def regenerar_reportes_endpoint(session: AsyncSession = Depends(get_session)):
+    """Regenera todos los reportes por país y por fase (una consulta y un upsert por tabla)."""
+    return await regenerar_todos_los_reportes(session)
 
 @app.get("/reportes/fase", response_class=HTMLResponse)
 async def mostrar_formulario_reporte_fase(request: Request):
     fases = [f.value for f in Fases] # Get all phase names from the Fases Enum
     return templates.TemplateResponse("formulario_reporte_fase.html", {"request": request, "fases": fases})
 
-@app.get("/reportes/fase/todos", response_class=HTMLResponse)
-async def listar_todos_los_reportes_fase_html(request: Request, session: AsyncSession = Depends(get_session)):
+@app.get("/reportes/fase/todos", response_class=HTMLResponse, dependencies=[condicional(AMBITO_REPORTES)])
+async def listar_todos_los_reportes_fase_html(request: Request, session: AsyncSession = Depends(get_read_session)):
     reportes = await obtener_todos_los_reportes_por_fase(session)
     return templates.TemplateResponse("lista_reportes_fase_todos.html", {"request": request, "reportes": reportes})
 
@@ -904,19 +1116,86 @@ async def mostrar_info_desarrollador(request: Request):
         {"request": request, "desarrollador": info_desarrollador}
     )
 
-@app.get("/reportes/menos-goleados", response_class=HTMLResponse)
-async def mostrar_reporte_menos_goleados(request: Request, session: AsyncSession = Depends(get_session)):
-    equipos_menos_goleados = await obtener_equipos_menos_goleados(session)
-    return templates.TemplateResponse("reporte_menos_goleados.html", {"request": request, "equipos": equipos_menos_goleados})
+@app.get("/reportes/menos-goleados", response_class=HTMLResponse, dependencies=[condicional(AMBITO_REPORTES)])
+async def mostrar_reporte_menos_goleados(
+    request: Request,
+    limite: int = Query(6, ge=1, le=LIMITE_MAXIMO_CLASIFICACION),
+    session: AsyncSession = Depends(get_read_session)
+):
+    async def contexto():
+        return {"equipos": await obtener_equipos_menos_goleados(session, limite)}
+
+    return await renderizar_cacheado(request, "reporte_menos_goleados.html", contexto)
+
+
+@app.get("/reportes/clasificacion/{estadistica}", response_model=List[EquipoClasificacionReporte])
+async def obtener_clasificacion(
+    estadistica: EstadisticasEquipo,
+    limite: int = Query(6, ge=1, le=LIMITE_MAXIMO_CLASIFICACION),
+    orden: str = Query("desc", pattern="^(asc|desc)$"),
+    grupo: Optional[Grupos] = None,
+    pais: Optional[Paises] = None,
+    session: AsyncSession = Depends(get_read_session)
+):
+    """Top N (orden=desc) o bottom N (orden=asc) de equipos activos por cualquier estadística."""
+    return await obtener_clasificacion_equipos(
+        session, estadistica, limite=limite, ascendente=orden == "asc", grupo=grupo, pais=pais
+    )
 
 
 # NUEVO: Ruta para mostrar el reporte por grupos
-@app.get("/reportes/grupos", response_class=HTMLResponse)
-async def mostrar_reporte_por_grupos(request: Request, session: AsyncSession = Depends(get_session)):
-    reporte_grupos = await generar_reporte_por_grupos(session)
-    return templates.TemplateResponse("reporte_grupos.html", {"request": request, "reporte_grupos": reporte_grupos, "Grupos": Grupos})
+@app.get("/reportes/grupos", response_class=HTMLResponse, dependencies=[condicional(AMBITO_REPORTES)])
+async def mostrar_reporte_por_grupos(request: Request, session: AsyncSession = Depends(get_read_session)):
+    async def contexto():
+        return {"reporte_grupos": await generar_reporte_por_grupos(session), "Grupos": Grupos}
+
+    return await renderizar_cacheado(request, "reporte_grupos.html", contexto)
+
+@app.get("/reportes/grupos/verificar")
+async def verificar_reporte_por_grupos(session: AsyncSession = Depends(get_read_session)):
+    """Compara la tabla de posiciones materializada con un recálculo completo (vectorizado) desde los partidos."""
+    materializado = await generar_reporte_por_grupos.sin_cache(session)
+    calculado = await calcular_reporte_por_grupos_vectorizado(session)
+    grupos_con_diferencias = [grupo.value for grupo in Grupos if materializado[grupo] != calculado[grupo]]
+    return {"consistente": not grupos_con_diferencias, "grupos_con_diferencias": grupos_con_diferencias}
 
 # NEW ENDPOINT: Project documentation page
+@app.get("/salud/pool")
+async def estado_pool():
+    """Uso del pool de conexiones; sirve para dimensionarlo frente al número de workers de uvicorn."""
+    return estadisticas_pool(engine)
+
+
+@app.get("/salud/sentencias")
+async def estado_sentencias():
+    """Aciertos y fallos del registro de sentencias preconstruidas (utils/sentencias.py)."""
+    return SENTENCIAS.estadisticas()
+
+
+@app.get("/salud/catalogo-equipos")
+async def estado_catalogo_equipos():
+    """Tasa de aciertos del catálogo de equipos activos que usan los formularios."""
+    return CATALOGO_EQUIPOS.estadisticas()
+
+
+@app.get("/salud/cache")
+async def estado_cache():
+    """Aciertos, fallos e invalidaciones de la caché de reportes (CACHE_BACKEND=memoria|redis)."""
+    return CACHE.estadisticas()
+
+
+@app.get("/salud/vuelo-unico")
+async def estado_vuelo_unico():
+    """Por reporte y parámetros: cálculos hechos y peticiones que esperaron uno en curso en lugar de repetirlo."""
+    return VUELO_UNICO.estadisticas()
+
+
+@app.get("/salud/cache-paginas")
+async def estado_cache_paginas():
+    """Ocupación y aciertos de la caché de páginas renderizadas (CACHE_PAGINAS_MAXIMO_BYTES)."""
+    return CACHE_PAGINAS.estadisticas()
+
+
 @app.get("/acerca-de-proyecto", response_class=HTMLResponse)
 async def acerca_de_proyecto(request: Request):
     """
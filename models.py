@@ -3,10 +3,11 @@ from typing import Optional
 from sqlmodel import Relationship
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Generic, TypeVar
 from enum import Enum
 
 from pydantic import ConfigDict
+from sqlalchemy import Index, Column, JSON, text
 
 
 
@@ -42,6 +43,19 @@ class Grupos(str, Enum):
     g="g"
     h="h"
 
+# Contadores de EquipoSQL por los que se puede armar una clasificación
+class EstadisticasEquipo(str, Enum):
+    puntos = "puntos"
+    goles_a_favor = "goles_a_favor"
+    goles_en_contra = "goles_en_contra"
+    tarjetas_amarillas = "tarjetas_amarillas"
+    tarjetas_rojas = "tarjetas_rojas"
+    tiros_esquina = "tiros_esquina"
+    tiros_libres = "tiros_libres"
+    faltas = "faltas"
+    fueras_de_juego = "fueras_de_juego"
+    pases = "pases"
+
 class EquipoCreate(BaseModel):
     id: Optional[int] = None
     nombre: str
@@ -57,9 +71,30 @@ class EquipoMenosGoleadoReporte(BaseModel):
     logo_url: Optional[str]
     goles_en_contra: int
 
+class EquipoClasificacionReporte(BaseModel):
+    posicion: int
+    id: int
+    nombre: str
+    pais: Paises
+    grupo: Grupos
+    logo_url: Optional[str]
+    estadistica: EstadisticasEquipo
+    valor: int
+
 
 # --------- Modelo Equipo ---------
 class EquipoSQL(SQLModel, table=True):
+    # Un índice parcial (estadística, nombre) por contador sobre los activos: las clasificaciones top/bottom N
+    # se leen del índice en el orden del ORDER BY y se cortan en N (las descendentes lo recorren al revés y
+    # solo reordenan los empates por nombre)
+    __table_args__ = tuple(
+        Index(
+            f"ix_equiposql_clasificacion_{estadistica.value}", estadistica.value, "nombre",
+            postgresql_where=text("esta_activo"), sqlite_where=text("esta_activo = 1"),
+        )
+        for estadistica in EstadisticasEquipo
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     nombre: str = Field(min_length=3, max_length=50)
     pais: Paises = Field(default=Paises.colombia)
@@ -102,6 +137,17 @@ class PosicionEquipoReporte(BaseModel):
     diferencia_goles: int
     logo_url: Optional[str]
 
+
+T = TypeVar("T")
+
+
+class Pagina(BaseModel, Generic[T]):
+    # Página por cursor: 'siguiente'/'anterior' son los id a pasar como despues_de/antes_de
+    items: List[T]
+    limite: int
+    siguiente: Optional[int] = None
+    anterior: Optional[int] = None
+
 # --------- Modelo Partido ---------
 class PartidoSQL(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -162,3 +208,74 @@ class ReportePorFaseSQL(SQLModel, table=True):
     total_goles_local: int
     total_goles_visitante: int
     updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
+
+# --------- Tabla de posiciones materializada ---------
+class PosicionGrupoSQL(SQLModel, table=True):
+    # Una fila por equipo con su acumulado en la tabla de su grupo; se mantiene con cada escritura de partidos
+    equipo_id: int = Field(foreign_key="equiposql.id", primary_key=True)
+    grupo: Grupos = Field(default=Grupos.a, index=True)
+    partidos_jugados: int = Field(default=0, ge=0)
+    victorias: int = Field(default=0, ge=0)
+    empates: int = Field(default=0, ge=0)
+    derrotas: int = Field(default=0, ge=0)
+    goles_a_favor: int = Field(default=0, ge=0)
+    goles_en_contra: int = Field(default=0, ge=0)
+    diferencia_goles: int = Field(default=0)
+    puntos: int = Field(default=0, ge=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
+
+# --------- Cubo de estadísticas (país × fase × grupo) ---------
+class DimensionesCubo(str, Enum):
+    pais = "pais"
+    fase = "fase"
+    grupo = "grupo"
+
+class CuboEstadisticasSQL(SQLModel, table=True):
+    # Una celda por combinación país/grupo del equipo y fase del partido, sumando lo que aportó cada equipo
+    pais: Paises = Field(primary_key=True)
+    fase: Fases = Field(primary_key=True)
+    grupo: Grupos = Field(primary_key=True)
+    partidos: int = Field(default=0, ge=0)
+    victorias: int = Field(default=0, ge=0)
+    empates: int = Field(default=0, ge=0)
+    derrotas: int = Field(default=0, ge=0)
+    goles_a_favor: int = Field(default=0, ge=0)
+    goles_en_contra: int = Field(default=0, ge=0)
+    tarjetas_amarillas: int = Field(default=0, ge=0)
+    tarjetas_rojas: int = Field(default=0, ge=0)
+    tiros_esquina: int = Field(default=0, ge=0)
+    tiros_libres: int = Field(default=0, ge=0)
+    faltas: int = Field(default=0, ge=0)
+    fueras_de_juego: int = Field(default=0, ge=0)
+    pases: int = Field(default=0, ge=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column_kwargs={"onupdate": datetime.utcnow})
+
+# --------- Registro de eventos de partidos (solo inserción) ---------
+class TipoEventoPartido(str, Enum):
+    creado = "creado"
+    actualizado = "actualizado"
+    eliminado = "eliminado"
+    restaurado = "restaurado"
+
+class EventoPartidoSQL(SQLModel, table=True):
+    # Cada escritura de un partido deja aquí su instantánea anterior y la nueva (None = no aporta); nunca se modifica
+    id: Optional[int] = Field(default=None, primary_key=True)
+    partido_id: int = Field(foreign_key="partidosql.id", index=True)
+    tipo: TipoEventoPartido
+    antes: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    despues: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SnapshotAgregadosSQL(SQLModel, table=True):
+    # Totales por equipo (partidos activos) tras aplicar todos los eventos hasta ultimo_evento_id
+    id: Optional[int] = Field(default=None, primary_key=True)
+    ultimo_evento_id: int = Field(default=0, ge=0)
+    totales: Dict[str, Dict[str, int]] = Field(default_factory=dict, sa_column=Column(JSON))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class VersionDatosSQL(SQLModel, table=True):
+    # Un contador por ámbito ("equipos", "partidos", "reportes") que sube en cada commit que lo modifica;
+    # de él salen los ETag y Last-Modified de las lecturas
+    ambito: str = Field(primary_key=True, max_length=40)
+    version: int = Field(default=0, ge=0)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,17 +1,36 @@
 from sqlalchemy.future import select
 import unicodedata
-from sqlalchemy import update, delete  # delete seguirá siendo útil para eliminación física si la necesitas
+from sqlalchemy import update, delete, insert  # delete seguirá siendo útil para eliminación física si la necesitas
 from fastapi import HTTPException
 from models import *
 from datetime import datetime, timezone, date
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, AsyncIterator, Callable, Set, Tuple
 from sqlmodel import Session
-from sqlalchemy import func, text, case
+from sqlalchemy import func, text, case, cast, union_all, bindparam, Integer, Float
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.ext.compiler import compiles
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from utils.transacciones import unidad_de_trabajo, confirmar_cambios, sesion_primaria
+from utils.sentencias import SENTENCIAS
+from utils.catalogo_equipos import CATALOGO_EQUIPOS, EquipoCatalogo, registrar_cambio_equipo
+from utils.cache import ESPACIO_REPORTES, cacheado
+from utils.vuelo_unico import coalescido
+import utils.versiones  # noqa: F401  (cada commit sube las versiones de los ámbitos que escribe)
 import os
 from dotenv import load_dotenv
 import httpx
+import numpy as np
+import csv
+import json
+import io
+import uuid
+import asyncio
+import zipfile
+from shutil import copyfileobj
+from pydantic import ValidationError
 
 load_dotenv()
 API_TOKEN = os.getenv("SPORTMONKS_API_TOKEN")
@@ -37,23 +56,395 @@ def restar_valor(valor_actual, valor_a_restar):
     return max(0, valor_actual - valor_a_restar)
 
 
+# Estadísticas acumuladas en EquipoSQL y las columnas de PartidoSQL que las alimentan (lado local, lado visitante)
+CAMPOS_ESTADISTICAS_EQUIPO: Dict[str, tuple] = {
+    "goles_a_favor": ("goles_local", "goles_visitante"),
+    "goles_en_contra": ("goles_visitante", "goles_local"),
+    "tarjetas_amarillas": ("tarjetas_amarillas_local", "tarjetas_amarillas_visitante"),
+    "tarjetas_rojas": ("tarjetas_rojas_local", "tarjetas_rojas_visitante"),
+    "tiros_esquina": ("tiros_esquina_local", "tiros_esquina_visitante"),
+    "tiros_libres": ("tiros_libres_local", "tiros_libres_visitante"),
+    "faltas": ("faltas_local", "faltas_visitante"),
+    "fueras_de_juego": ("fueras_de_juego_local", "fueras_de_juego_visitante"),
+    "pases": ("pases_local", "pases_visitante"),
+}
+
+COLUMNAS_ESTADISTICAS_PARTIDO: List[str] = sorted(
+    {columna for columnas in CAMPOS_ESTADISTICAS_EQUIPO.values() for columna in columnas}
+)
+
+
+def valores_partido(partido: PartidoSQL) -> Dict[str, int]:
+    """Copia las columnas estadísticas de un partido (para comparar el antes y el después de un cambio)."""
+    return {columna: getattr(partido, columna) for columna in COLUMNAS_ESTADISTICAS_PARTIDO}
+
+
+def instantanea_partido(partido: PartidoSQL) -> Optional[Dict[str, Any]]:
+    """
+    Lo que un partido aporta a los agregados derivados, o None si está inactivo (no aporta nada).
+    Se toma antes y después de cada escritura para aplicar solo la diferencia.
+    """
+    if not partido.esta_activo:
+        return None
+    return {
+        "equipo_local_id": partido.equipo_local_id,
+        "equipo_visitante_id": partido.equipo_visitante_id,
+        "fase": partido.fase,
+        **valores_partido(partido),
+    }
+
+
+# Lo que guarda una instantánea, para leerla directamente de un UPDATE ... RETURNING
+COLUMNAS_INSTANTANEA_PARTIDO = [PartidoSQL.equipo_local_id, PartidoSQL.equipo_visitante_id, PartidoSQL.fase,
+                                *[getattr(PartidoSQL, columna) for columna in COLUMNAS_ESTADISTICAS_PARTIDO]]
+
+
+def aportes_partido(instantanea: Optional[Dict[str, Any]]) -> Dict[int, Dict[str, int]]:
+    """
+    Lo que un partido suma a las estadísticas de cada uno de sus dos equipos. Si local y visitante son el
+    mismo equipo (filas viejas; hoy se rechazan al crear) se suman los dos lados, como en el recálculo completo.
+    """
+    if not instantanea:
+        return {}
+    return combinar_deltas(*(
+        {instantanea[columna_equipo]: {campo: instantanea[columnas[indice_lado]]
+                                       for campo, columnas in CAMPOS_ESTADISTICAS_EQUIPO.items()}}
+        for indice_lado, columna_equipo in enumerate(("equipo_local_id", "equipo_visitante_id"))
+    ))
+
+
+def calcular_delta_estadisticas(anteriores: Dict[int, Dict[str, int]],
+                                nuevos: Dict[int, Dict[str, int]],
+                                campos: Iterable[str] = CAMPOS_ESTADISTICAS_EQUIPO) -> Dict[int, Dict[str, int]]:
+    """
+    Diferencia con signo (nuevo - anterior) por equipo y estadística.
+    Un diccionario vacío significa "el partido no aporta" (no existía, o ya no está activo).
+    """
+    delta: Dict[int, Dict[str, int]] = {}
+    for equipo_id in set(anteriores) | set(nuevos):
+        cambios = {}
+        for campo in campos:
+            diferencia = nuevos.get(equipo_id, {}).get(campo, 0) - anteriores.get(equipo_id, {}).get(campo, 0)
+            if diferencia:
+                cambios[campo] = diferencia
+        if cambios:
+            delta[equipo_id] = cambios
+    return delta
+
+
+def combinar_deltas(*deltas: Dict[int, Dict[str, int]]) -> Dict[int, Dict[str, int]]:
+    """Suma varios deltas en uno solo para tocar cada equipo una única vez."""
+    combinado: Dict[int, Dict[str, int]] = {}
+    for delta in deltas:
+        for equipo_id, cambios in delta.items():
+            acumulado = combinado.setdefault(equipo_id, {})
+            for campo, valor in cambios.items():
+                acumulado[campo] = acumulado.get(campo, 0) + valor
+    return combinado
+
+
+# Anular o restaurar un partido también mueve los puntos de EquipoSQL (crearlo o editarlo no)
+CAMPOS_EQUIPO_CON_PUNTOS: List[str] = [*CAMPOS_ESTADISTICAS_EQUIPO, "puntos"]
+
+
+def _aportes_equipo_con_puntos(instantanea: Optional[Dict[str, Any]]) -> Dict[int, Dict[str, int]]:
+    aportes = aportes_partido(instantanea)
+    if instantanea:
+        posiciones = aportes_posiciones(instantanea["equipo_local_id"], instantanea["equipo_visitante_id"],
+                                        instantanea["goles_local"], instantanea["goles_visitante"])
+        for equipo_id in aportes:
+            aportes[equipo_id]["puntos"] = posiciones[equipo_id]["puntos"]
+    return aportes
+
+
+class mayor_entre(FunctionElement):
+    """GREATEST(a, b, ...) portable: SQLite no tiene GREATEST, pero su MAX() de varios argumentos equivale."""
+    type = Integer()
+    name = "mayor_entre"
+    inherit_cache = True
+
+
+@compiles(mayor_entre)
+def _compilar_mayor_entre(element, compiler, **kw):
+    return f"GREATEST({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(mayor_entre, "sqlite")
+def _compilar_mayor_entre_sqlite(element, compiler, **kw):
+    return f"MAX({compiler.process(element.clauses, **kw)})"
+
+
+def _sincronizar_en_sesion(session: AsyncSession, modelo, identidad, valores: Dict[str, Any]) -> None:
+    # Copia al objeto ya cargado (si lo está) lo que se escribió por SQL, sin marcarlo como modificado
+    objeto = session.identity_map.get(session.identity_key(modelo, identidad))
+    if objeto is not None:
+        for campo, valor in valores.items():
+            set_committed_value(objeto, campo, valor)
+
+
+def _sincronizar_equipos_en_sesion(session: AsyncSession, filas: Iterable[Dict[str, Any]]) -> None:
+    for fila in filas:
+        _sincronizar_en_sesion(session, EquipoSQL, fila["id"], {campo: valor for campo, valor in fila.items() if campo != "id"})
+
+
+async def aplicar_delta_estadisticas(session: AsyncSession, delta: Dict[int, Dict[str, int]]
+                                     ) -> Dict[int, Tuple[Paises, Optional[Dict[str, int]]]]:
+    """
+    Aplica un delta de estadísticas (y puntos, si los trae) a los EquipoSQL activos afectados.
+    Un UPDATE atómico por equipo, col = GREATEST(col + delta, 0) ... RETURNING: no lee la fila antes,
+    así que dos escrituras simultáneas sobre el mismo equipo no se pisan.
+    Retorna, por equipo actualizado, su país y el cambio que de verdad se aplicó: el pedido, o None si
+    el tope en cero pudo recortarlo (RETURNING solo da el valor nuevo, no cuánto se restó).
+    No hace commit: quien llama lo confirma junto con el cambio del partido, en la misma transacción.
+    """
+    aplicados: Dict[int, Tuple[Paises, Optional[Dict[str, int]]]] = {}
+    for equipo_id, cambios in delta.items():
+        result = await session.execute(
+            update(EquipoSQL)
+            .where(EquipoSQL.id == equipo_id, EquipoSQL.esta_activo == True)
+            .values({campo: mayor_entre(getattr(EquipoSQL, campo) + valor, 0) for campo, valor in cambios.items()})
+            .returning(EquipoSQL.id, EquipoSQL.pais, *[getattr(EquipoSQL, campo) for campo in cambios])
+            .execution_options(synchronize_session=False)
+        )
+        fila = result.first()
+        if fila is None:
+            continue  # Equipo inactivo: no se toca ni cuenta en los reportes
+        valores = dict(fila._mapping)
+        pais = valores.pop("pais")
+        _sincronizar_equipos_en_sesion(session, [valores])
+        recortado = any(valor < 0 and valores[campo] == 0 for campo, valor in cambios.items())
+        aplicados[equipo_id] = (pais, None if recortado else cambios)
+    if delta:
+        print(f"DEBUG (operations): Delta de estadísticas aplicado a equipos {sorted(delta)}.")
+    return aplicados
+
+
+# Columnas de la tabla de posiciones que se acumulan partido a partido
+CAMPOS_POSICIONES: List[str] = [
+    "partidos_jugados", "victorias", "empates", "derrotas",
+    "goles_a_favor", "goles_en_contra", "diferencia_goles", "puntos",
+]
+
+
+def aportes_posiciones(equipo_local_id: int, equipo_visitante_id: int,
+                       goles_local: int, goles_visitante: int) -> Dict[int, Dict[str, int]]:
+    """Lo que un partido suma a la fila de cada equipo en la tabla de posiciones."""
+    def lado(goles_propios: int, goles_rival: int) -> Dict[str, int]:
+        return {
+            "partidos_jugados": 1,
+            "victorias": int(goles_propios > goles_rival),
+            "empates": int(goles_propios == goles_rival),
+            "derrotas": int(goles_propios < goles_rival),
+            "goles_a_favor": goles_propios,
+            "goles_en_contra": goles_rival,
+            "diferencia_goles": goles_propios - goles_rival,
+            "puntos": 3 if goles_propios > goles_rival else int(goles_propios == goles_rival),
+        }
+    # combinar_deltas y no un dict literal: con local == visitante el segundo lado pisaría al primero
+    return combinar_deltas(
+        {equipo_local_id: lado(goles_local, goles_visitante)},
+        {equipo_visitante_id: lado(goles_visitante, goles_local)},
+    )
+
+
+async def _aportes_posiciones_instantanea(session: AsyncSession,
+                                          instantanea: Optional[Dict[str, Any]]) -> Dict[int, Dict[str, int]]:
+    # La tabla de posiciones solo cuenta partidos entre dos equipos activos
+    if not instantanea:
+        return {}
+    for equipo_id in (instantanea["equipo_local_id"], instantanea["equipo_visitante_id"]):
+        equipo = await session.get(EquipoSQL, equipo_id)
+        if not equipo or not equipo.esta_activo:
+            return {}
+    return aportes_posiciones(instantanea["equipo_local_id"], instantanea["equipo_visitante_id"],
+                              instantanea["goles_local"], instantanea["goles_visitante"])
+
+
+async def _sumar_en_fila(session: AsyncSession, modelo, filtro: Dict[str, Any], cambios: Dict[str, int],
+                        sin_tope: Iterable[str] = ()) -> bool:
+    """
+    UPDATE ... SET col = GREATEST(col + delta, 0) (o col + delta para las de 'sin_tope') ... RETURNING sobre
+    una fila por clave primaria: no la lee antes, así dos escrituras simultáneas no se pisan.
+    Retorna False si la fila no existe.
+    """
+    columnas = [getattr(modelo, campo) for campo in cambios]
+    result = await session.execute(
+        update(modelo)
+        .where(*[getattr(modelo, clave) == valor for clave, valor in filtro.items()])
+        .values({
+            campo: getattr(modelo, campo) + valor if campo in sin_tope else mayor_entre(getattr(modelo, campo) + valor, 0)
+            for campo, valor in cambios.items()
+        })
+        .returning(*columnas)
+        .execution_options(synchronize_session=False)
+    )
+    fila = result.first()
+    if fila is None:
+        return False
+    _sincronizar_en_sesion(session, modelo, tuple(filtro.values()), dict(fila._mapping))
+    return True
+
+
+def _insertar_o_sumar(session: AsyncSession, modelo, fila: Dict[str, Any], claves: List[str], cambios: Dict[str, int]):
+    # Para las filas que faltan: si otra transacción la creó entretanto, ON CONFLICT suma en lugar de fallar
+    return insertar_o_actualizar(session, modelo, [{**fila, **cambios, "updated_at": datetime.utcnow()}], claves,
+                                 acumular=cambios)
+
+
+async def aplicar_delta_posiciones(session: AsyncSession, delta: Dict[int, Dict[str, int]]) -> None:
+    """Suma un delta a las filas de PosicionGrupoSQL con col = col + delta en SQL, creándolas si faltan. No hace commit."""
+    for equipo_id, cambios in delta.items():
+        if await _sumar_en_fila(session, PosicionGrupoSQL, {"equipo_id": equipo_id}, cambios, sin_tope=["diferencia_goles"]):
+            continue
+        equipo = await session.get(EquipoSQL, equipo_id)
+        if not equipo:
+            continue
+        iniciales = {campo: valor if campo == "diferencia_goles" else max(0, valor) for campo, valor in cambios.items()}
+        await session.execute(_insertar_o_sumar(session, PosicionGrupoSQL, {"equipo_id": equipo_id, "grupo": equipo.grupo},
+                                                ["equipo_id"], iniciales))
+
+
+async def actualizar_posiciones_partido(session: AsyncSession, antes: Optional[Dict[str, Any]],
+                                        despues: Optional[Dict[str, Any]]) -> None:
+    """Lleva a la tabla de posiciones la diferencia entre dos instantáneas de un partido. No hace commit."""
+    await aplicar_delta_posiciones(session, calcular_delta_estadisticas(
+        await _aportes_posiciones_instantanea(session, antes),
+        await _aportes_posiciones_instantanea(session, despues),
+        CAMPOS_POSICIONES,
+    ))
+
+
+# Medidas del cubo: resultado del partido para el equipo más sus estadísticas acumuladas
+MEDIDAS_CUBO: List[str] = ["partidos", "victorias", "empates", "derrotas", *CAMPOS_ESTADISTICAS_EQUIPO]
+
+
+async def _aportes_cubo(session: AsyncSession, instantanea: Optional[Dict[str, Any]]) -> Dict[tuple, Dict[str, int]]:
+    # Lo que un partido suma a cada celda (país, fase, grupo) del cubo; cuenta el lado de cada equipo activo
+    if not instantanea:
+        return {}
+    aportes: Dict[tuple, Dict[str, int]] = {}
+    for indice_lado, columna_equipo in enumerate(("equipo_local_id", "equipo_visitante_id")):
+        equipo = await session.get(EquipoSQL, instantanea[columna_equipo])
+        if not equipo or not equipo.esta_activo:
+            continue
+        # Cada lado por separado: con local == visitante cuenta dos veces, como en reconstruir_cubo_estadisticas
+        goles_propios = instantanea[("goles_local", "goles_visitante")[indice_lado]]
+        goles_rival = instantanea[("goles_visitante", "goles_local")[indice_lado]]
+        valores = {
+            "partidos": 1,
+            "victorias": int(goles_propios > goles_rival),
+            "empates": int(goles_propios == goles_rival),
+            "derrotas": int(goles_propios < goles_rival),
+            **{campo: instantanea[columnas[indice_lado]] for campo, columnas in CAMPOS_ESTADISTICAS_EQUIPO.items()},
+        }
+        celda = aportes.setdefault((equipo.pais, instantanea["fase"], equipo.grupo), {})
+        for medida, valor in valores.items():
+            celda[medida] = celda.get(medida, 0) + valor
+    return aportes
+
+
+async def actualizar_cubo_partido(session: AsyncSession, antes: Optional[Dict[str, Any]],
+                                  despues: Optional[Dict[str, Any]]) -> None:
+    """Lleva al cubo de estadísticas la diferencia entre dos instantáneas de un partido. No hace commit."""
+    await aplicar_delta_cubo(session, calcular_delta_estadisticas(
+        await _aportes_cubo(session, antes), await _aportes_cubo(session, despues), MEDIDAS_CUBO
+    ))
+
+
+async def aplicar_delta_cubo(session: AsyncSession, delta: Dict[tuple, Dict[str, int]]) -> None:
+    """Suma un delta a las celdas del cubo con col = col + delta en SQL, creándolas si faltan. No hace commit."""
+    for (pais, fase, grupo), cambios in delta.items():
+        celda = {"pais": pais, "fase": fase, "grupo": grupo}
+        if not await _sumar_en_fila(session, CuboEstadisticasSQL, celda, cambios):
+            iniciales = {medida: max(0, valor) for medida, valor in cambios.items()}
+            await session.execute(_insertar_o_sumar(session, CuboEstadisticasSQL, celda, list(celda), iniciales))
+
+
+async def propagar_cambio_partido(session: AsyncSession, antes: Optional[Dict[str, Any]],
+                                  despues: Optional[Dict[str, Any]]) -> None:
+    """
+    Actualiza todos los agregados derivados de un partido (estadísticas de EquipoSQL, tabla
+    de posiciones, cubo y reportes por país/fase) a partir de su instantánea anterior y la nueva. No hace commit.
+    """
+    delta_equipos = calcular_delta_estadisticas(aportes_partido(antes), aportes_partido(despues))
+    aplicados = await aplicar_delta_estadisticas(session, delta_equipos)
+    await actualizar_posiciones_partido(session, antes, despues)
+    await actualizar_cubo_partido(session, antes, despues)
+    await aplicar_delta_reportes(session, aplicados, antes, despues)
+
+
+# Cada cuántos eventos se guarda automáticamente un snapshot de los totales
+INTERVALO_SNAPSHOT = int(os.getenv("EVENTOS_POR_SNAPSHOT", "500"))
+
+
+async def registrar_evento_partido(session: AsyncSession, partido: PartidoSQL, tipo: TipoEventoPartido,
+                                   antes: Optional[Dict[str, Any]],
+                                   despues: Optional[Dict[str, Any]]) -> EventoPartidoSQL:
+    """
+    Agrega un evento al registro de partidos dentro de la transacción en curso. No hace commit.
+    Cada INTERVALO_SNAPSHOT eventos deja además un snapshot de los totales.
+    """
+    if partido.id is None:
+        await session.flush()  # Los partidos nuevos necesitan su ID para el evento
+    return await _agregar_evento_partido(session, partido.id, tipo, antes, despues)
+
+
+async def _agregar_evento_partido(session: AsyncSession, partido_id: int, tipo: TipoEventoPartido,
+                                  antes: Optional[Dict[str, Any]],
+                                  despues: Optional[Dict[str, Any]]) -> EventoPartidoSQL:
+    evento = EventoPartidoSQL(partido_id=partido_id, tipo=tipo, antes=antes, despues=despues)
+    session.add(evento)
+    await session.flush()
+    await snapshot_si_corresponde(session)
+    return evento
+
+
+async def snapshot_si_corresponde(session: AsyncSession) -> Optional[SnapshotAgregadosSQL]:
+    """
+    Toma un snapshot si desde el último ya hay INTERVALO_SNAPSHOT eventos o más. Se cuentan los eventos
+    y no se mira el módulo del ID: con huecos en la secuencia (rollbacks) un múltiplo exacto puede no
+    llegar nunca. Lo llaman también las rutas por lotes. No hace commit.
+    """
+    if INTERVALO_SNAPSHOT <= 0:
+        return None
+    ultimo_snapshot = select(func.coalesce(func.max(SnapshotAgregadosSQL.ultimo_evento_id), 0)).scalar_subquery()
+    result = await session.execute(
+        select(func.count()).select_from(EventoPartidoSQL).where(EventoPartidoSQL.id > ultimo_snapshot)
+    )
+    if result.scalar_one() < INTERVALO_SNAPSHOT:
+        return None
+    return await tomar_snapshot_agregados(session)
+
+
+@SENTENCIAS.registrar
+def _sql_nombre_equipo_activo():
+    # Solo interesa si existe: basta el id de una fila
+    return (select(EquipoSQL.id)
+            .where(EquipoSQL.nombre == bindparam("nombre"), EquipoSQL.esta_activo == True,
+                   EquipoSQL.id != bindparam("excluir_id"))
+            .limit(1))
+
+
+async def existe_equipo_activo_con_nombre(session: AsyncSession, nombre: str, excluir_id: int = 0) -> bool:
+    result = await session.execute(_sql_nombre_equipo_activo(), {"nombre": nombre, "excluir_id": excluir_id})
+    return result.first() is not None
+
+
 async def create_equipo_sql(session: AsyncSession, equipo: EquipoSQL):
     # Normalizar el nombre del nuevo equipo
     equipo.nombre = normalizar_nombre(equipo.nombre)
 
     # Verificar si ya existe un equipo activo con el mismo nombre normalizado
-    existing_equipo = await session.execute(
-        select(EquipoSQL).where(EquipoSQL.nombre == equipo.nombre, EquipoSQL.esta_activo == True)
-        # <-- Filtra por activo
-    )
-    if existing_equipo.first():
+    if await existe_equipo_activo_con_nombre(session, equipo.nombre):
         raise HTTPException(status_code=400, detail=f"El equipo '{equipo.nombre}' ya existe y está activo.")
 
     session.add(equipo)
-    await session.commit()
-    await session.refresh(equipo)
+    await session.flush()  # Para conocer el ID antes de crear su fila en la tabla de posiciones
+    session.add(PosicionGrupoSQL(equipo_id=equipo.id, grupo=equipo.grupo))
+    await regenerar_reportes_por_pais(session, [equipo.pais])
+    registrar_cambio_equipo(session, equipo)
+    await confirmar_cambios(session, equipo)
     print(f"DEBUG (operations): Equipo '{equipo.nombre}' creado con ID {equipo.id}.")
-    await actualizar_reporte_por_pais(session, equipo.pais)
     return equipo
 
 
@@ -72,13 +463,32 @@ async def restaurar_equipo_sql(session: AsyncSession, equipo_id: int) -> Optiona
         if not equipo:
             return None  # El equipo no fue encontrado
 
+        # La baja desactivó sus partidos, pero se pueden haber restaurado mientras tanto: esos no sumaron
+        # a sus contadores, a la tabla de posiciones (ni a la suya ni a la de sus rivales) ni a su lado del cubo
+        result = await session.execute(
+            select(PartidoSQL.id, *COLUMNAS_INSTANTANEA_PARTIDO).where(
+                (PartidoSQL.equipo_local_id == equipo_id) | (PartidoSQL.equipo_visitante_id == equipo_id),
+                PartidoSQL.esta_activo == True,
+            )
+        )
+        instantaneas = [{campo: valor for campo, valor in fila._mapping.items() if campo != "id"} for fila in result.all()]
+        rivales = {instantanea[clave] for instantanea in instantaneas
+                   for clave in ("equipo_local_id", "equipo_visitante_id")} - {equipo_id}
+        cubo_antes = combinar_deltas(*[await _aportes_cubo(session, instantanea) for instantanea in instantaneas])
+
         # 2. Cambiar el estado a True
         equipo.esta_activo = True
 
         # 3. Añadir el objeto modificado a la sesión y hacer commit
         session.add(equipo)
-        await session.commit()
-        await session.refresh(equipo)  # Refrescar el objeto para obtener los datos más recientes de la DB
+        cubo_despues = combinar_deltas(*[await _aportes_cubo(session, instantanea) for instantanea in instantaneas])
+        await aplicar_delta_cubo(session, calcular_delta_estadisticas(cubo_antes, cubo_despues, MEDIDAS_CUBO))
+        await recalcular_estadisticas_equipos(session, {equipo_id}, confirmar=False)
+        await reconstruir_posiciones_grupos(session, {equipo_id} | rivales)
+        # Vuelve a contar en el reporte de su país: total_equipos y promedios de goles
+        await regenerar_reportes_por_pais(session, [equipo.pais])
+        registrar_cambio_equipo(session, equipo)
+        await confirmar_cambios(session, equipo)
 
         return equipo
     except Exception as e:
@@ -88,6 +498,136 @@ async def restaurar_equipo_sql(session: AsyncSession, equipo_id: int) -> Optiona
 
 
 
+# --- Alta masiva de equipos: manifiesto CSV/JSON + zip de logos ---
+EXTENSIONES_LOGO = {".png", ".jpg", ".jpeg"}
+# Columnas que el manifiesto no puede fijar: la base asigna el ID y todo equipo importado nace activo
+CAMPOS_NO_IMPORTABLES = ("id", "esta_activo")
+CARPETA_LOGOS = os.path.join("static", "img")
+
+
+def leer_manifiesto_equipos(contenido: bytes, nombre_archivo: str) -> List[Dict[str, Any]]:
+    """Lee el manifiesto de equipos: una lista JSON de objetos o un CSV con encabezado."""
+    texto = contenido.decode("utf-8-sig")
+    if nombre_archivo.lower().endswith(".json"):
+        registros = json.loads(texto)
+        if not isinstance(registros, list):
+            raise ValueError("El manifiesto JSON debe ser una lista de equipos.")
+        return registros
+    return [dict(fila) for fila in csv.DictReader(io.StringIO(texto))]
+
+
+def _borrar_logos(rutas: Iterable[str]) -> None:
+    # No dejar logos huérfanos cuando la importación no llega a crear los equipos
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def _extraer_logo(contenido_zip: bytes, miembro: str, ruta_destino: str) -> None:
+    # Cada hilo abre su propio ZipFile: un mismo objeto no se puede leer en paralelo
+    with zipfile.ZipFile(io.BytesIO(contenido_zip)) as archivo, archivo.open(miembro) as origen, \
+            open(ruta_destino, "wb") as destino:
+        copyfileobj(origen, destino)
+
+
+async def importar_equipos(session: AsyncSession, registros: List[Dict[str, Any]],
+                           contenido_zip: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Crea en una sola transacción todos los equipos válidos del manifiesto.
+    Los nombres se comprueban contra la base con una única consulta y los logos del zip se
+    extraen en paralelo fuera del event loop. Las filas con error se informan y no se crean.
+    """
+    errores: List[Dict[str, Any]] = []
+    miembros_zip: Dict[str, str] = {}
+    if contenido_zip:
+        try:
+            with zipfile.ZipFile(io.BytesIO(contenido_zip)) as archivo:
+                # Se busca por nombre de archivo, sin importar la carpeta dentro del zip
+                miembros_zip = {os.path.basename(m): m for m in archivo.namelist() if not m.endswith("/")}
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="El archivo de logos no es un zip válido.")
+
+    candidatos: List[tuple] = []  # (fila, equipo, miembro del zip o None)
+    nombres_vistos = set()
+    for numero, registro in enumerate(registros, start=1):
+        datos = {campo: valor for campo, valor in registro.items()
+                 if valor not in (None, "") and campo not in CAMPOS_NO_IMPORTABLES}
+        logo = datos.pop("logo", None)
+        datos.setdefault("puntos", 0)
+        for campo in CAMPOS_ESTADISTICAS_EQUIPO:
+            datos[campo] = 0
+        try:
+            equipo = EquipoSQL.model_validate(datos)
+        except ValidationError as e:
+            errores.append({"fila": numero, "error": _mensaje_validacion(e)})
+            continue
+        equipo.nombre = normalizar_nombre(equipo.nombre)
+        if equipo.nombre in nombres_vistos:
+            errores.append({"fila": numero, "error": f"El equipo '{equipo.nombre}' está repetido en el manifiesto."})
+            continue
+        if logo is not None:
+            logo = os.path.basename(str(logo))
+            if os.path.splitext(logo)[1].lower() not in EXTENSIONES_LOGO:
+                errores.append({"fila": numero, "error": f"Formato de imagen no válido para '{logo}' (solo .png o .jpg)"})
+                continue
+            if logo not in miembros_zip:
+                errores.append({"fila": numero, "error": f"El logo '{logo}' no está en el zip."})
+                continue
+        nombres_vistos.add(equipo.nombre)
+        candidatos.append((numero, equipo, miembros_zip.get(logo)))
+
+    # Una sola consulta para todos los nombres del lote
+    if nombres_vistos:
+        result = await session.execute(
+            select(EquipoSQL.nombre).where(EquipoSQL.nombre.in_(nombres_vistos), EquipoSQL.esta_activo == True)
+        )
+        existentes = set(result.scalars().all())
+        for numero, equipo, _ in candidatos:
+            if equipo.nombre in existentes:
+                errores.append({"fila": numero, "error": f"El equipo '{equipo.nombre}' ya existe y está activo."})
+        candidatos = [candidato for candidato in candidatos if candidato[1].nombre not in existentes]
+
+    # Extraer los logos en paralelo en hilos
+    rutas_logos = []
+    extracciones = []
+    for _, equipo, miembro in candidatos:
+        if miembro is None:
+            continue
+        nombre_archivo = f"{uuid.uuid4().hex}{os.path.splitext(miembro)[1].lower()}"
+        ruta = os.path.join(CARPETA_LOGOS, nombre_archivo)
+        equipo.logo_url = f"img/{nombre_archivo}"
+        rutas_logos.append(ruta)
+        extracciones.append(asyncio.to_thread(_extraer_logo, contenido_zip, miembro, ruta))
+    if extracciones:
+        os.makedirs(CARPETA_LOGOS, exist_ok=True)
+        # return_exceptions: esperar a que terminen todos los hilos antes de borrar lo que alcanzaron a escribir
+        fallos = [r for r in await asyncio.gather(*extracciones, return_exceptions=True) if isinstance(r, BaseException)]
+        if fallos:
+            _borrar_logos(rutas_logos)
+            raise fallos[0]
+
+    equipos = [equipo for _, equipo, _ in candidatos]
+    if equipos:
+        try:
+            async with unidad_de_trabajo(session):
+                session.add_all(equipos)
+                await session.flush()  # INSERT por lotes; trae los IDs para la tabla de posiciones
+                session.add_all([PosicionGrupoSQL(equipo_id=equipo.id, grupo=equipo.grupo) for equipo in equipos])
+                await regenerar_reportes_por_pais(session, {equipo.pais for equipo in equipos})
+                for equipo in equipos:
+                    registrar_cambio_equipo(session, equipo)
+        except Exception:
+            _borrar_logos(rutas_logos)
+            raise
+
+    print(f"DEBUG (operations): Importación de equipos: {len(equipos)} creados, {len(errores)} filas con error.")
+    return {
+        "insertados": len(equipos),
+        "equipos": [{"id": e.id, "nombre": e.nombre, "logo_url": e.logo_url} for e in equipos],
+        "errores": sorted(errores, key=lambda error: error["fila"]),
+    }
+
+
 async def obtener_todos_los_equipos_inactivos(session: AsyncSession) -> List[EquipoSQL]:
     """
     Obtiene todos los equipos cuyo campo 'esta_activo' es False.
@@ -97,11 +637,14 @@ async def obtener_todos_los_equipos_inactivos(session: AsyncSession) -> List[Equ
     )
     return result.scalars().all()
 
+@SENTENCIAS.registrar
+def _sql_equipo_activo_por_id():
+    return select(EquipoSQL).where(EquipoSQL.id == bindparam("equipo_id"), EquipoSQL.esta_activo == True)
+
+
 async def obtener_equipo_por_id(session: AsyncSession, equipo_id: int) -> Optional[EquipoSQL]:
     """Obtiene un equipo por ID, solo si está activo."""
-    result = await session.execute(
-        select(EquipoSQL).where(EquipoSQL.id == equipo_id, EquipoSQL.esta_activo == True)  # <-- Filtra por activo
-    )
+    result = await session.execute(_sql_equipo_activo_por_id(), {"equipo_id": equipo_id})
     return result.scalars().first()
 
 
@@ -113,6 +656,70 @@ async def obtener_todos_los_equipos(session: AsyncSession) -> List[EquipoSQL]:
     return list(result.scalars().all())
 
 
+async def obtener_catalogo_equipos(session: AsyncSession) -> List[EquipoCatalogo]:
+    """
+    Equipos activos para los selectores de los formularios, desde el catálogo en memoria si está cargado.
+    Si no, lo carga siempre de la primaria, aunque la petición lea de la réplica: lo que se cargue vale
+    para todas las peticiones hasta la próxima escritura.
+    """
+    equipos = CATALOGO_EQUIPOS.listar()
+    if equipos is not None:
+        return equipos
+    generacion = CATALOGO_EQUIPOS.generacion
+    result = await sesion_primaria(session).execute(
+        select(EquipoSQL.id, EquipoSQL.nombre, EquipoSQL.pais, EquipoSQL.grupo, EquipoSQL.logo_url)
+        .where(EquipoSQL.esta_activo == True)
+        .order_by(EquipoSQL.id)
+    )
+    equipos = [EquipoCatalogo(*fila) for fila in result.all()]
+    CATALOGO_EQUIPOS.cargar(equipos, generacion)
+    return equipos
+
+
+TAMANO_PAGINA = int(os.getenv("TAMANO_PAGINA", "20"))
+TAMANO_PAGINA_MAXIMO = 100
+
+
+async def _pagina_por_id(session: AsyncSession, consulta, modelo, limite: int,
+                         despues_de: Optional[int] = None, antes_de: Optional[int] = None,
+                         proyeccion: Optional[Callable] = None) -> Pagina:
+    """
+    Paginación por cursor sobre la clave primaria: WHERE id > cursor ORDER BY id LIMIT n+1, sin OFFSET,
+    así cada página cuesta lo mismo sin importar cuántas filas queden atrás. Con 'antes_de' se
+    recorre hacia atrás (id < cursor en orden descendente) y se invierte el resultado.
+    Si la consulta selecciona columnas sueltas, 'proyeccion' convierte cada fila en un objeto con 'id'.
+    """
+    limite = max(1, min(limite, TAMANO_PAGINA_MAXIMO))
+    if antes_de is not None:
+        consulta = consulta.where(modelo.id < antes_de).order_by(modelo.id.desc())
+    else:
+        if despues_de is not None:
+            consulta = consulta.where(modelo.id > despues_de)
+        consulta = consulta.order_by(modelo.id)
+    result = await session.execute(consulta.limit(limite + 1))
+    if proyeccion is not None:
+        filas = [proyeccion(fila) for fila in result.all()]
+    else:
+        filas = list(result.scalars().unique().all())
+    hay_mas = len(filas) > limite  # La fila extra solo indica si existe otra página en ese sentido
+    filas = filas[:limite]
+    if antes_de is not None:
+        filas.reverse()
+        siguiente = filas[-1].id if filas else None
+        anterior = filas[0].id if hay_mas else None
+    else:
+        siguiente = filas[-1].id if hay_mas else None
+        anterior = filas[0].id if filas and despues_de is not None else None
+    return Pagina(items=filas, limite=limite, siguiente=siguiente, anterior=anterior)
+
+
+async def obtener_pagina_equipos(session: AsyncSession, limite: int = TAMANO_PAGINA,
+                                 despues_de: Optional[int] = None, antes_de: Optional[int] = None,
+                                 activos: bool = True) -> Pagina:
+    consulta = select(EquipoSQL).where(EquipoSQL.esta_activo == activos)
+    return await _pagina_por_id(session, consulta, EquipoSQL, limite, despues_de, antes_de)
+
+
 async def obtener_equipos_por_pais(session: AsyncSession, pais: str) -> List[EquipoSQL]:
     """Obtiene equipos por país, solo si están activos."""
     result = await session.execute(
@@ -141,6 +748,7 @@ async def actualizar_equipo_sql(session: AsyncSession, equipo_id: int, datos_act
         return None
 
     pais_anterior = equipo_existente.pais  # Guardar para posible recálculo de reporte
+    grupo_anterior = equipo_existente.grupo
 
     for key, value in datos_actualizados.items():
         if hasattr(equipo_existente, key) and key not in ['id', 'puntos', 'logo_url', 'goles_a_favor',
@@ -150,25 +758,20 @@ async def actualizar_equipo_sql(session: AsyncSession, equipo_id: int, datos_act
             if key == 'nombre':
                 value = normalizar_nombre(value)
                 # Verificar si el nuevo nombre ya está tomado por un equipo ACTIVO diferente
-                existing_by_name = await session.execute(
-                    select(EquipoSQL).where(EquipoSQL.nombre == value, EquipoSQL.id != equipo_id,
-                                            EquipoSQL.esta_activo == True)  # <-- Filtra por activo
-                )
-                if existing_by_name.first():
+                if await existe_equipo_activo_con_nombre(session, value, excluir_id=equipo_id):
                     raise HTTPException(status_code=400,
                                         detail=f"El nombre '{value}' ya está en uso por otro equipo activo.")
             setattr(equipo_existente, key, value)
 
     session.add(equipo_existente)
-    await session.commit()
-    await session.refresh(equipo_existente)
+    await sincronizar_grupo_posicion(session, equipo_existente)
+    if pais_anterior != equipo_existente.pais or grupo_anterior != equipo_existente.grupo:
+        await reconstruir_cubo_estadisticas(session)  # Sus partidos cambian de celda
 
-    # Si el país del equipo cambió, actualizar los reportes de ambos países
-    if pais_anterior != equipo_existente.pais:
-        await actualizar_reporte_por_pais(session, pais_anterior)  # Recalcular el viejo país
-        await actualizar_reporte_por_pais(session, equipo_existente.pais)  # Recalcular el nuevo país
-    else:
-        await actualizar_reporte_por_pais(session, equipo_existente.pais)  # Recalcular solo el país actual si no cambió
+    # Si el país del equipo cambió, actualizar los reportes de ambos países (en el mismo upsert)
+    await regenerar_reportes_por_pais(session, {pais_anterior, equipo_existente.pais})
+    registrar_cambio_equipo(session, equipo_existente)
+    await confirmar_cambios(session, equipo_existente)
 
     print(f"DEBUG (operations): Equipo con ID {equipo_id} actualizado exitosamente.")
     return equipo_existente
@@ -189,6 +792,7 @@ async def eliminar_equipo_sql(session: AsyncSession, equipo_id: int) -> bool:
     # Marcar el equipo como inactivo
     equipo.esta_activo = False
     session.add(equipo)
+    registrar_cambio_equipo(session, equipo)
 
     # Marcar todos los partidos donde este equipo sea local o visitante como inactivos
     # Es importante que estos partidos no contribuyan a las estadísticas de otros equipos
@@ -206,28 +810,35 @@ async def eliminar_equipo_sql(session: AsyncSession, equipo_id: int) -> bool:
     partidos_afectados = result_partidos.scalars().all()
 
     equipos_a_recalcular = set()  # Para evitar recalcular el mismo equipo varias veces
+    fases_afectadas = set()
 
     for p in partidos_afectados:
+        instantanea = instantanea_partido(p)
         p.esta_activo = False  # Marca el partido como inactivo
         session.add(p)
+        await registrar_evento_partido(session, p, TipoEventoPartido.eliminado, instantanea, None)
+        fases_afectadas.add(p.fase)
         # Añadir el otro equipo del partido para recalcular sus estadísticas
         if p.equipo_local_id != equipo_id:
             equipos_a_recalcular.add(p.equipo_local_id)
         if p.equipo_visitante_id != equipo_id:
             equipos_a_recalcular.add(p.equipo_visitante_id)
 
-    await session.commit()
-    await session.refresh(equipo)  # Refrescar el equipo para asegurar que tiene el nuevo estado
-
-    # Recalcular estadísticas para los equipos afectados (los que no son el que se eliminó)
-    for id_equipo_recalcular in equipos_a_recalcular:
-        # Solo recalcular si el otro equipo sigue activo
-        otro_equipo = await session.get(EquipoSQL, id_equipo_recalcular)
-        if otro_equipo and otro_equipo.esta_activo:
-            await recalcular_estadisticas_equipo(session, id_equipo_recalcular)
-
-    # Recalcular el reporte del país del equipo eliminado
-    await actualizar_reporte_por_pais(session, pais_equipo)
+    # Rehacer la tabla de posiciones de los afectados (el equipo eliminado sale de ella) y el cubo
+    await reconstruir_posiciones_grupos(session, equipos_a_recalcular | {equipo_id})
+    await reconstruir_cubo_estadisticas(session)
+    # Recalcular los equipos afectados en bloque, en la misma transacción que la baja
+    await recalcular_estadisticas_equipos(session, equipos_a_recalcular, confirmar=False)
+
+    # Recalcular el reporte del país del equipo eliminado, los de los países de sus rivales
+    # y los de las fases de los partidos anulados
+    paises_afectados = {pais_equipo}
+    for id_equipo_afectado in equipos_a_recalcular:
+        otro_equipo = await session.get(EquipoSQL, id_equipo_afectado)
+        if otro_equipo:
+            paises_afectados.add(otro_equipo.pais)
+    await regenerar_reportes(session, paises_afectados, fases_afectadas)
+    await confirmar_cambios(session)
 
     print(
         f"DEBUG (operations): Equipo con ID {equipo_id} marcado como inactivo exitosamente y partidos asociados actualizados.")
@@ -261,12 +872,19 @@ async def actualizar_grupo_y_puntos_equipo(
     if not equipo:
         raise HTTPException(status_code=404, detail="Equipo no encontrado.")
 
+    grupo_anterior = equipo.grupo
+    puntos_anteriores = equipo.puntos
     equipo.grupo = nuevo_grupo
     equipo.puntos = nuevos_puntos
 
     session.add(equipo)
-    await session.commit()
-    await session.refresh(equipo)
+    await sincronizar_grupo_posicion(session, equipo)
+    if grupo_anterior != equipo.grupo:
+        await reconstruir_cubo_estadisticas(session)  # Sus partidos cambian de celda
+    if puntos_anteriores != equipo.puntos:
+        await regenerar_reportes_por_pais(session, [equipo.pais])  # total_puntos del país
+    registrar_cambio_equipo(session, equipo)
+    await confirmar_cambios(session, equipo)
     return equipo
 
 # --- Modificaciones para PartidoSQL ---
@@ -281,6 +899,81 @@ async def obtener_todos_los_partidos(session: AsyncSession) -> List[PartidoSQL]:
     )
     return result.scalars().all()
 
+async def obtener_pagina_partidos(session: AsyncSession, limite: int = TAMANO_PAGINA,
+                                  despues_de: Optional[int] = None, antes_de: Optional[int] = None,
+                                  activos: Optional[bool] = None) -> Pagina:
+    """Página de partidos con sus equipos; activos=None incluye activos e inactivos."""
+    consulta = select(PartidoSQL).options(
+        selectinload(PartidoSQL.equipo_local),
+        selectinload(PartidoSQL.equipo_visitante)
+    )
+    if activos is not None:
+        consulta = consulta.where(PartidoSQL.esta_activo == activos)
+    return await _pagina_por_id(session, consulta, PartidoSQL, limite, despues_de, antes_de)
+
+# --- Lecturas por proyección para los listados ---
+# Los listados solo muestran nombre y logo de cada equipo: en vez de cargar dos EquipoSQL completos
+# por partido (y registrarlos en el identity map), se seleccionan las columnas justas y cada fila
+# se convierte en un objeto liviano con los mismos nombres de atributo que usan las plantillas.
+
+class EquipoResumen:
+    __slots__ = ("id", "nombre", "logo_url")
+
+    def __init__(self, id: int, nombre: str, logo_url: Optional[str]):
+        self.id = id
+        self.nombre = nombre
+        self.logo_url = logo_url
+
+
+class PartidoResumen:
+    COLUMNAS = ("id", "fase", "esta_activo", "created_at", "updated_at", "equipo_local_id",
+                "equipo_visitante_id", *COLUMNAS_ESTADISTICAS_PARTIDO)
+    __slots__ = (*COLUMNAS, "equipo_local", "equipo_visitante")
+
+    @classmethod
+    def desde_fila(cls, fila) -> "PartidoResumen":
+        # La fila trae las COLUMNAS en orden y al final nombre y logo del local y del visitante
+        partido = cls.__new__(cls)
+        for columna, valor in zip(cls.COLUMNAS, fila):
+            setattr(partido, columna, valor)
+        local_nombre, local_logo, visitante_nombre, visitante_logo = fila[len(cls.COLUMNAS):]
+        partido.equipo_local = (EquipoResumen(partido.equipo_local_id, local_nombre, local_logo)
+                                if local_nombre is not None else None)
+        partido.equipo_visitante = (EquipoResumen(partido.equipo_visitante_id, visitante_nombre, visitante_logo)
+                                    if visitante_nombre is not None else None)
+        return partido
+
+
+# Alias fijos: uno nuevo en cada llamada cambiaría la clave de la caché de sentencias compiladas
+_EQUIPO_LOCAL = aliased(EquipoSQL, name="equipo_local")
+_EQUIPO_VISITANTE = aliased(EquipoSQL, name="equipo_visitante")
+
+
+def _consulta_resumen_partidos(activos: Optional[bool] = None):
+    local, visitante = _EQUIPO_LOCAL, _EQUIPO_VISITANTE
+    consulta = (
+        select(*(getattr(PartidoSQL, columna) for columna in PartidoResumen.COLUMNAS),
+               local.nombre, local.logo_url, visitante.nombre, visitante.logo_url)
+        .outerjoin(local, local.id == PartidoSQL.equipo_local_id)
+        .outerjoin(visitante, visitante.id == PartidoSQL.equipo_visitante_id)
+    )
+    if activos is not None:
+        consulta = consulta.where(PartidoSQL.esta_activo == activos)
+    return consulta
+
+
+async def obtener_pagina_partidos_resumen(session: AsyncSession, limite: int = TAMANO_PAGINA,
+                                          despues_de: Optional[int] = None, antes_de: Optional[int] = None,
+                                          activos: Optional[bool] = None) -> Pagina:
+    """Como obtener_pagina_partidos, pero con PartidoResumen en lugar de objetos del ORM."""
+    return await _pagina_por_id(session, _consulta_resumen_partidos(activos), PartidoSQL, limite,
+                                despues_de, antes_de, proyeccion=PartidoResumen.desde_fila)
+
+
+async def obtener_resumen_partidos(session: AsyncSession, activos: Optional[bool] = None) -> List[PartidoResumen]:
+    result = await session.execute(_consulta_resumen_partidos(activos).order_by(PartidoSQL.id))
+    return [PartidoResumen.desde_fila(fila) for fila in result.all()]
+
 async def obtener_todos_los_partidos_inactivos(session: AsyncSession) -> List[PartidoSQL]:
     result = await session.execute(
         select(PartidoSQL).where(PartidoSQL.esta_activo == False)
@@ -288,18 +981,21 @@ async def obtener_todos_los_partidos_inactivos(session: AsyncSession) -> List[Pa
     )
     return result.scalars().unique().all()
 
+@SENTENCIAS.registrar
+def _sql_partido_por_id():
+    return (select(PartidoSQL)
+            .where(PartidoSQL.id == bindparam("partido_id"))
+            .options(selectinload(PartidoSQL.equipo_local),
+                     selectinload(PartidoSQL.equipo_visitante)))
+
+
 async def obtener_partido_por_id(session: AsyncSession, partido_id: int) -> Optional[PartidoSQL]:
     """
     Busca un partido por su ID, cargando los equipos relacionados.
     """
     print(f"DEBUG: [operations.py] Buscando partido con ID: {partido_id}")
     try:
-        result = await session.execute(
-            select(PartidoSQL)
-            .where(PartidoSQL.id == partido_id)
-            .options(selectinload(PartidoSQL.equipo_local),
-                     selectinload(PartidoSQL.equipo_visitante))
-        )
+        result = await session.execute(_sql_partido_por_id(), {"partido_id": partido_id})
         partido = result.scalar_one_or_none()
         if partido:
             print(f"DEBUG: [operations.py] Partido ENCONTRADO: ID={partido.id}, Goles Local={partido.goles_local}, Goles Visitante={partido.goles_visitante}")
@@ -322,14 +1018,13 @@ async def create_partido_sql(session: AsyncSession, partido: PartidoSQL) -> Part
     # Establecer esta_activo a True por defecto si no se especificó (o explícitamente)
     partido.esta_activo = True
     session.add(partido)
-    await session.commit()
-    await session.refresh(partido)
-    print(f"DEBUG (operations): Partido creado con ID {partido.id}.")
 
-    # Actualizar estadísticas de equipos involucrados si el partido es activo
-    if partido.esta_activo:
-        await recalcular_estadisticas_equipo(session, partido.equipo_local_id)
-        await recalcular_estadisticas_equipo(session, partido.equipo_visitante_id)
+    # Sumar el partido a las estadísticas y a la tabla de posiciones en la misma transacción
+    await propagar_cambio_partido(session, None, instantanea_partido(partido))
+    await registrar_evento_partido(session, partido, TipoEventoPartido.creado, None, instantanea_partido(partido))
+
+    await confirmar_cambios(session, partido)
+    print(f"DEBUG (operations): Partido creado con ID {partido.id}.")
 
     return partido
 
@@ -347,26 +1042,9 @@ Optional[PartidoSQL]:
         print(f"DEBUG (operations): Partido con ID {partido_id} no encontrado para actualizar.")
         return None
 
-    # Guardar las estadísticas originales del partido antes de la actualización
+    # Aporte original del partido (None si está inactivo)
     # Esto es necesario para calcular las diferencias para los equipos
-    stats_originales = {
-        "goles_local": partido_existente.goles_local,
-        "goles_visitante": partido_existente.goles_visitante,
-        "tarjetas_amarillas_local": partido_existente.tarjetas_amarillas_local,
-        "tarjetas_amarillas_visitante": partido_existente.tarjetas_amarillas_visitante,
-        "tarjetas_rojas_local": partido_existente.tarjetas_rojas_local,
-        "tarjetas_rojas_visitante": partido_existente.tarjetas_rojas_visitante,
-        "tiros_esquina_local": partido_existente.tiros_esquina_local,
-        "tiros_esquina_visitante": partido_existente.tiros_esquina_visitante,
-        "tiros_libres_local": partido_existente.tiros_libres_local,
-        "tiros_libres_visitante": partido_existente.tiros_libres_visitante,
-        "faltas_local": partido_existente.faltas_local,
-        "faltas_visitante": partido_existente.faltas_visitante,
-        "fueras_de_juego_local": partido_existente.fueras_de_juego_local,
-        "fueras_de_juego_visitante": partido_existente.fueras_de_juego_visitante,
-        "pases_local": partido_existente.pases_local,
-        "pases_visitante": partido_existente.pases_visitante,
-    }
+    instantanea_original = instantanea_partido(partido_existente)
 
     # Actualizar los campos del objeto partido_existente
     for key, value in datos_actualizados.items():
@@ -391,87 +1069,297 @@ Optional[PartidoSQL]:
                 setattr(partido_existente, key, value)
 
     session.add(partido_existente)
-    await session.commit()
-    await session.refresh(partido_existente)  # Asegura que el objeto tenga los datos más recientes
 
-    # Después de actualizar el partido, recalcular las estadísticas de los equipos
-    await recalcular_estadisticas_equipo(session, partido_existente.equipo_local_id)
-    await recalcular_estadisticas_equipo(session, partido_existente.equipo_visitante_id)
+    # Aplicar a los equipos solo la diferencia entre el partido anterior y el actualizado
+    await propagar_cambio_partido(session, instantanea_original, instantanea_partido(partido_existente))
+    await registrar_evento_partido(session, partido_existente, TipoEventoPartido.actualizado,
+                                   instantanea_original, instantanea_partido(partido_existente))
+
+    await confirmar_cambios(session, partido_existente)
 
     print(
         f"DEBUG (operations): Partido con ID {partido_id} y estadísticas de equipos relacionados actualizados exitosamente.")
     return partido_existente
 
 
+# --- Importación masiva de partidos (NDJSON o CSV en streaming) ---
+TAMANO_LOTE_IMPORTACION = 500
+COLUMNAS_IMPORTACION_PARTIDO: List[str] = ["equipo_local_id", "equipo_visitante_id", "fase", *COLUMNAS_ESTADISTICAS_PARTIDO]
+
+
+async def leer_lineas(flujo: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Corta en líneas un cuerpo que llega por trozos, sin cargarlo entero en memoria. Las líneas salen
+    sin decodificar: filas_importacion las decodifica una a una para que un byte inválido sea un error
+    de esa fila y no de toda la importación.
+    """
+    pendiente = b""
+    async for trozo in flujo:
+        pendiente += trozo
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            yield linea.rstrip(b"\r")
+    if pendiente:
+        yield pendiente.rstrip(b"\r")
+
+
+async def filas_importacion(lineas: AsyncIterator[bytes], formato: str) -> AsyncIterator[tuple]:
+    """Produce (número de fila, datos o mensaje de error) por cada línea no vacía del archivo."""
+    encabezado = None
+    numero = 0
+    async for crudo in lineas:
+        if not crudo.strip():
+            continue
+        if formato == "csv" and encabezado is None:
+            try:
+                linea = crudo.decode("utf-8-sig")
+            except UnicodeDecodeError as e:
+                # Sin encabezado no hay cómo leer las filas: se informa y no se importa nada
+                yield 0, f"Encabezado ilegible: {e}"
+                return
+            encabezado = [columna.strip() for columna in next(csv.reader([linea]))]
+            continue
+        numero += 1
+        try:
+            linea = crudo.decode("utf-8-sig")  # UnicodeDecodeError también es ValueError
+            if formato == "csv":
+                valores = next(csv.reader([linea]))
+                if len(valores) != len(encabezado):
+                    raise ValueError(f"se esperaban {len(encabezado)} columnas y llegaron {len(valores)}")
+                datos = dict(zip(encabezado, valores))
+            else:
+                datos = json.loads(linea)
+                if not isinstance(datos, dict):
+                    raise ValueError("cada línea debe ser un objeto JSON")
+        except ValueError as e:  # json.JSONDecodeError también es ValueError
+            yield numero, f"Fila ilegible: {e}"
+            continue
+        yield numero, datos
+
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(parte) for parte in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+async def _insertar_lote_partidos(session: AsyncSession, lote: List[tuple], resultado: Dict[str, Any]) -> None:
+    # Un INSERT multi-fila con RETURNING en una unidad anidada (savepoint): si la base rechaza el lote,
+    # solo se pierde ese lote
+    filas = [fila for _, fila in lote]
+    try:
+        async with unidad_de_trabajo(session):
+            ids = (await session.execute(insert(PartidoSQL).returning(PartidoSQL.id), filas)).scalars().all()
+            ahora = datetime.utcnow()
+            eventos = [
+                {"partido_id": partido_id, "tipo": TipoEventoPartido.creado, "antes": None,
+                 "despues": {**{c: fila[c] for c in COLUMNAS_IMPORTACION_PARTIDO}, "fase": fila["fase"].value},
+                 "created_at": ahora}
+                for partido_id, fila in zip(ids, filas)
+            ]
+            await session.execute(insert(EventoPartidoSQL), eventos)
+    except SQLAlchemyError as e:
+        print(f"ERROR (operations): Lote de importación rechazado por la base de datos: {e}")
+        resultado["errores"].extend({"fila": numero, "error": f"Error de base de datos: {e}"} for numero, _ in lote)
+        return
+    resultado["ids"].extend(ids)
+    for fila in filas:
+        resultado["_equipos"].update((fila["equipo_local_id"], fila["equipo_visitante_id"]))
+        resultado["_fases"].add(fila["fase"])
+
+
+async def importar_partidos(session: AsyncSession, filas: AsyncIterator[tuple],
+                            tamano_lote: int = TAMANO_LOTE_IMPORTACION) -> Dict[str, Any]:
+    """
+    Valida las filas a medida que llegan, inserta las válidas por lotes en una sola transacción y al final
+    recalcula en bloque estadísticas, posiciones, cubo y reportes de lo tocado. Las filas inválidas se
+    informan en "errores" sin detener la importación.
+    """
+    async with unidad_de_trabajo(session):  # Un solo commit para toda la importación
+        result = await session.execute(select(EquipoSQL.id).where(EquipoSQL.esta_activo == True))
+        equipos_activos = set(result.scalars().all())
+
+        resultado: Dict[str, Any] = {"filas": 0, "ids": [], "errores": [], "_equipos": set(), "_fases": set()}
+        lote: List[tuple] = []
+        async for numero, datos in filas:
+            resultado["filas"] += 1
+            if isinstance(datos, str):
+                resultado["errores"].append({"fila": numero, "error": datos})
+                continue
+            try:
+                partido = PartidoSQL.model_validate(datos)
+            except ValidationError as e:
+                resultado["errores"].append({"fila": numero, "error": _mensaje_validacion(e)})
+                continue
+            if partido.equipo_local_id == partido.equipo_visitante_id:
+                resultado["errores"].append({"fila": numero, "error": "El equipo local y el visitante no pueden ser el mismo."})
+                continue
+            faltantes = {partido.equipo_local_id, partido.equipo_visitante_id} - equipos_activos
+            if faltantes:
+                resultado["errores"].append({"fila": numero, "error": f"Equipos inexistentes o inactivos: {sorted(faltantes)}"})
+                continue
+
+            fila = {columna: getattr(partido, columna) for columna in COLUMNAS_IMPORTACION_PARTIDO}
+            lote.append((numero, {**fila, "esta_activo": True, "created_at": datetime.utcnow()}))
+            if len(lote) >= tamano_lote:
+                await _insertar_lote_partidos(session, lote, resultado)
+                lote = []
+        if lote:
+            await _insertar_lote_partidos(session, lote, resultado)
+
+        equipos, fases = resultado.pop("_equipos"), resultado.pop("_fases")
+        if resultado["ids"]:
+            # Un único recálculo por conjuntos al final, en lugar de uno por partido
+            await recalcular_estadisticas_equipos(session, equipos)
+            await reconstruir_posiciones_grupos(session, equipos)
+            await reconstruir_cubo_estadisticas(session)
+            result = await session.execute(select(EquipoSQL.pais).where(EquipoSQL.id.in_(equipos)).distinct())
+            await regenerar_reportes(session, result.scalars().all(), fases)
+            await snapshot_si_corresponde(session)
+
+    resultado["insertados"] = len(resultado["ids"])
+    print(f"DEBUG (operations): Importación de partidos: {resultado['insertados']} insertados, "
+          f"{len(resultado['errores'])} filas con error.")
+    return resultado
+
+
 # --- Eliminación suave de Partido ---
-async def eliminar_partido_sql(session: AsyncSession, partido_id: int) -> bool:
-    partido = await session.execute(
-        select(PartidoSQL)
-        .options(selectinload(PartidoSQL.equipo_local), selectinload(PartidoSQL.equipo_visitante))
-        .where(PartidoSQL.id == partido_id, PartidoSQL.esta_activo == True)
+async def _cambiar_estado_partido(session: AsyncSession, partido_id: int, activar: bool) -> bool:
+    """
+    Elimina (activar=False) o restaura (activar=True) un partido y mueve sus agregados. El cambio es un
+    UPDATE ... WHERE id = :id AND esta_activo = :anterior RETURNING: si dos peticiones llegan a la vez
+    solo una recibe la fila y aplica los deltas; la otra retorna False. La instantánea sale de esa fila.
+    """
+    result = await session.execute(
+        update(PartidoSQL)
+        .where(PartidoSQL.id == partido_id, PartidoSQL.esta_activo == (not activar))
+        .values(esta_activo=activar)
+        .returning(*COLUMNAS_INSTANTANEA_PARTIDO)
+        .execution_options(synchronize_session=False)
     )
-    partido = partido.scalar_one_or_none()
-
-    if not partido:
+    fila = result.first()
+    if fila is None:
         return False
+    _sincronizar_en_sesion(session, PartidoSQL, partido_id, {"esta_activo": activar})
+    instantanea = dict(fila._mapping)
+    antes, despues = (None, instantanea) if activar else (instantanea, None)
+
+    # Estadísticas y puntos de ambos equipos: un UPDATE atómico por equipo, en SQL con tope en cero
+    delta_equipos = calcular_delta_estadisticas(_aportes_equipo_con_puntos(antes), _aportes_equipo_con_puntos(despues),
+                                                CAMPOS_EQUIPO_CON_PUNTOS)
+    aplicados = await aplicar_delta_estadisticas(session, delta_equipos)
+    await actualizar_posiciones_partido(session, antes, despues)
+    await actualizar_cubo_partido(session, antes, despues)
+    await aplicar_delta_reportes(session, aplicados, antes, despues)
+    tipo = TipoEventoPartido.restaurado if activar else TipoEventoPartido.eliminado
+    await _agregar_evento_partido(session, partido_id, tipo, antes, despues)
+    await confirmar_cambios(session)
+    return True
 
-    equipo_local = partido.equipo_local
-    equipo_visitante = partido.equipo_visitante
 
-    if equipo_local and equipo_visitante:
-        # Revert points
-        if partido.goles_local > partido.goles_visitante:
-            equipo_local.puntos = restar_valor(equipo_local.puntos, 3)
-        elif partido.goles_visitante > partido.goles_local:
-            equipo_visitante.puntos = restar_valor(equipo_visitante.puntos, 3)
-        else:
-            equipo_local.puntos = restar_valor(equipo_local.puntos, 1)
-            equipo_visitante.puntos = restar_valor(equipo_visitante.puntos, 1)
-
-        # Revert other statistics for local team
-        equipo_local.goles_a_favor = restar_valor(equipo_local.goles_a_favor, partido.goles_local)
-        equipo_local.goles_en_contra = restar_valor(equipo_local.goles_en_contra, partido.goles_visitante)
-        equipo_local.tarjetas_amarillas = restar_valor(equipo_local.tarjetas_amarillas, partido.tarjetas_amarillas_local)
-        equipo_local.tarjetas_rojas = restar_valor(equipo_local.tarjetas_rojas, partido.tarjetas_rojas_local)
-        equipo_local.tiros_esquina = restar_valor(equipo_local.tiros_esquina, partido.tiros_esquina_local)
-        equipo_local.tiros_libres = restar_valor(equipo_local.tiros_libres, partido.tiros_libres_local)
-        equipo_local.faltas = restar_valor(equipo_local.faltas, partido.faltas_local)
-        equipo_local.fueras_de_juego = restar_valor(equipo_local.fueras_de_juego, partido.fueras_de_juego_local)
-        equipo_local.pases = restar_valor(equipo_local.pases, partido.pases_local)
-
-        # Revert other statistics for visiting team
-        equipo_visitante.goles_a_favor = restar_valor(equipo_visitante.goles_a_favor, partido.goles_visitante)
-        equipo_visitante.goles_en_contra = restar_valor(equipo_visitante.goles_en_contra, partido.goles_local)
-        equipo_visitante.tarjetas_amarillas = restar_valor(equipo_visitante.tarjetas_amarillas, partido.tarjetas_amarillas_visitante)
-        equipo_visitante.tarjetas_rojas = restar_valor(equipo_visitante.tarjetas_rojas, partido.tarjetas_rojas_visitante)
-        equipo_visitante.tiros_esquina = restar_valor(equipo_visitante.tiros_esquina, partido.tiros_esquina_visitante)
-        equipo_visitante.tiros_libres = restar_valor(equipo_visitante.tiros_libres, partido.tiros_libres_visitante)
-        equipo_visitante.faltas = restar_valor(equipo_visitante.faltas, partido.faltas_visitante)
-        equipo_visitante.fueras_de_juego = restar_valor(equipo_visitante.fueras_de_juego, partido.fueras_de_juego_visitante)
-        equipo_visitante.pases = restar_valor(equipo_visitante.pases, partido.pases_visitante)
-
-
-        session.add(equipo_local)
-        session.add(equipo_visitante)
-        await session.commit()
-        await session.refresh(equipo_local)
-        await session.refresh(equipo_visitante)
-
-    partido.esta_activo = False
-    session.add(partido)
-    await session.commit()
-    await session.refresh(partido)
-    return True
+async def eliminar_partido_sql(session: AsyncSession, partido_id: int) -> bool:
+    return await _cambiar_estado_partido(session, partido_id, activar=False)
 
 
-# --- Recalcular estadísticas del equipo: Asegúrate de que solo suma partidos activos ---
-async def recalcular_estadisticas_equipo(session: AsyncSession, equipo_id: int):
-    print(f"DEBUG (operations): Recalculando estadísticas para Equipo ID: {equipo_id}")
-    equipo = await session.get(EquipoSQL, equipo_id)
-    if not equipo or not equipo.esta_activo:  # Solo recalcular si el equipo está activo
-        print(f"ADVERTENCIA: Equipo con ID {equipo_id} no encontrado o inactivo para recalcular estadísticas.")
+# --- Eliminación / restauración de partidos por lotes ---
+async def aplicar_delta_estadisticas_lote(session: AsyncSession, delta: Dict[int, Dict[str, int]]) -> None:
+    """
+    Como aplicar_delta_estadisticas pero para muchos equipos: una sola sentencia
+    col = GREATEST(col + :d_col, 0) ejecutada por lotes (executemany). No hace commit.
+    """
+    if not delta:
         return
+    tabla = EquipoSQL.__table__
+    sentencia = (
+        update(tabla)
+        .where(tabla.c.id == bindparam("b_id"), tabla.c.esta_activo == True)
+        .values({campo: mayor_entre(tabla.c[campo] + bindparam(f"d_{campo}"), 0) for campo in CAMPOS_EQUIPO_CON_PUNTOS})
+    )
+    await session.execute(sentencia, [
+        {"b_id": equipo_id, **{f"d_{campo}": cambios.get(campo, 0) for campo in CAMPOS_EQUIPO_CON_PUNTOS}}
+        for equipo_id, cambios in delta.items()
+    ])
+    # executemany no admite RETURNING en un UPDATE: se releen los valores en una consulta
+    result = await session.execute(
+        select(EquipoSQL.id, *[getattr(EquipoSQL, campo) for campo in CAMPOS_EQUIPO_CON_PUNTOS])
+        .where(EquipoSQL.id.in_(delta))
+    )
+    _sincronizar_equipos_en_sesion(session, [dict(fila._mapping) for fila in result.all()])
+
 
+async def cambiar_estado_partidos(session: AsyncSession, partido_ids: Iterable[int], activar: bool) -> Dict[int, str]:
+    """
+    Elimina (activar=False) o restaura (activar=True) varios partidos a la vez:
+    un único UPDATE ... WHERE id IN (...) RETURNING, los deltas de todos los partidos sumados por
+    equipo y escritos en un UPDATE por lotes, y un único commit.
+    Retorna el resultado por ID: "eliminado"/"restaurado", "sin_cambios" o "no_encontrado".
+    """
+    ids = set(partido_ids)
+    if not ids:
+        return {}
+
+    result = await session.execute(
+        update(PartidoSQL)
+        .where(PartidoSQL.id.in_(ids), PartidoSQL.esta_activo == (not activar))
+        .values(esta_activo=activar)
+        .returning(PartidoSQL.id, *COLUMNAS_INSTANTANEA_PARTIDO)
+    )
+    cambiados = {fila.id: {campo: valor for campo, valor in fila._mapping.items() if campo != "id"}
+                 for fila in result.all()}
+
+    resultados: Dict[int, str] = {partido_id: ("restaurado" if activar else "eliminado") for partido_id in cambiados}
+    restantes = ids - set(cambiados)
+    if restantes:
+        result = await session.execute(select(PartidoSQL.id).where(PartidoSQL.id.in_(restantes)))
+        existentes = set(result.scalars().all())
+        resultados.update({partido_id: "sin_cambios" if partido_id in existentes else "no_encontrado"
+                           for partido_id in restantes})
+    if not cambiados:
+        return resultados
+
+    # Antes y después de cada partido cambiado (None = no aporta)
+    pares = [(None, instantanea) if activar else (instantanea, None) for instantanea in cambiados.values()]
+    equipo_ids = {instantanea[clave] for instantanea in cambiados.values()
+                  for clave in ("equipo_local_id", "equipo_visitante_id")}
+    result = await session.execute(select(EquipoSQL).where(EquipoSQL.id.in_(equipo_ids)))
+    equipos = {equipo.id: equipo for equipo in result.scalars().all()}  # Quedan en la sesión para lo que sigue
+
+    # Estadísticas y puntos: un delta combinado por equipo, aplicado en SQL en un solo UPDATE por lotes
+    await aplicar_delta_estadisticas_lote(session, combinar_deltas(*[
+        calcular_delta_estadisticas(_aportes_equipo_con_puntos(antes), _aportes_equipo_con_puntos(despues),
+                                    CAMPOS_EQUIPO_CON_PUNTOS)
+        for antes, despues in pares
+    ]))
+
+    # Tabla de posiciones y cubo: también un delta combinado
+    await aplicar_delta_posiciones(session, combinar_deltas(*[
+        calcular_delta_estadisticas(await _aportes_posiciones_instantanea(session, antes),
+                                    await _aportes_posiciones_instantanea(session, despues), CAMPOS_POSICIONES)
+        for antes, despues in pares
+    ]))
+    await aplicar_delta_cubo(session, combinar_deltas(*[
+        calcular_delta_estadisticas(await _aportes_cubo(session, antes), await _aportes_cubo(session, despues),
+                                    MEDIDAS_CUBO)
+        for antes, despues in pares
+    ]))
+    await regenerar_reportes(session, {equipo.pais for equipo in equipos.values()},
+                             {instantanea["fase"] for instantanea in cambiados.values()})
+
+    ahora = datetime.utcnow()
+    tipo = TipoEventoPartido.restaurado if activar else TipoEventoPartido.eliminado
+    await session.execute(insert(EventoPartidoSQL), [
+        {"partido_id": partido_id, "tipo": tipo, "antes": antes, "despues": despues, "created_at": ahora}
+        for partido_id, (antes, despues) in zip(cambiados, pares)
+    ])
+    await snapshot_si_corresponde(session)
+    await confirmar_cambios(session)
+    print(f"DEBUG (operations): {len(cambiados)} partidos {'restaurados' if activar else 'eliminados'} en lote.")
+    return resultados
+
+
+# --- Recalcular estadísticas del equipo: Asegúrate de que solo suma partidos activos ---
+# Recorre todos los partidos del equipo. Las escrituras normales usan deltas; esto queda
+# como ruta de verificación y reparación cuando los contadores se desajustan.
+async def calcular_estadisticas_equipo(session: AsyncSession, equipo_id: int) -> Dict[str, int]:
+    """Suma desde cero las estadísticas de un equipo a partir de sus partidos activos (no escribe nada)."""
     # Obtener todos los partidos ACTIVOS donde el equipo es local o visitante
     result = await session.execute(
         select(PartidoSQL).where(
@@ -482,54 +1370,367 @@ async def recalcular_estadisticas_equipo(session: AsyncSession, equipo_id: int):
     )
     partidos_del_equipo: List[PartidoSQL] = result.scalars().all()
 
-    total_goles_a_favor = 0
-    total_goles_en_contra = 0
-    total_tarjetas_amarillas = 0
-    total_tarjetas_rojas = 0
-    total_faltas = 0
-    total_fueras_de_juego = 0
-    total_tiros_esquina = 0
-    total_tiros_libres = 0
-    total_pases = 0
-
+    totales = {campo: 0 for campo in CAMPOS_ESTADISTICAS_EQUIPO}
     for p in partidos_del_equipo:
-        if p.equipo_local_id == equipo_id:
-            total_goles_a_favor += p.goles_local
-            total_goles_en_contra += p.goles_visitante
-            total_tarjetas_amarillas += p.tarjetas_amarillas_local
-            total_tarjetas_rojas += p.tarjetas_rojas_local
-            total_faltas += p.faltas_local
-            total_fueras_de_juego += p.fueras_de_juego_local
-            total_tiros_esquina += p.tiros_esquina_local
-            total_tiros_libres += p.tiros_libres_local
-            total_pases += p.pases_local
-        elif p.equipo_visitante_id == equipo_id:
-            total_goles_a_favor += p.goles_visitante
-            total_goles_en_contra += p.goles_local
-            total_tarjetas_amarillas += p.tarjetas_amarillas_visitante
-            total_tarjetas_rojas += p.tarjetas_rojas_visitante
-            total_faltas += p.faltas_visitante
-            total_fueras_de_juego += p.fueras_de_juego_visitante
-            total_tiros_esquina += p.tiros_esquina_visitante
-            total_tiros_libres += p.tiros_libres_visitante
-            total_pases += p.pases_visitante
+        aportes = aportes_partido(instantanea_partido(p))
+        for campo, valor in aportes[equipo_id].items():
+            totales[campo] += valor
+    return totales
+
+
+async def verificar_estadisticas_equipo(session: AsyncSession, equipo_id: int) -> Dict[str, Dict[str, int]]:
+    """
+    Compara las estadísticas guardadas de un equipo con las recalculadas desde sus partidos.
+    Retorna solo los campos que no coinciden: {campo: {"guardado": x, "calculado": y}}.
+    """
+    equipo = await obtener_equipo_y_manejar_error(session, equipo_id)
+    calculadas = await calcular_estadisticas_equipo(session, equipo_id)
+    return {
+        campo: {"guardado": getattr(equipo, campo), "calculado": valor}
+        for campo, valor in calculadas.items()
+        if getattr(equipo, campo) != valor
+    }
+
+
+async def recalcular_estadisticas_equipo(session: AsyncSession, equipo_id: int):
+    print(f"DEBUG (operations): Recalculando estadísticas para Equipo ID: {equipo_id}")
+    equipo = await session.get(EquipoSQL, equipo_id)
+    if not equipo or not equipo.esta_activo:  # Solo recalcular si el equipo está activo
+        print(f"ADVERTENCIA: Equipo con ID {equipo_id} no encontrado o inactivo para recalcular estadísticas.")
+        return
 
     # Actualizar el equipo con las nuevas estadísticas
-    equipo.goles_a_favor = total_goles_a_favor
-    equipo.goles_en_contra = total_goles_en_contra
-    equipo.tarjetas_amarillas = total_tarjetas_amarillas
-    equipo.tarjetas_rojas = total_tarjetas_rojas
-    equipo.faltas = total_faltas
-    equipo.fueras_de_juego = total_fueras_de_juego
-    equipo.tiros_esquina = total_tiros_esquina
-    equipo.tiros_libres = total_tiros_libres
-    equipo.pases = total_pases
+    for campo, valor in (await calcular_estadisticas_equipo(session, equipo_id)).items():
+        setattr(equipo, campo, valor)
 
     session.add(equipo)
-    await session.commit()
-    await session.refresh(equipo)
+    await confirmar_cambios(session, equipo)
     print(f"DEBUG (operations): Estadísticas para Equipo ID: {equipo_id} actualizadas.")
 
+def _subconsulta_aportes_equipos(equipo_ids: Optional[set] = None):
+    # Una fila por (equipo, partido activo) con lo que ese partido le aporta, como local y como visitante
+    lados = []
+    for indice_lado, columna_equipo in enumerate((PartidoSQL.equipo_local_id, PartidoSQL.equipo_visitante_id)):
+        lado = select(
+            columna_equipo.label("equipo_id"),
+            *[getattr(PartidoSQL, columnas[indice_lado]).label(campo)
+              for campo, columnas in CAMPOS_ESTADISTICAS_EQUIPO.items()]
+        ).where(PartidoSQL.esta_activo == True)
+        if equipo_ids is not None:
+            lado = lado.where(columna_equipo.in_(equipo_ids))
+        lados.append(lado)
+    return union_all(*lados).subquery("aportes")
+
+
+async def _escribir_estadisticas_equipos(session: AsyncSession, filas: List[Dict[str, Any]]) -> None:
+    if not filas:
+        return
+    # UPDATE por clave primaria en un solo lote (executemany)
+    await session.execute(update(EquipoSQL), filas)
+    _sincronizar_equipos_en_sesion(session, filas)
+
+
+async def recalcular_estadisticas_equipos(session: AsyncSession, equipo_ids: Iterable[int] | str = "todos",
+                                          confirmar: bool = True) -> int:
+    """
+    Recalcula en bloque las estadísticas de varios equipos activos (o de todos con "todos").
+    Una sola consulta UNION ALL / GROUP BY sobre PartidoSQL y un único UPDATE por lotes.
+    Con confirmar=False deja el commit a quien llama. Retorna el número de equipos actualizados.
+    """
+    filtrar = equipo_ids != "todos"
+    ids = set(equipo_ids) if filtrar else set()
+    if filtrar and not ids:
+        return 0
+    print(f"DEBUG (operations): Recalculando estadísticas en bloque para: {sorted(ids) if filtrar else 'todos'}")
+
+    aportes = _subconsulta_aportes_equipos(ids if filtrar else None)
+
+    # LEFT JOIN desde EquipoSQL para que los equipos sin partidos queden en cero
+    consulta = (
+        select(
+            EquipoSQL.id,
+            *[func.coalesce(func.sum(getattr(aportes.c, campo)), 0).label(campo) for campo in CAMPOS_ESTADISTICAS_EQUIPO]
+        )
+        .join(aportes, aportes.c.equipo_id == EquipoSQL.id, isouter=True)
+        .where(EquipoSQL.esta_activo == True)
+        .group_by(EquipoSQL.id)
+    )
+    if filtrar:
+        consulta = consulta.where(EquipoSQL.id.in_(ids))
+    filas = [dict(fila._mapping) for fila in (await session.execute(consulta)).all()]
+
+    await _escribir_estadisticas_equipos(session, filas)
+    if confirmar:
+        await confirmar_cambios(session)
+    print(f"DEBUG (operations): Estadísticas recalculadas en bloque para {len(filas)} equipos.")
+    return len(filas)
+
+# --- Registro de eventos: snapshot + reproducción de los eventos posteriores ---
+async def obtener_eventos_partido(session: AsyncSession, partido_id: int) -> List[EventoPartidoSQL]:
+    result = await session.execute(
+        select(EventoPartidoSQL).where(EventoPartidoSQL.partido_id == partido_id).order_by(EventoPartidoSQL.id)
+    )
+    return result.scalars().all()
+
+
+async def calcular_totales_desde_eventos(session: AsyncSession) -> tuple:
+    """
+    Totales por equipo sobre los partidos activos: parte del último snapshot y reproduce solo los eventos
+    posteriores. Sin snapshot previo los toma de PartidoSQL: los partidos anteriores al registro de eventos
+    no tienen evento de creación. Eso pasa una sola vez, con el snapshot base de asegurar_snapshot_base().
+    Retorna (totales, ultimo_evento_id, eventos_reproducidos). No escribe nada.
+    """
+    result = await session.execute(select(SnapshotAgregadosSQL).order_by(SnapshotAgregadosSQL.id.desc()).limit(1))
+    snapshot = result.scalars().first()
+
+    if snapshot is None:
+        aportes = _subconsulta_aportes_equipos()
+        consulta = select(
+            aportes.c.equipo_id,
+            *[func.sum(getattr(aportes.c, campo)).label(campo) for campo in CAMPOS_ESTADISTICAS_EQUIPO]
+        ).group_by(aportes.c.equipo_id)
+        totales = {
+            fila.equipo_id: {campo: getattr(fila, campo) for campo in CAMPOS_ESTADISTICAS_EQUIPO}
+            for fila in (await session.execute(consulta)).all()
+        }
+        ultimo_evento_id = (await session.execute(select(func.coalesce(func.max(EventoPartidoSQL.id), 0)))).scalar_one()
+        return totales, ultimo_evento_id, 0
+
+    result = await session.execute(
+        select(EventoPartidoSQL.id, EventoPartidoSQL.antes, EventoPartidoSQL.despues)
+        .where(EventoPartidoSQL.id > snapshot.ultimo_evento_id)
+        .order_by(EventoPartidoSQL.id)
+    )
+    eventos = result.all()
+    deltas = [calcular_delta_estadisticas(aportes_partido(antes), aportes_partido(despues))
+              for _, antes, despues in eventos]
+    # Las claves JSON del snapshot son texto
+    base = {int(equipo_id): valores for equipo_id, valores in snapshot.totales.items()}
+    totales = combinar_deltas(base, *deltas)
+    ultimo_evento_id = eventos[-1][0] if eventos else snapshot.ultimo_evento_id
+    return totales, ultimo_evento_id, len(eventos)
+
+
+async def tomar_snapshot_agregados(session: AsyncSession) -> SnapshotAgregadosSQL:
+    """Guarda los totales actuales como nuevo punto de partida para la reproducción. No hace commit."""
+    totales, ultimo_evento_id, _ = await calcular_totales_desde_eventos(session)
+    snapshot = SnapshotAgregadosSQL(
+        ultimo_evento_id=ultimo_evento_id,
+        totales={str(equipo_id): valores for equipo_id, valores in totales.items()},
+    )
+    session.add(snapshot)
+    await session.flush()
+    print(f"DEBUG (operations): Snapshot {snapshot.id} guardado hasta el evento {ultimo_evento_id}.")
+    return snapshot
+
+
+async def asegurar_snapshot_base(session: AsyncSession) -> Optional[SnapshotAgregadosSQL]:
+    """
+    Si todavía no hay ningún snapshot, guarda uno desde PartidoSQL (se llama al arrancar). Desde ahí la
+    reproducción siempre parte de un snapshot y nunca vuelve a recorrer los partidos. No hace commit.
+    """
+    result = await session.execute(select(SnapshotAgregadosSQL.id).limit(1))
+    if result.first() is not None:
+        return None
+    return await tomar_snapshot_agregados(session)
+
+
+# Lo que reconstruir_desde_eventos rehace con un recorrido completo de PartidoSQL y no desde el registro
+AGREGADOS_POR_RECORRIDO: List[str] = ["posiciones", "cubo", "reportes"]
+
+
+async def reconstruir_desde_eventos(session: AsyncSession) -> Dict[str, Any]:
+    """
+    Rehace las estadísticas de todos los equipos activos a partir del último snapshot más los eventos
+    nuevos, sin recorrer PartidoSQL. Si hubo eventos que reproducir deja un snapshot nuevo. Hace commit.
+
+    La tabla de posiciones, el cubo y los reportes NO salen del registro: dependen del estado actual de
+    los equipos (activo, grupo, país), que los eventos de partidos no guardan, así que se reconstruyen
+    con un recorrido completo de PartidoSQL (ver AGREGADOS_POR_RECORRIDO en la respuesta).
+    """
+    totales, ultimo_evento_id, reproducidos = await calcular_totales_desde_eventos(session)
+
+    result = await session.execute(select(EquipoSQL.id).where(EquipoSQL.esta_activo == True))
+    filas = [
+        {"id": equipo_id, **{campo: totales.get(equipo_id, {}).get(campo, 0) for campo in CAMPOS_ESTADISTICAS_EQUIPO}}
+        for equipo_id in result.scalars().all()
+    ]
+    await _escribir_estadisticas_equipos(session, filas)
+
+    await reconstruir_posiciones_grupos(session)
+    await reconstruir_cubo_estadisticas(session)
+    reportes = await regenerar_reportes(session)
+    if reproducidos:
+        await tomar_snapshot_agregados(session)
+    await confirmar_cambios(session)
+    print(f"DEBUG (operations): Reconstrucción desde eventos: {reproducidos} eventos reproducidos, "
+          f"{len(filas)} equipos actualizados.")
+    return {"eventos_reproducidos": reproducidos, "ultimo_evento_id": ultimo_evento_id,
+            "equipos": len(filas), **reportes, "recorrido_completo": AGREGADOS_POR_RECORRIDO}
+
+
+async def sincronizar_grupo_posicion(session: AsyncSession, equipo: EquipoSQL) -> None:
+    """Copia el grupo del equipo a su fila de la tabla de posiciones. No hace commit."""
+    posicion = await session.get(PosicionGrupoSQL, equipo.id)
+    if posicion and posicion.grupo != equipo.grupo:
+        posicion.grupo = equipo.grupo
+        session.add(posicion)
+
+
+async def reconstruir_posiciones_grupos(session: AsyncSession, equipo_ids: Iterable[int] | str = "todos") -> int:
+    """
+    Reconstruye desde los partidos las filas de PosicionGrupoSQL de los equipos indicados (o de todos).
+    Solo cuentan partidos activos entre dos equipos activos. Los equipos inactivos salen de la tabla.
+    Ruta de reparación y de arranque; las escrituras normales usan actualizar_posiciones_partido.
+    No hace commit. Retorna el número de filas escritas.
+    """
+    filtrar = equipo_ids != "todos"
+    ids = set(equipo_ids) if filtrar else set()
+    if filtrar and not ids:
+        return 0
+
+    equipo_local = aliased(EquipoSQL)
+    equipo_visitante = aliased(EquipoSQL)
+    lados = []
+    for columna_equipo, goles_propios, goles_rival in (
+        (PartidoSQL.equipo_local_id, PartidoSQL.goles_local, PartidoSQL.goles_visitante),
+        (PartidoSQL.equipo_visitante_id, PartidoSQL.goles_visitante, PartidoSQL.goles_local),
+    ):
+        lado = (
+            select(
+                columna_equipo.label("equipo_id"),
+                case((goles_propios > goles_rival, 1), else_=0).label("victorias"),
+                case((goles_propios == goles_rival, 1), else_=0).label("empates"),
+                case((goles_propios < goles_rival, 1), else_=0).label("derrotas"),
+                goles_propios.label("goles_a_favor"),
+                goles_rival.label("goles_en_contra"),
+            )
+            .join(equipo_local, equipo_local.id == PartidoSQL.equipo_local_id)
+            .join(equipo_visitante, equipo_visitante.id == PartidoSQL.equipo_visitante_id)
+            .where(PartidoSQL.esta_activo == True, equipo_local.esta_activo == True,
+                   equipo_visitante.esta_activo == True)
+        )
+        if filtrar:
+            lado = lado.where(columna_equipo.in_(ids))
+        lados.append(lado)
+    resultados = union_all(*lados).subquery("resultados")
+
+    consulta = (
+        select(
+            EquipoSQL.id,
+            EquipoSQL.grupo,
+            func.count(resultados.c.equipo_id).label("partidos_jugados"),
+            *[func.coalesce(func.sum(getattr(resultados.c, campo)), 0).label(campo)
+              for campo in ("victorias", "empates", "derrotas", "goles_a_favor", "goles_en_contra")],
+        )
+        .join(resultados, resultados.c.equipo_id == EquipoSQL.id, isouter=True)
+        .where(EquipoSQL.esta_activo == True)
+        .group_by(EquipoSQL.id, EquipoSQL.grupo)
+    )
+    if filtrar:
+        consulta = consulta.where(EquipoSQL.id.in_(ids))
+
+    ahora = datetime.utcnow()
+    filas = []
+    for fila in (await session.execute(consulta)).all():
+        filas.append({
+            "equipo_id": fila.id,
+            "grupo": fila.grupo,
+            "partidos_jugados": fila.partidos_jugados,
+            "victorias": fila.victorias,
+            "empates": fila.empates,
+            "derrotas": fila.derrotas,
+            "goles_a_favor": fila.goles_a_favor,
+            "goles_en_contra": fila.goles_en_contra,
+            "diferencia_goles": fila.goles_a_favor - fila.goles_en_contra,
+            "puntos": 3 * fila.victorias + fila.empates,
+            "updated_at": ahora,
+        })
+
+    borrar = delete(PosicionGrupoSQL)
+    if filtrar:
+        borrar = borrar.where(PosicionGrupoSQL.equipo_id.in_(ids))
+    await session.execute(borrar)
+    if filas:
+        await session.execute(insert(PosicionGrupoSQL), filas)
+    print(f"DEBUG (operations): Tabla de posiciones reconstruida para {len(filas)} equipos.")
+    return len(filas)
+
+async def reconstruir_cubo_estadisticas(session: AsyncSession) -> int:
+    """
+    Reconstruye el cubo país × fase × grupo desde los partidos activos con un único GROUP BY.
+    Se usa al arrancar y cuando un equipo cambia de país o de grupo. No hace commit.
+    Retorna el número de celdas escritas.
+    """
+    lados = []
+    for indice_lado, (columna_equipo, goles_propios, goles_rival) in enumerate((
+        (PartidoSQL.equipo_local_id, PartidoSQL.goles_local, PartidoSQL.goles_visitante),
+        (PartidoSQL.equipo_visitante_id, PartidoSQL.goles_visitante, PartidoSQL.goles_local),
+    )):
+        lados.append(
+            select(
+                EquipoSQL.pais,
+                PartidoSQL.fase,
+                EquipoSQL.grupo,
+                case((goles_propios > goles_rival, 1), else_=0).label("victorias"),
+                case((goles_propios == goles_rival, 1), else_=0).label("empates"),
+                case((goles_propios < goles_rival, 1), else_=0).label("derrotas"),
+                *[getattr(PartidoSQL, columnas[indice_lado]).label(campo)
+                  for campo, columnas in CAMPOS_ESTADISTICAS_EQUIPO.items()],
+            )
+            .join(EquipoSQL, EquipoSQL.id == columna_equipo)
+            .where(PartidoSQL.esta_activo == True, EquipoSQL.esta_activo == True)
+        )
+    aportes = union_all(*lados).subquery("aportes_cubo")
+
+    consulta = (
+        select(
+            aportes.c.pais,
+            aportes.c.fase,
+            aportes.c.grupo,
+            func.count().label("partidos"),
+            *[func.sum(getattr(aportes.c, medida)).label(medida) for medida in MEDIDAS_CUBO if medida != "partidos"],
+        )
+        .group_by(aportes.c.pais, aportes.c.fase, aportes.c.grupo)
+    )
+    ahora = datetime.utcnow()
+    filas = [{**fila._mapping, "updated_at": ahora} for fila in (await session.execute(consulta)).all()]
+
+    await session.execute(delete(CuboEstadisticasSQL))
+    if filas:
+        await session.execute(insert(CuboEstadisticasSQL), filas)
+    print(f"DEBUG (operations): Cubo de estadísticas reconstruido con {len(filas)} celdas.")
+    return len(filas)
+
+
+async def consultar_cubo_estadisticas(
+    session: AsyncSession,
+    dimensiones: Iterable[DimensionesCubo] = (),
+    pais: Optional[Paises] = None,
+    fase: Optional[Fases] = None,
+    grupo: Optional[Grupos] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Rebanada o agregación del cubo: agrupa por las dimensiones pedidas (ninguna = total general)
+    y filtra por país, fase y/o grupo. Solo lee celdas del cubo, nunca PartidoSQL.
+    """
+    columnas_dimension = [getattr(CuboEstadisticasSQL, dimension.value) for dimension in dict.fromkeys(dimensiones)]
+    consulta = select(
+        *columnas_dimension,
+        *[func.coalesce(func.sum(getattr(CuboEstadisticasSQL, medida)), 0).label(medida) for medida in MEDIDAS_CUBO],
+    )
+    if pais is not None:
+        consulta = consulta.where(CuboEstadisticasSQL.pais == pais)
+    if fase is not None:
+        consulta = consulta.where(CuboEstadisticasSQL.fase == fase)
+    if grupo is not None:
+        consulta = consulta.where(CuboEstadisticasSQL.grupo == grupo)
+    if columnas_dimension:
+        consulta = consulta.group_by(*columnas_dimension).order_by(*columnas_dimension)
+
+    result = await session.execute(consulta)
+    return [dict(fila._mapping) for fila in result.all()]
+
 # NEW FUNCTION: obtener_partido_inactivo_por_id (for restoration)
 async def obtener_partido_inactivo_por_id(session: AsyncSession, partido_id: int) -> Optional[PartidoSQL]:
     result = await session.execute(
@@ -539,160 +1740,228 @@ async def obtener_partido_inactivo_por_id(session: AsyncSession, partido_id: int
     return result.scalar_one_or_none()
 
 async def restaurar_partido_sql(session: AsyncSession, partido_id: int) -> bool:
-    partido = await obtener_partido_inactivo_por_id(session, partido_id) # Use the new function to get inactive match
-    if not partido:
-        return False
+    return await _cambiar_estado_partido(session, partido_id, activar=True)
 
-    equipo_local = partido.equipo_local
-    equipo_visitante = partido.equipo_visitante
 
-    if equipo_local and equipo_visitante:
-        # Re-add points
-        if partido.goles_local > partido.goles_visitante:
-            equipo_local.puntos += 3
-        elif partido.goles_visitante > partido.goles_local:
-            equipo_visitante.puntos += 3
-        else:
-            equipo_local.puntos += 1
-            equipo_visitante.puntos += 1
-
-        # Re-add other statistics for local team
-        equipo_local.goles_a_favor += partido.goles_local
-        equipo_local.goles_en_contra += partido.goles_visitante
-        equipo_local.tarjetas_amarillas += partido.tarjetas_amarillas_local
-        equipo_local.tarjetas_rojas += partido.tarjetas_rojas_local
-        equipo_local.tiros_esquina += partido.tiros_esquina_local
-        equipo_local.tiros_libres += partido.tiros_libres_local
-        equipo_local.faltas += partido.faltas_local
-        equipo_local.fueras_de_juego += partido.fueras_de_juego_local
-        equipo_local.pases += partido.pases_local
-
-        # Re-add other statistics for visiting team
-        equipo_visitante.goles_a_favor += partido.goles_visitante
-        equipo_visitante.goles_en_contra += partido.goles_local
-        equipo_visitante.tarjetas_amarillas += partido.tarjetas_amarillas_visitante
-        equipo_visitante.tarjetas_rojas += partido.tarjetas_rojas_visitante
-        equipo_visitante.tiros_esquina += partido.tiros_esquina_visitante
-        equipo_visitante.tiros_libres += partido.tiros_libres_visitante
-        equipo_visitante.faltas += partido.faltas_visitante
-        equipo_visitante.fueras_de_juego += partido.fueras_de_juego_visitante
-        equipo_visitante.pases += partido.pases_visitante
-
-        session.add(equipo_local)
-        session.add(equipo_visitante)
-        await session.commit()
-        await session.refresh(equipo_local)
-        await session.refresh(equipo_visitante)
-
-    partido.esta_activo = True  # Mark as active
-    session.add(partido)
-    await session.commit()
-    await session.refresh(partido)
-    return True
-
-# --- Recalcular Reporte por País: Asegúrate de que solo suma equipos activos ---
-async def actualizar_reporte_por_pais(session: AsyncSession, pais: Paises):
+def insertar_o_actualizar(session: AsyncSession, modelo, filas: List[Dict[str, Any]], claves: List[str],
+                          acumular: Iterable[str] = ()):
     """
-    Recalcula el reporte estadístico para un país específico basándose solo en equipos activos.
+    Construye un INSERT ... ON CONFLICT (claves) DO UPDATE por lotes para el dialecto de la sesión
+    (PostgreSQL o SQLite). Las columnas que no son clave se sobrescriben con los valores nuevos, salvo
+    las de 'acumular', que se suman a lo que ya había (col = col + excluded.col).
     """
-    print(f"DEBUG (operations): Actualizando reporte para país: {pais.value}")
-
-    # Obtener solo equipos activos para el cálculo
-    equipos = await session.execute(
-        select(EquipoSQL).where(EquipoSQL.pais == pais, EquipoSQL.esta_activo == True)  # <-- Filtra por activo
+    if session.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    sentencia = insert_dialecto(modelo).values(filas)
+    tabla = modelo.__table__
+    return sentencia.on_conflict_do_update(
+        index_elements=claves,
+        set_={
+            columna: tabla.c[columna] + sentencia.excluded[columna] if columna in acumular else sentencia.excluded[columna]
+            for columna in filas[0] if columna not in claves
+        },
     )
-    equipos = equipos.scalars().all()
 
-    total_equipos = len(equipos)
-    total_puntos = sum([equipo.puntos for equipo in equipos])
-    total_goles_favor = sum([equipo.goles_a_favor for equipo in equipos])
-    total_goles_contra = sum([equipo.goles_en_contra for equipo in equipos])
 
-    promedio_goles_favor = total_goles_favor / total_equipos if total_equipos > 0 else 0
-    promedio_goles_contra = total_goles_contra / total_equipos if total_equipos > 0 else 0
+# --- Regenerar reportes por país y por fase: una consulta GROUP BY y un upsert por lotes cada uno ---
+async def regenerar_reportes_por_pais(session: AsyncSession, paises: Optional[Iterable[Paises]] = None) -> int:
+    """
+    Recalcula los reportes de los países indicados (o de todos) basándose solo en equipos activos.
+    No hace commit. Retorna el número de reportes escritos.
+    """
+    # Los modelos de tabla no validan: un equipo armado desde un formulario trae el país como str
+    paises = {Paises(pais) for pais in paises} if paises is not None else set(Paises)
+    if not paises:
+        return 0
 
-    # Verificar si ya existe el reporte para este país
-    reporte_existente = await session.execute(
-        select(ReportePorPaisSQL).where(ReportePorPaisSQL.pais == pais)
+    result = await session.execute(
+        select(
+            EquipoSQL.pais,
+            func.count(EquipoSQL.id).label("total_equipos"),
+            func.coalesce(func.sum(EquipoSQL.puntos), 0).label("total_puntos"),
+            func.coalesce(func.sum(EquipoSQL.goles_a_favor), 0).label("total_goles_favor"),
+            func.coalesce(func.sum(EquipoSQL.goles_en_contra), 0).label("total_goles_contra"),
+        )
+        .where(EquipoSQL.esta_activo == True, EquipoSQL.pais.in_(paises))  # <-- Filtra por activo
+        .group_by(EquipoSQL.pais)
     )
-    reporte_existente = reporte_existente.scalar_one_or_none()
+    totales = {fila.pais: fila for fila in result.all()}
+
+    ahora = datetime.utcnow()
+    filas = []
+    for pais in paises:
+        fila = totales.get(pais)
+        total_equipos = fila.total_equipos if fila else 0
+        filas.append({
+            "pais": pais,
+            "total_equipos": total_equipos,
+            "total_puntos": fila.total_puntos if fila else 0,
+            "promedio_goles_favor": fila.total_goles_favor / total_equipos if total_equipos > 0 else 0,
+            "promedio_goles_contra": fila.total_goles_contra / total_equipos if total_equipos > 0 else 0,
+            "updated_at": ahora,
+        })
+
+    await session.execute(insertar_o_actualizar(session, ReportePorPaisSQL, filas, ["pais"]))
+    print(f"DEBUG (operations): Reportes por país regenerados: {sorted(pais.value for pais in paises)}")
+    return len(filas)
+
+
+async def regenerar_reportes_por_fase(session: AsyncSession, fases: Optional[Iterable[Fases]] = None) -> int:
+    """
+    Recalcula los reportes de las fases indicadas (o de todas) basándose solo en partidos activos.
+    No hace commit. Retorna el número de reportes escritos.
+    """
+    fases = {Fases(fase) for fase in fases} if fases is not None else set(Fases)
+    if not fases:
+        return 0
 
-    if reporte_existente:
-        # Si existe, actualizar el reporte
-        reporte_existente.total_equipos = total_equipos
-        reporte_existente.total_puntos = total_puntos
-        reporte_existente.promedio_goles_favor = promedio_goles_favor
-        reporte_existente.promedio_goles_contra = promedio_goles_contra
-        session.add(reporte_existente)
-    else:
-        # Si no existe, crear uno nuevo
-        nuevo_reporte = ReportePorPaisSQL(
-            pais=pais,
-            total_equipos=total_equipos,
-            total_puntos=total_puntos,
-            promedio_goles_favor=promedio_goles_favor,
-            promedio_goles_contra=promedio_goles_contra,
+    result = await session.execute(
+        select(
+            PartidoSQL.fase,
+            func.count(PartidoSQL.id).label("total_partidos"),
+            func.coalesce(func.sum(PartidoSQL.goles_local), 0).label("total_goles_local"),
+            func.coalesce(func.sum(PartidoSQL.goles_visitante), 0).label("total_goles_visitante"),
         )
-        session.add(nuevo_reporte)
+        .where(PartidoSQL.esta_activo == True, PartidoSQL.fase.in_(fases))
+        .group_by(PartidoSQL.fase)
+    )
+    totales = {fila.fase: fila for fila in result.all()}
+
+    ahora = datetime.utcnow()
+    filas = []
+    for fase in fases:
+        fila = totales.get(fase)
+        filas.append({
+            "fase": fase,
+            "total_partidos": fila.total_partidos if fila else 0,
+            "total_goles_local": fila.total_goles_local if fila else 0,
+            "total_goles_visitante": fila.total_goles_visitante if fila else 0,
+            "updated_at": ahora,
+        })
+
+    await session.execute(insertar_o_actualizar(session, ReportePorFaseSQL, filas, ["fase"]))
+    print(f"DEBUG (operations): Reportes por fase regenerados: {sorted(fase.value for fase in fases)}")
+    return len(filas)
+
+
+async def regenerar_reportes(session: AsyncSession, paises: Optional[Iterable[Paises]] = None,
+                             fases: Optional[Iterable[Fases]] = None) -> Dict[str, int]:
+    """Regenera juntos los reportes por país y por fase indicados (None = todos). No hace commit."""
+    return {
+        "reportes_por_pais": await regenerar_reportes_por_pais(session, paises),
+        "reportes_por_fase": await regenerar_reportes_por_fase(session, fases),
+    }
 
-    await session.commit()
-    print(f"DEBUG (operations): Reporte para país: {pais.value} actualizado.")
 
+async def regenerar_todos_los_reportes(session: AsyncSession) -> Dict[str, int]:
+    """Regenera todos los reportes por país y por fase en una sola transacción."""
+    totales = await regenerar_reportes(session)
+    await confirmar_cambios(session)
+    return totales
 
-async def obtener_todos_los_reportes_por_pais(session: AsyncSession) -> List[ReportePorPaisSQL]:
-    """Obtiene todos los reportes por país."""
-    result = await session.execute(select(ReportePorPaisSQL))
-    return list(result.scalars().all())
 
-async def generar_reportes_por_pais(session: AsyncSession, pais: Paises):
-    # Consulta para obtener equipos activos de un país específico
-    equipos_del_pais_query = await session.execute(
-        select(EquipoSQL).where(EquipoSQL.pais == pais, EquipoSQL.esta_activo == True)
-    )
-    equipos_del_pais = equipos_del_pais_query.scalars().all()
+# Lo que un partido activo suma al reporte de su fase
+CAMPOS_REPORTE_FASE: List[str] = ["total_partidos", "total_goles_local", "total_goles_visitante"]
 
-    total_equipos = len(equipos_del_pais)
-    total_puntos = sum(equipo.puntos for equipo in equipos_del_pais)
-    total_goles_favor = sum(equipo.goles_a_favor for equipo in equipos_del_pais)
-    total_goles_contra = sum(equipo.goles_en_contra for equipo in equipos_del_pais)
 
-    promedio_goles_favor = total_goles_favor / total_equipos if total_equipos > 0 else 0
-    promedio_goles_contra = total_goles_contra / total_equipos if total_equipos > 0 else 0
+def _aportes_reporte_fase(instantanea: Optional[Dict[str, Any]]) -> Dict[Fases, Dict[str, int]]:
+    if not instantanea:
+        return {}
+    return {instantanea["fase"]: {"total_partidos": 1, "total_goles_local": instantanea["goles_local"],
+                                  "total_goles_visitante": instantanea["goles_visitante"]}}
 
-    # Verificar si ya existe el reporte para este país
-    reporte_existente = await session.execute(
-        select(ReportePorPaisSQL).where(ReportePorPaisSQL.pais == pais)
-    )
-    reporte_existente = reporte_existente.scalar_one_or_none()
 
-    if reporte_existente:
-        # Si existe, actualizar el reporte
-        reporte_existente.total_equipos = total_equipos
-        reporte_existente.total_puntos = total_puntos
-        reporte_existente.promedio_goles_favor = promedio_goles_favor
-        reporte_existente.promedio_goles_contra = promedio_goles_contra
-        session.add(reporte_existente)
-    else:
-        # Si no existe, crear uno nuevo
-        nuevo_reporte = ReportePorPaisSQL(
-            pais=pais,
-            total_equipos=total_equipos,
-            total_puntos=total_puntos,
-            promedio_goles_favor=promedio_goles_favor,
-            promedio_goles_contra=promedio_goles_contra,
+def _delta_reportes_pais(aplicados: Dict[int, Tuple[Paises, Optional[Dict[str, int]]]]
+                         ) -> Tuple[Dict[Paises, Dict[str, int]], Set[Paises]]:
+    """
+    El reporte por país suma puntos y goles de sus equipos activos: se agrupa por país lo que se aplicó
+    a cada equipo. Retorna ese delta y los países en que el tope en cero dejó el cambio sin saber.
+    """
+    delta: Dict[Paises, Dict[str, int]] = {}
+    recortados: Set[Paises] = set()
+    for pais, cambios in aplicados.values():
+        if cambios is None:
+            recortados.add(pais)
+            continue
+        acumulado = delta.setdefault(pais, {})
+        for campo in ("puntos", "goles_a_favor", "goles_en_contra"):
+            if cambios.get(campo):
+                acumulado[campo] = acumulado.get(campo, 0) + cambios[campo]
+    return ({pais: cambios for pais, cambios in delta.items() if pais not in recortados and any(cambios.values())},
+            recortados)
+
+
+def _promedio_con_delta(columna, diferencia: int):
+    # Los promedios se guardan como float; la suma entera se recupera con round(promedio * total_equipos)
+    # antes de aplicar el delta, así no se acumula error de redondeo escritura tras escritura
+    total_equipos = ReportePorPaisSQL.total_equipos
+    suma = mayor_entre(func.round(columna * total_equipos) + diferencia, 0)
+    return case((total_equipos > 0, cast(suma, Float) / cast(total_equipos, Float)), else_=0.0)
+
+
+async def aplicar_delta_reportes(session: AsyncSession, aplicados: Dict[int, Tuple[Paises, Optional[Dict[str, int]]]],
+                                 antes: Optional[Dict[str, Any]], despues: Optional[Dict[str, Any]]) -> None:
+    """
+    Lleva a los reportes por fase y por país la diferencia de un cambio de partido, con col = col + delta
+    en SQL: no vuelve a agrupar los partidos ni los equipos. 'aplicados' es lo que retornó
+    aplicar_delta_estadisticas; los países en que el tope en cero recortó un equipo se recalculan
+    completos, porque restarles el delta pedido los dejaría por debajo de la suma de sus equipos.
+    No hace commit.
+    """
+    ahora = datetime.utcnow()
+    delta_fases = calcular_delta_estadisticas(_aportes_reporte_fase(antes), _aportes_reporte_fase(despues),
+                                              CAMPOS_REPORTE_FASE)
+    if delta_fases:
+        filas = [{"fase": fase, **{campo: cambios.get(campo, 0) for campo in CAMPOS_REPORTE_FASE}, "updated_at": ahora}
+                 for fase, cambios in delta_fases.items()]
+        await session.execute(insertar_o_actualizar(session, ReportePorFaseSQL, filas, ["fase"], CAMPOS_REPORTE_FASE))
+
+    delta_paises, faltantes = _delta_reportes_pais(aplicados)
+    for pais, cambios in delta_paises.items():
+        result = await session.execute(
+            update(ReportePorPaisSQL)
+            .where(ReportePorPaisSQL.pais == pais)
+            .values(
+                total_puntos=mayor_entre(ReportePorPaisSQL.total_puntos + cambios.get("puntos", 0), 0),
+                promedio_goles_favor=_promedio_con_delta(ReportePorPaisSQL.promedio_goles_favor,
+                                                         cambios.get("goles_a_favor", 0)),
+                promedio_goles_contra=_promedio_con_delta(ReportePorPaisSQL.promedio_goles_contra,
+                                                          cambios.get("goles_en_contra", 0)),
+                updated_at=ahora,
+            )
+            .execution_options(synchronize_session=False)
         )
-        session.add(nuevo_reporte)
+        if result.rowcount == 0:
+            faltantes.add(pais)  # Sin fila no hay total_equipos del que partir: se calcula completo
+    if faltantes:
+        await regenerar_reportes_por_pais(session, faltantes)
+    print(f"DEBUG (operations): Delta de reportes aplicado (fases: {sorted(fase.value for fase in delta_fases)}).")
 
-    await session.commit()
-    await session.refresh(reporte_existente if reporte_existente else nuevo_reporte) # Refresh to get updated values/ID
-    return reporte_existente if reporte_existente else nuevo_reporte
 
+async def obtener_todos_los_reportes_por_pais(session: AsyncSession) -> List[ReportePorPaisSQL]:
+    """Obtiene todos los reportes por país."""
+    result = await session.execute(select(ReportePorPaisSQL))
+    return list(result.scalars().all())
+
+async def generar_reportes_por_pais(session: AsyncSession, pais: Paises):
+    await regenerar_reportes_por_pais(session, [pais])
+    await confirmar_cambios(session)
+    # populate_existing: el upsert no pasa por el ORM, así que se refresca el objeto si ya estaba cargado
+    result = await session.execute(
+        select(ReportePorPaisSQL).where(ReportePorPaisSQL.pais == pais).execution_options(populate_existing=True)
+    )
+    return result.scalar_one()
+
+@cacheado(ESPACIO_REPORTES, Optional[ReportePorPaisSQL])
 async def obtener_reporte_por_pais(session: AsyncSession, pais: Paises) -> Optional[ReportePorPaisSQL]:
     result = await session.execute(
         select(ReportePorPaisSQL).where(ReportePorPaisSQL.pais == pais)
     )
     return result.scalar_one_or_none()
 
+@cacheado(ESPACIO_REPORTES, List[ReportePorPaisSQL])
 async def obtener_todos_los_reportes_por_pais(session: AsyncSession) -> List[ReportePorPaisSQL]:
     result = await session.execute(
         select(ReportePorPaisSQL)
@@ -700,48 +1969,21 @@ async def obtener_todos_los_reportes_por_pais(session: AsyncSession) -> List[Rep
     return result.scalars().all()
 
 async def generar_reportes_por_fase(session: AsyncSession, fase: Fases):
-    # Consulta para obtener partidos activos de una fase específica
-    partidos_de_la_fase_query = await session.execute(
-        select(PartidoSQL).where(PartidoSQL.fase == fase, PartidoSQL.esta_activo == True)
-    )
-    partidos_de_la_fase = partidos_de_la_fase_query.scalars().all()
-
-    total_partidos = len(partidos_de_la_fase)
-    total_goles_local = sum(partido.goles_local for partido in partidos_de_la_fase)
-    total_goles_visitante = sum(partido.goles_visitante for partido in partidos_de_la_fase)
-
-    # Verificar si ya existe el reporte para esta fase
-    reporte_existente = await session.execute(
-        select(ReportePorFaseSQL).where(ReportePorFaseSQL.fase == fase)
+    await regenerar_reportes_por_fase(session, [fase])
+    await confirmar_cambios(session)
+    result = await session.execute(
+        select(ReportePorFaseSQL).where(ReportePorFaseSQL.fase == fase).execution_options(populate_existing=True)
     )
-    reporte_existente = reporte_existente.scalar_one_or_none()
-
-    if reporte_existente:
-        # Si existe, actualizar el reporte
-        reporte_existente.total_partidos = total_partidos
-        reporte_existente.total_goles_local = total_goles_local
-        reporte_existente.total_goles_visitante = total_goles_visitante
-        session.add(reporte_existente)
-    else:
-        # Si no existe, crear uno nuevo
-        nuevo_reporte = ReportePorFaseSQL(
-            fase=fase,
-            total_partidos=total_partidos,
-            total_goles_local=total_goles_local,
-            total_goles_visitante=total_goles_visitante,
-        )
-        session.add(nuevo_reporte)
-
-    await session.commit()
-    await session.refresh(reporte_existente if reporte_existente else nuevo_reporte)
-    return reporte_existente if reporte_existente else nuevo_reporte
+    return result.scalar_one()
 
+@cacheado(ESPACIO_REPORTES, Optional[ReportePorFaseSQL])
 async def obtener_reporte_por_fase(session: AsyncSession, fase: Fases) -> Optional[ReportePorFaseSQL]:
     result = await session.execute(
         select(ReportePorFaseSQL).where(ReportePorFaseSQL.fase == fase)
     )
     return result.scalar_one_or_none()
 
+@cacheado(ESPACIO_REPORTES, List[ReportePorFaseSQL])
 async def obtener_todos_los_reportes_por_fase(session: AsyncSession) -> List[ReportePorFaseSQL]:
     result = await session.execute(
         select(ReportePorFaseSQL)
@@ -749,104 +1991,106 @@ async def obtener_todos_los_reportes_por_fase(session: AsyncSession) -> List[Rep
     return result.scalars().all()
 
 
-async def obtener_equipos_menos_goleados(session: AsyncSession) -> List[EquipoMenosGoleadoReporte]:
-    # Subquery para sumar goles recibidos como local
-    goles_contra_local_subquery = (
-        select(
-            PartidoSQL.equipo_local_id.label("equipo_id"),
-            func.sum(PartidoSQL.goles_visitante).label("goles_en_contra_local")
-        )
-        .group_by(PartidoSQL.equipo_local_id)
-        .subquery("gcl") # Nombre explícito para el subquery
+async def obtener_clasificacion_equipos(
+    session: AsyncSession,
+    estadistica: EstadisticasEquipo,
+    limite: int = 6,
+    ascendente: bool = False,
+    grupo: Optional[Grupos] = None,
+    pais: Optional[Paises] = None,
+) -> List[EquipoClasificacionReporte]:
+    """
+    Top/bottom N de equipos activos por cualquier contador de EquipoSQL, con filtros opcionales.
+    Los contadores ya se mantienen con cada escritura de partidos, así que no se agrega nada
+    desde PartidoSQL: se recorre el índice parcial (estadística, nombre) y se corta en N.
+    """
+    columna = getattr(EquipoSQL, estadistica.value)
+    consulta = (
+        select(EquipoSQL.id, EquipoSQL.nombre, EquipoSQL.pais, EquipoSQL.grupo, EquipoSQL.logo_url,
+               columna.label("valor"))
+        .where(EquipoSQL.esta_activo == True)
+        .order_by(columna.asc() if ascendente else columna.desc(), EquipoSQL.nombre.asc())
+        .limit(limite)
     )
-
-    # Subquery para sumar goles recibidos como visitante
-    goles_contra_visitante_subquery = (
-        select(
-            PartidoSQL.equipo_visitante_id.label("equipo_id"),
-            func.sum(PartidoSQL.goles_local).label("goles_en_contra_visitante")
-        )
-        .group_by(PartidoSQL.equipo_visitante_id)
-        .subquery("gcv") # Nombre explícito para el subquery
+    if grupo is not None:
+        consulta = consulta.where(EquipoSQL.grupo == grupo)
+    if pais is not None:
+        consulta = consulta.where(EquipoSQL.pais == pais)
+
+    result = await session.execute(consulta)
+    return [
+        EquipoClasificacionReporte(posicion=posicion, estadistica=estadistica, **fila._mapping)
+        for posicion, fila in enumerate(result.all(), start=1)
+    ]
+
+
+@coalescido
+@cacheado(ESPACIO_REPORTES, List[EquipoMenosGoleadoReporte])
+async def obtener_equipos_menos_goleados(session: AsyncSession, limite: int = 6) -> List[EquipoMenosGoleadoReporte]:
+    # Clasificación ascendente por goles en contra (solo equipos y partidos activos)
+    clasificacion = await obtener_clasificacion_equipos(
+        session, EstadisticasEquipo.goles_en_contra, limite=limite, ascendente=True
     )
-
-    # Consulta interna para calcular los goles en contra por equipo
-    # Esta subconsulta ya tendrá una fila por equipo con su total de goles recibidos
-    base_query_for_ranking = (
-        select(
-            EquipoSQL.id,
-            EquipoSQL.nombre,
-            EquipoSQL.pais,
-            EquipoSQL.grupo,
-            EquipoSQL.logo_url,
-            (
-                func.coalesce(goles_contra_local_subquery.c.goles_en_contra_local, 0) +
-                func.coalesce(goles_contra_visitante_subquery.c.goles_en_contra_visitante, 0)
-            ).label("goles_en_contra")
-        )
-        .join(goles_contra_local_subquery, EquipoSQL.id == goles_contra_local_subquery.c.equipo_id, isouter=True)
-        .join(goles_contra_visitante_subquery, EquipoSQL.id == goles_contra_visitante_subquery.c.equipo_id, isouter=True)
-        # No se necesita un GROUP BY explícito aquí si EquipoSQL.id es la clave primaria
-        # y las subconsultas ya agregan por equipo_id.
-    ).subquery("ranked_teams_pre") # Convertir esta parte en un subquery
-
-    # Consulta final que selecciona de la subconsulta y aplica el ORDER BY y LIMIT
-    query = (
-        select(
-            base_query_for_ranking.c.id,
-            base_query_for_ranking.c.nombre,
-            base_query_for_ranking.c.pais,
-            base_query_for_ranking.c.grupo,
-            base_query_for_ranking.c.logo_url,
-            base_query_for_ranking.c.goles_en_contra
-        )
-        .order_by(base_query_for_ranking.c.goles_en_contra.asc()) # Ordenar por la columna ya calculada
-        .limit(6) # Limitar a los 6 primeros
-    )
-
-    result = await session.execute(query)
-    equipos_data = result.all()
-
-    # Reconstruir objetos usando el modelo EquipoMenosGoleadoReporte
-    equipos_con_goles = []
-    for data in equipos_data:
-        equipo = EquipoMenosGoleadoReporte(
-            id=data.id,
-            nombre=data.nombre,
-            pais=data.pais,
-            grupo=data.grupo,
-            logo_url=data.logo_url,
-            goles_en_contra=data.goles_en_contra,
+    return [
+        EquipoMenosGoleadoReporte(
+            id=equipo.id,
+            nombre=equipo.nombre,
+            pais=equipo.pais,
+            grupo=equipo.grupo,
+            logo_url=equipo.logo_url,
+            goles_en_contra=equipo.valor,
         )
-        equipos_con_goles.append(equipo)
-    return equipos_con_goles
+        for equipo in clasificacion
+    ]
+
+def ordenar_tabla_grupo(equipos_lista: List[PosicionEquipoReporte]) -> None:
+    """Puntos (desc), Diferencia de Goles (desc), Goles a Favor (desc), Nombre (asc), en una sola pasada."""
+    equipos_lista.sort(key=lambda x: (-x.puntos, -x.diferencia_goles, -x.goles_a_favor, x.nombre))
+
 
 # NUEVA FUNCIÓN: Generar reporte de tabla de posiciones por grupo
+@coalescido
+@cacheado(ESPACIO_REPORTES, Dict[Grupos, List[PosicionEquipoReporte]])
 async def generar_reporte_por_grupos(session: AsyncSession) -> Dict[Grupos, List[PosicionEquipoReporte]]:
     """
     Genera un reporte de tabla de posiciones para cada grupo.
-    Calcula dinámicamente las estadísticas de cada equipo (partidos jugados, victorias, etc.)
-    y los ordena dentro de cada grupo.
+    Lee la tabla materializada PosicionGrupoSQL (una sola consulta), que se mantiene
+    al día con cada escritura de partidos.
     """
-    print("DEBUG (operations): Generando reporte por grupos...")
-
-    # Obtener todos los equipos activos con sus IDs
-    equipos_query = await session.execute(
-        select(EquipoSQL.id, EquipoSQL.nombre, EquipoSQL.grupo, EquipoSQL.logo_url).where(EquipoSQL.esta_activo == True)
+    print("DEBUG (operations): Leyendo tabla de posiciones materializada...")
+    result = await session.execute(
+        select(
+            PosicionGrupoSQL.equipo_id,
+            EquipoSQL.nombre,
+            EquipoSQL.grupo,
+            EquipoSQL.logo_url,
+            *[getattr(PosicionGrupoSQL, campo) for campo in CAMPOS_POSICIONES],
+        )
+        .join(EquipoSQL, EquipoSQL.id == PosicionGrupoSQL.equipo_id)
+        .where(EquipoSQL.esta_activo == True)
+        .order_by(PosicionGrupoSQL.grupo)
     )
-    equipos_activos = equipos_query.all()
 
-    # Obtener todos los partidos activos
-    partidos_query = await session.execute(
-        select(PartidoSQL)
-        .where(PartidoSQL.esta_activo == True)
-        .options(selectinload(PartidoSQL.equipo_local), selectinload(PartidoSQL.equipo_visitante))
-    )
-    partidos_activos: List[PartidoSQL] = partidos_query.scalars().all()
+    reporte_por_grupos: Dict[Grupos, List[PosicionEquipoReporte]] = {grupo: [] for grupo in Grupos}
+    for fila in result.all():
+        datos = dict(fila._mapping)
+        datos["id"] = datos.pop("equipo_id")
+        reporte_por_grupos[datos["grupo"]].append(PosicionEquipoReporte(**datos))
+
+    for equipos_lista in reporte_por_grupos.values():
+        ordenar_tabla_grupo(equipos_lista)
+    return reporte_por_grupos
 
+
+def tabla_posiciones_python(equipos: List[Any], partidos: List[Any]) -> Dict[Grupos, List[PosicionEquipoReporte]]:
+    """
+    Acumula la tabla de posiciones partido a partido en Python.
+    `equipos` son filas (id, nombre, grupo, logo_url) de equipos activos; `partidos` cualquier objeto con
+    equipo_local_id, equipo_visitante_id, goles_local y goles_visitante.
+    """
     # Inicializar estadísticas para cada equipo
     stats_equipos: Dict[int, Dict[str, Any]] = {}
-    for equipo_id, nombre, grupo, logo_url in equipos_activos:
+    for equipo_id, nombre, grupo, logo_url in equipos:
         stats_equipos[equipo_id] = {
             "id": equipo_id,
             "nombre": nombre,
@@ -863,7 +2107,7 @@ async def generar_reporte_por_grupos(session: AsyncSession) -> Dict[Grupos, List
         }
 
     # Procesar cada partido para acumular estadísticas
-    for partido in partidos_activos:
+    for partido in partidos:
         local_id = partido.equipo_local_id
         visitante_id = partido.equipo_visitante_id
 
@@ -926,6 +2170,124 @@ async def generar_reporte_por_grupos(session: AsyncSession) -> Dict[Grupos, List
         equipos_lista.sort(key=lambda x: x.diferencia_goles, reverse=True) # Diferencia de goles descendente
         equipos_lista.sort(key=lambda x: x.puntos, reverse=True) # Puntos descendente
 
+    return reporte_por_grupos
+
+
+def tabla_posiciones_numpy(equipos: List[Any], partidos: np.ndarray) -> Dict[Grupos, List[PosicionEquipoReporte]]:
+    """
+    Versión vectorizada de tabla_posiciones_python, con el mismo resultado.
+    `partidos` es una matriz entera de 4 columnas: equipo_local_id, equipo_visitante_id, goles_local, goles_visitante.
+    Acumula con bincount sobre índices enteros de equipo y ordena cada grupo con un único lexsort.
+    """
+    reporte_por_grupos: Dict[Grupos, List[PosicionEquipoReporte]] = {grupo: [] for grupo in Grupos}
+    total_equipos = len(equipos)
+    if total_equipos == 0:
+        return reporte_por_grupos
+
+    ids = np.fromiter((equipo[0] for equipo in equipos), dtype=np.int64, count=total_equipos)
+    partidos = np.asarray(partidos, dtype=np.int64).reshape(-1, 4)
+
+    # Traducir IDs de equipo a índices 0..n-1; se descartan partidos con algún equipo inactivo
+    orden_ids = np.argsort(ids, kind="stable")
+    ids_ordenados = ids[orden_ids]
+
+    def a_indices(columna: np.ndarray):
+        posiciones = np.minimum(np.searchsorted(ids_ordenados, columna), total_equipos - 1)
+        return orden_ids[posiciones], ids_ordenados[posiciones] == columna
+
+    indice_local, local_valido = a_indices(partidos[:, 0])
+    indice_visitante, visitante_valido = a_indices(partidos[:, 1])
+    validos = local_valido & visitante_valido
+    indice_local, indice_visitante = indice_local[validos], indice_visitante[validos]
+    goles_local, goles_visitante = partidos[validos, 2], partidos[validos, 3]
+
+    def contar(indices: np.ndarray, pesos: Optional[np.ndarray] = None) -> np.ndarray:
+        # bincount con pesos suma en float64: exacto mientras los totales no pasen de 2**53
+        return np.bincount(indices, weights=pesos, minlength=total_equipos).astype(np.int64)
+
+    gana_local = goles_local > goles_visitante
+    gana_visitante = goles_local < goles_visitante
+    empate = ~(gana_local | gana_visitante)
+
+    partidos_jugados = contar(indice_local) + contar(indice_visitante)
+    goles_a_favor = contar(indice_local, goles_local) + contar(indice_visitante, goles_visitante)
+    goles_en_contra = contar(indice_local, goles_visitante) + contar(indice_visitante, goles_local)
+    victorias = contar(indice_local[gana_local]) + contar(indice_visitante[gana_visitante])
+    empates = contar(indice_local[empate]) + contar(indice_visitante[empate])
+    derrotas = contar(indice_local[gana_visitante]) + contar(indice_visitante[gana_local])
+    puntos = 3 * victorias + empates
+    diferencia_goles = goles_a_favor - goles_en_contra
+
+    columnas = {
+        "puntos": puntos.tolist(),
+        "partidos_jugados": partidos_jugados.tolist(),
+        "victorias": victorias.tolist(),
+        "empates": empates.tolist(),
+        "derrotas": derrotas.tolist(),
+        "goles_a_favor": goles_a_favor.tolist(),
+        "goles_en_contra": goles_en_contra.tolist(),
+        "diferencia_goles": diferencia_goles.tolist(),
+    }
+    nombres = np.array([equipo[1] for equipo in equipos], dtype=str)
+    grupos = np.array([Grupos(equipo[2]).value for equipo in equipos], dtype=str)
+
+    for grupo in Grupos:
+        miembros = np.flatnonzero(grupos == grupo.value)
+        if miembros.size == 0:
+            continue
+        # lexsort usa la última clave como principal: Puntos, DG, GF (desc) y Nombre (asc)
+        orden = miembros[np.lexsort((
+            nombres[miembros],
+            -goles_a_favor[miembros],
+            -diferencia_goles[miembros],
+            -puntos[miembros],
+        ))]
+        for indice in orden.tolist():
+            equipo_id, nombre, grupo_equipo, logo_url = equipos[indice]
+            reporte_por_grupos[grupo].append(PosicionEquipoReporte(
+                id=equipo_id, nombre=nombre, grupo=grupo_equipo, logo_url=logo_url,
+                **{campo: valores[indice] for campo, valores in columnas.items()},
+            ))
+    return reporte_por_grupos
+
+
+async def calcular_reporte_por_grupos_vectorizado(session: AsyncSession) -> Dict[Grupos, List[PosicionEquipoReporte]]:
+    """
+    Calcula la tabla de posiciones desde cero cargando solo las columnas necesarias
+    (sin objetos ORM) y acumulando con NumPy.
+    """
+    equipos_query = await session.execute(
+        select(EquipoSQL.id, EquipoSQL.nombre, EquipoSQL.grupo, EquipoSQL.logo_url).where(EquipoSQL.esta_activo == True)
+    )
+    partidos_query = await session.execute(
+        select(PartidoSQL.equipo_local_id, PartidoSQL.equipo_visitante_id, PartidoSQL.goles_local,
+               PartidoSQL.goles_visitante).where(PartidoSQL.esta_activo == True)
+    )
+    return tabla_posiciones_numpy(equipos_query.all(), np.array(partidos_query.all(), dtype=np.int64))
+
+
+async def calcular_reporte_por_grupos(session: AsyncSession) -> Dict[Grupos, List[PosicionEquipoReporte]]:
+    """
+    Calcula la tabla de posiciones recorriendo todos los partidos activos.
+    Se conserva como referencia para verificar la tabla materializada.
+    """
+    print("DEBUG (operations): Generando reporte por grupos...")
+
+    # Obtener todos los equipos activos con sus IDs
+    equipos_query = await session.execute(
+        select(EquipoSQL.id, EquipoSQL.nombre, EquipoSQL.grupo, EquipoSQL.logo_url).where(EquipoSQL.esta_activo == True)
+    )
+    equipos_activos = equipos_query.all()
+
+    # Obtener todos los partidos activos
+    partidos_query = await session.execute(
+        select(PartidoSQL)
+        .where(PartidoSQL.esta_activo == True)
+        .options(selectinload(PartidoSQL.equipo_local), selectinload(PartidoSQL.equipo_visitante))
+    )
+    partidos_activos: List[PartidoSQL] = partidos_query.scalars().all()
+
+    reporte_por_grupos = tabla_posiciones_python(equipos_activos, partidos_activos)
 
     print("DEBUG (operations): Reporte por grupos generado y ordenado.")
     return reporte_por_grupos
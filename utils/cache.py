@@ -0,0 +1,383 @@
+'''
+Caché de lecturas costosas (reportes) compartible entre workers.
+
+    CACHE_BACKEND=memoria   # por defecto: un diccionario LRU por proceso
+    CACHE_BACKEND=redis     # CACHE_REDIS_URL, p. ej. redis://localhost:6379/0
+
+Las entradas se agrupan en espacios ("reportes", "equipos"). Cada espacio tiene un número de versión;
+invalidarlo solo sube ese número, y una entrada vale únicamente si se guardó con la versión vigente.
+Así un cálculo que empezó antes de una escritura nunca deja un valor viejo como si fuera nuevo.
+
+Los espacios afectados por las tablas escritas (ver utils/transacciones.py) se invalidan cuando
+confirma la transacción principal. Con Redis la invalidación
+además se publica en un canal, para que cada worker descarte sus cachés en memoria (ver al_invalidar).
+Si Redis no está al arrancar o se corta el canal, la app sigue (las lecturas calculan sin caché) y la
+escucha reintenta en segundo plano; al reconectar avisa a los oyentes de que pudo perderse cualquier
+invalidación. python -m utils.verificar_cache_redis lo comprueba contra fakeredis o un redis-server.
+
+    CACHE_REDIS_LATIDO              # segundos sin mensajes antes de un PING al canal (por defecto 5)
+    CACHE_REDIS_REINTENTO_MAXIMO    # espera máxima entre reconexiones, en segundos (por defecto 30)
+'''
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union, get_args, get_origin
+
+from pydantic import TypeAdapter
+from sqlmodel import SQLModel
+
+from utils.transacciones import despues_de_confirmar, sesion_primaria
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria").lower()
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+CACHE_PREFIJO = os.getenv("CACHE_PREFIJO", "copa")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_MAXIMO_ENTRADAS = int(os.getenv("CACHE_MAXIMO_ENTRADAS", "1000"))
+CACHE_REDIS_LATIDO = float(os.getenv("CACHE_REDIS_LATIDO", "5"))
+CACHE_REDIS_REINTENTO_MAXIMO = float(os.getenv("CACHE_REDIS_REINTENTO_MAXIMO", "30"))
+
+ESPACIO_REPORTES = "reportes"
+ESPACIO_EQUIPOS = "equipos"
+ESPACIOS = (ESPACIO_REPORTES, ESPACIO_EQUIPOS)
+
+# Qué espacios deja obsoletos una escritura en cada tabla; las tablas no listadas afectan a los reportes
+ESPACIOS_POR_TABLA: Dict[str, Set[str]] = {
+    "equiposql": {ESPACIO_REPORTES, ESPACIO_EQUIPOS},
+    "eventopartidosql": set(),
+    "snapshotagregadossql": set(),
+    "versiondatossql": set(),
+}
+_ESPACIOS_POR_DEFECTO = {ESPACIO_REPORTES}
+
+OyenteInvalidacion = Callable[[List[str], bool], None]
+
+
+class BackendCache:
+    """
+    Interfaz de los backends. obtener() retorna (valor o None, versión vigente del espacio) en una
+    sola ida al almacenamiento; guardar() recibe esa versión y descarta el valor si ya cambió.
+    """
+
+    def __init__(self):
+        self._oyentes: List[OyenteInvalidacion] = []
+
+    async def obtener(self, espacio: str, clave: str) -> Tuple[Optional[bytes], int]:
+        raise NotImplementedError
+
+    async def guardar(self, espacio: str, clave: str, valor: bytes, version: int, ttl: int) -> None:
+        raise NotImplementedError
+
+    async def invalidar(self, espacios: List[str]) -> None:
+        raise NotImplementedError
+
+    async def iniciar(self) -> None:
+        pass
+
+    async def cerrar(self) -> None:
+        pass
+
+    def al_invalidar(self, oyente: OyenteInvalidacion) -> OyenteInvalidacion:
+        """Registra oyente(espacios, propio); 'propio' es False si la invalidación vino de otro worker."""
+        self._oyentes.append(oyente)
+        return oyente
+
+    def _notificar(self, espacios: List[str], propio: bool) -> None:
+        for oyente in self._oyentes:
+            oyente(espacios, propio)
+
+
+class BackendMemoria(BackendCache):
+    def __init__(self, maximo_entradas: int = CACHE_MAXIMO_ENTRADAS):
+        super().__init__()
+        self.maximo_entradas = maximo_entradas
+        self._versiones: Dict[str, int] = {}
+        # (espacio, clave) -> (versión, vence_en, valor), en orden de uso para desalojar la más antigua
+        self._entradas: "OrderedDict[Tuple[str, str], Tuple[int, float, bytes]]" = OrderedDict()
+
+    async def obtener(self, espacio: str, clave: str) -> Tuple[Optional[bytes], int]:
+        version = self._versiones.get(espacio, 0)
+        entrada = self._entradas.get((espacio, clave))
+        if entrada is None or entrada[0] != version or entrada[1] < time.monotonic():
+            return None, version
+        self._entradas.move_to_end((espacio, clave))
+        return entrada[2], version
+
+    async def guardar(self, espacio: str, clave: str, valor: bytes, version: int, ttl: int) -> None:
+        if version != self._versiones.get(espacio, 0):
+            return
+        self._entradas[(espacio, clave)] = (version, time.monotonic() + ttl, valor)
+        self._entradas.move_to_end((espacio, clave))
+        while len(self._entradas) > self.maximo_entradas:
+            self._entradas.popitem(last=False)
+
+    async def invalidar(self, espacios: List[str]) -> None:
+        for espacio in espacios:
+            self._versiones[espacio] = self._versiones.get(espacio, 0) + 1
+        # Las entradas viejas ya no se leen; se quitan para no ocupar lugar hasta que las desaloje el LRU
+        for llave in [llave for llave in self._entradas if llave[0] in espacios]:
+            del self._entradas[llave]
+        self._notificar(espacios, propio=True)
+
+
+class BackendRedis(BackendCache):
+    """
+    Versión en '<prefijo>:version:<espacio>' (INCR al invalidar) y cada valor en '<prefijo>:<espacio>:<clave>'
+    como b'<versión>:<json>'. Se puede pasar un cliente ya creado (p. ej. fakeredis) en lugar de la URL.
+    """
+
+    def __init__(self, url: str = CACHE_REDIS_URL, cliente=None, prefijo: str = CACHE_PREFIJO,
+                 latido: float = CACHE_REDIS_LATIDO, reintento_maximo: float = CACHE_REDIS_REINTENTO_MAXIMO):
+        super().__init__()
+        if cliente is None:
+            import redis.asyncio as redis  # Solo hace falta con este backend
+            cliente = redis.from_url(url)
+        self._cliente = cliente
+        self._prefijo = prefijo
+        self._canal = f"{prefijo}:invalidaciones"
+        self._origen = uuid.uuid4().hex
+        self._latido = latido
+        self._reintento_maximo = reintento_maximo
+        self._pubsub = None
+        self._escucha: Optional[asyncio.Task] = None
+        self.conectado = asyncio.Event()  # Suscrito al canal de invalidaciones
+        self.reconexiones = 0
+
+    def _clave_version(self, espacio: str) -> str:
+        return f"{self._prefijo}:version:{espacio}"
+
+    def _clave(self, espacio: str, clave: str) -> str:
+        return f"{self._prefijo}:{espacio}:{clave}"
+
+    async def obtener(self, espacio: str, clave: str) -> Tuple[Optional[bytes], int]:
+        version, valor = await self._cliente.mget(self._clave_version(espacio), self._clave(espacio, clave))
+        version = int(version or 0)
+        if valor is None:
+            return None, version
+        guardada, _, datos = valor.partition(b":")
+        return (datos if int(guardada) == version else None), version
+
+    async def guardar(self, espacio: str, clave: str, valor: bytes, version: int, ttl: int) -> None:
+        await self._cliente.set(self._clave(espacio, clave), b"%d:%s" % (version, valor), ex=ttl)
+
+    async def invalidar(self, espacios: List[str]) -> None:
+        async with self._cliente.pipeline(transaction=True) as pipe:
+            for espacio in espacios:
+                pipe.incr(self._clave_version(espacio))
+            pipe.publish(self._canal, json.dumps({"origen": self._origen, "espacios": espacios}))
+            await pipe.execute()
+        self._notificar(espacios, propio=True)
+
+    async def iniciar(self) -> None:
+        # No espera a Redis: si está caído la app arranca igual y la escucha se suscribe cuando vuelva
+        self._escucha = asyncio.create_task(self._escuchar())
+
+    async def _escuchar(self) -> None:
+        espera = 0.0
+        while True:
+            try:
+                self._pubsub = self._cliente.pubsub()
+                await self._pubsub.subscribe(self._canal)
+                if espera:
+                    self.reconexiones += 1
+                    print("DEBUG (cache): canal de invalidaciones reconectado.")
+                    # Mientras no hubo canal pudieron perderse invalidaciones de otros workers
+                    self._notificar(list(ESPACIOS), propio=False)
+                espera = 0.0
+                self.conectado.set()
+                while True:
+                    mensaje = await self._pubsub.get_message(timeout=self._latido)
+                    if mensaje is None:
+                        await self._pubsub.ping()  # Una conexión cortada sin aviso solo se nota al escribir
+                    elif mensaje["type"] == "message":
+                        self._recibir(mensaje["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.conectado.clear()
+                espera = min(max(espera * 2, 0.5), self._reintento_maximo)
+                print(f"ADVERTENCIA (cache): sin canal de invalidaciones ({e}); reintento en {espera:.1f} s.")
+                await self._cerrar_pubsub()
+                await asyncio.sleep(espera)
+
+    def _recibir(self, datos: bytes) -> None:
+        try:
+            datos = json.loads(datos)
+            origen, espacios = datos["origen"], datos["espacios"]
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"ADVERTENCIA (cache): mensaje de invalidación ilegible: {e}")
+            return
+        if origen != self._origen:
+            self._notificar(espacios, propio=False)
+
+    async def _cerrar_pubsub(self) -> None:
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass  # La conexión ya estaba rota
+
+    async def cerrar(self) -> None:
+        if self._escucha is not None:
+            self._escucha.cancel()
+            await asyncio.gather(self._escucha, return_exceptions=True)
+            self._escucha = None
+        await self._cerrar_pubsub()
+        await self._cliente.aclose()
+
+
+def _es_tabla(tipo) -> bool:
+    return isinstance(tipo, type) and issubclass(tipo, SQLModel) and bool(tipo.model_config.get("table"))
+
+
+class CodecJSON:
+    """
+    Serializa con pydantic. Los modelos table=True no se validan al leer con TypeAdapter (quedarían
+    strings en vez de Enum/datetime), así que esos se reconstruyen con model_validate.
+    """
+
+    def __init__(self, tipo):
+        self._adaptador = TypeAdapter(tipo)
+        self._modelo = None
+        self._forma = None
+        argumentos = [argumento for argumento in get_args(tipo) if argumento is not type(None)]
+        if _es_tabla(tipo):
+            self._modelo, self._forma = tipo, "uno"
+        elif get_origin(tipo) in (list, List) and argumentos and _es_tabla(argumentos[0]):
+            self._modelo, self._forma = argumentos[0], "lista"
+        elif get_origin(tipo) is Union and len(argumentos) == 1 and _es_tabla(argumentos[0]):
+            self._modelo, self._forma = argumentos[0], "opcional"
+
+    def codificar(self, valor) -> bytes:
+        return self._adaptador.dump_json(valor)
+
+    def decodificar(self, datos: bytes):
+        if self._modelo is None:
+            return self._adaptador.validate_json(datos)
+        crudo = json.loads(datos)
+        if self._forma == "lista":
+            return [self._modelo.model_validate(fila) for fila in crudo]
+        if crudo is None:
+            return None
+        return self._modelo.model_validate(crudo)
+
+
+class Cache:
+    def __init__(self, backend: BackendCache):
+        self.backend = backend
+        self.aciertos = 0
+        self.fallos = 0
+        self.errores = 0
+        self.invalidaciones = 0
+
+    async def obtener_o_calcular(self, espacio: str, clave: str, calcular: Callable[[], Awaitable[Any]],
+                                 codec: CodecJSON, ttl: int = CACHE_TTL):
+        # Si el backend falla (Redis caído) se calcula igual: la caché nunca tumba una lectura
+        try:
+            datos, version = await self.backend.obtener(espacio, clave)
+        except Exception as e:
+            self.errores += 1
+            print(f"ADVERTENCIA (cache): no se pudo leer '{clave}': {e}")
+            return await calcular()
+        if datos is not None:
+            self.aciertos += 1
+            return codec.decodificar(datos)
+        self.fallos += 1
+        valor = await calcular()
+        try:
+            await self.backend.guardar(espacio, clave, codec.codificar(valor), version, ttl)
+        except Exception as e:
+            self.errores += 1
+            print(f"ADVERTENCIA (cache): no se pudo guardar '{clave}': {e}")
+        return valor
+
+    async def invalidar(self, *espacios: str) -> None:
+        try:
+            await self.backend.invalidar(sorted(set(espacios)))
+            self.invalidaciones += 1
+        except Exception as e:
+            self.errores += 1
+            print(f"ADVERTENCIA (cache): no se pudo invalidar {sorted(set(espacios))}: {e}")
+
+    def al_invalidar(self, oyente: OyenteInvalidacion) -> OyenteInvalidacion:
+        return self.backend.al_invalidar(oyente)
+
+    async def iniciar(self) -> None:
+        # Como las lecturas: sin caché la app funciona igual, así que un fallo al iniciar no impide arrancar
+        try:
+            await self.backend.iniciar()
+        except Exception as e:
+            self.errores += 1
+            print(f"ADVERTENCIA (cache): no se pudo iniciar {type(self.backend).__name__}: {e}")
+
+    async def cerrar(self) -> None:
+        await self.backend.cerrar()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        total = self.aciertos + self.fallos
+        return {
+            "backend": type(self.backend).__name__,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else None,
+            "errores": self.errores,
+            "invalidaciones": self.invalidaciones,
+            # Solo con Redis: si el canal de invalidaciones está suscrito y cuántas veces se recuperó
+            "canal_conectado": self.backend.conectado.is_set() if hasattr(self.backend, "conectado") else None,
+            "reconexiones": getattr(self.backend, "reconexiones", None),
+        }
+
+
+def crear_backend() -> BackendCache:
+    if CACHE_BACKEND == "redis":
+        return BackendRedis(CACHE_REDIS_URL)
+    if CACHE_BACKEND != "memoria":
+        print(f"ADVERTENCIA (cache): CACHE_BACKEND='{CACHE_BACKEND}' no reconocido; se usa 'memoria'.")
+    return BackendMemoria()
+
+
+CACHE = Cache(crear_backend())
+
+
+def clave_de_llamada(funcion, args, kwargs) -> str:
+    return f"{funcion.__name__}:{json.dumps([args, kwargs], default=str, sort_keys=True)}"
+
+
+def cacheado(espacio: str, tipo, ttl: int = CACHE_TTL):
+    """
+    Decora una lectura async (session, *args). La clave sale del nombre de la función y los argumentos;
+    la sesión no forma parte de ella. La función original queda en .sin_cache.
+    Si falta, se calcula con la sesión primaria aunque la petición lea de la réplica: lo guardado lo leen
+    todos los workers, y una réplica atrasada lo dejaría con los datos de antes de la última escritura.
+    """
+    codec = CodecJSON(tipo)
+
+    def decorador(funcion):
+        @wraps(funcion)
+        async def envoltura(session, *args, **kwargs):
+            clave = clave_de_llamada(funcion, args, kwargs)
+            primaria = sesion_primaria(session)
+            return await CACHE.obtener_o_calcular(espacio, clave, lambda: funcion(primaria, *args, **kwargs),
+                                                  codec, ttl)
+
+        envoltura.sin_cache = funcion
+        return envoltura
+
+    return decorador
+
+
+def _espacios_de_tabla(nombre: Optional[str]) -> Set[str]:
+    if nombre is None:  # Sentencia sin tabla conocida: se invalida todo
+        return {ESPACIO_REPORTES, ESPACIO_EQUIPOS}
+    return ESPACIOS_POR_TABLA.get(nombre, _ESPACIOS_POR_DEFECTO)
+
+
+@despues_de_confirmar
+async def _invalidar_confirmados(session, tablas) -> None:
+    espacios = set().union(*(_espacios_de_tabla(tabla) for tabla in tablas))
+    if espacios:
+        await CACHE.invalidar(*espacios)
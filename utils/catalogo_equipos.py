@@ -0,0 +1,134 @@
+'''
+Catálogo en memoria de los equipos activos (id, nombre, país, grupo, logo) para los selectores de
+los formularios, que antes recorrían la tabla de equipos en cada página.
+
+Las operaciones que cambian un equipo anotan el cambio en la sesión con registrar_cambio_equipo();
+el catálogo solo se parchea cuando la transacción principal confirma, y si hay rollback se descarta
+entero para que la próxima lectura lo recargue de la base.
+'''
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Grupos, Paises
+from utils.cache import CACHE, ESPACIO_EQUIPOS
+
+MAXIMO_EQUIPOS_CATALOGO = int(os.getenv("MAXIMO_EQUIPOS_CATALOGO", "2000"))
+_PENDIENTES = "catalogo_equipos_pendientes"
+
+
+class EquipoCatalogo(NamedTuple):
+    id: int
+    nombre: str
+    pais: Paises
+    grupo: Grupos
+    logo_url: Optional[str]
+
+
+class CatalogoEquipos:
+    def __init__(self, maximo: int = MAXIMO_EQUIPOS_CATALOGO):
+        self.maximo = maximo
+        self._equipos: Optional[Dict[int, EquipoCatalogo]] = None
+        self._lista: Optional[tuple] = None
+        # Cambia con cada parche o invalidación: una carga que empezó antes no pisa datos más nuevos
+        self.generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def listar(self) -> Optional[List[EquipoCatalogo]]:
+        """Equipos activos ordenados por id, o None si el catálogo no está cargado."""
+        if self._equipos is None:
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        if self._lista is None:
+            self._lista = tuple(sorted(self._equipos.values()))
+        return list(self._lista)
+
+    def cargar(self, equipos: List[EquipoCatalogo], generacion: int) -> None:
+        # Por encima del máximo no se guarda nada: el catálogo nunca ocupa más que 'maximo' entradas
+        if generacion != self.generacion or len(equipos) > self.maximo:
+            return
+        self._equipos = {equipo.id: equipo for equipo in equipos}
+        self._lista = None
+
+    def aplicar(self, cambios: List[tuple]) -> None:
+        """Aplica (id, EquipoCatalogo) o (id, None) en orden; None quita el equipo."""
+        self.generacion += 1
+        if self._equipos is None:
+            return
+        for equipo_id, entrada in cambios:
+            if entrada is None:
+                self._equipos.pop(equipo_id, None)
+            else:
+                self._equipos[equipo_id] = entrada
+        self._lista = None
+        if len(self._equipos) > self.maximo:
+            self.invalidar()
+
+    def invalidar(self) -> None:
+        self.generacion += 1
+        self._equipos = None
+        self._lista = None
+        self.invalidaciones += 1
+
+    def estadisticas(self) -> Dict[str, object]:
+        total = self.aciertos + self.fallos
+        return {
+            "cargado": self._equipos is not None,
+            "equipos": len(self._equipos) if self._equipos is not None else 0,
+            "maximo": self.maximo,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else None,
+            "invalidaciones": self.invalidaciones,
+        }
+
+
+CATALOGO_EQUIPOS = CatalogoEquipos()
+
+
+def _como_enum(enum, valor):
+    # Los formularios asignan strings; la base devuelve el Enum. Un valor inválido lo rechaza el flush.
+    try:
+        return enum(valor)
+    except ValueError:
+        return valor
+
+
+def entrada_catalogo(equipo) -> Optional[EquipoCatalogo]:
+    if not equipo.esta_activo:
+        return None
+    return EquipoCatalogo(equipo.id, equipo.nombre, _como_enum(Paises, equipo.pais),
+                          _como_enum(Grupos, equipo.grupo), equipo.logo_url)
+
+
+def registrar_cambio_equipo(session, equipo) -> None:
+    """Anota el estado actual del equipo (ya con id) para aplicarlo al catálogo cuando se confirme."""
+    session.info.setdefault(_PENDIENTES, []).append((equipo.id, entrada_catalogo(equipo)))
+
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_cambios_confirmados(session):
+    if session.in_nested_transaction():
+        return
+    cambios = session.info.pop(_PENDIENTES, None)
+    if cambios:
+        CATALOGO_EQUIPOS.aplicar(cambios)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar_cambios(session, transaccion_previa):
+    # También cubre el rollback de un savepoint: no se sabe qué parte de lo anotado sobrevivió
+    if session.info.pop(_PENDIENTES, None):
+        CATALOGO_EQUIPOS.invalidar()
+
+
+@CACHE.al_invalidar
+def _invalidar_por_otro_worker(espacios, propio):
+    # Los cambios propios ya se parchearon en after_commit; los de otro worker llegan por el canal de la caché
+    if not propio and ESPACIO_EQUIPOS in espacios:
+        CATALOGO_EQUIPOS.invalidar()
@@ -1,11 +1,16 @@
 '''Este es el archivo con la conexión a la DB.'''
 import os
+import time
 from dotenv import load_dotenv
+from fastapi import Depends, Request, Response
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
 from sqlmodel import SQLModel
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
+from utils.transacciones import vincular_primaria
+
 load_dotenv()
 CLEVER_DB=(
     f"postgresql+asyncpg://{os.getenv('CLEVER_USER')}:"
@@ -14,9 +19,109 @@ CLEVER_DB=(
     f"{os.getenv('CLEVER_PORT')}/"
     f"{os.getenv('CLEVER_DATABASE')}"
 )
-DATABASE_URL= "sqlite+aiosqlite:///petsdb.db"
+# DB_BACKEND=sqlite corre la app sobre un archivo SQLite local (sin red), p. ej. para pruebas de carga o un solo nodo
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "sudamericana.db")
+DATABASE_URL= f"sqlite+aiosqlite:///{SQLITE_PATH}"
+
+# ----- Ajustes del engine y del pool (variables de entorno) -----
+def _env_bool(nombre: str, defecto: bool) -> bool:
+    valor = os.getenv(nombre)
+    return defecto if valor is None else valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+def _env_echo():
+    # DB_ECHO=false (por defecto), true (SQL) o debug (SQL y filas devueltas)
+    valor = os.getenv("DB_ECHO", "false").strip().lower()
+    return "debug" if valor == "debug" else valor in ("1", "true", "si", "sí", "yes", "on")
+
+
+DB_ECHO = _env_echo()
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # segundos esperando una conexión libre
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos; -1 para no reciclar
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))  # caché de asyncpg; 0 detrás de pgbouncer
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "60"))
+DB_JIT = os.getenv("DB_JIT", "off")  # consultas cortas: el JIT de PostgreSQL suele costar más de lo que ahorra
+DB_APPLICATION_NAME = os.getenv("DB_APPLICATION_NAME", "dev_sudamericana")
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # workers de uvicorn, para dimensionar el pool
+
+
+def opciones_engine() -> dict:
+    """Argumentos de create_async_engine para asyncpg según la configuración de entorno."""
+    return {
+        "echo": DB_ECHO,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": {
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "command_timeout": DB_COMMAND_TIMEOUT,
+            "server_settings": {"jit": DB_JIT, "application_name": DB_APPLICATION_NAME},
+        },
+    }
+
+
+# PRAGMAs de SQLite, aplicados a cada conexión nueva
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # lectores y un escritor a la vez
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # con WAL, seguro ante caídas del proceso
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # negativo = KiB (64 MiB)
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000")),  # ms esperando el bloqueo de escritura
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",  # como en PostgreSQL
+}
+
+
+def _aplicar_pragmas_sqlite(conexion_dbapi, registro_conexion):
+    cursor = conexion_dbapi.cursor()
+    for pragma, valor in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={valor}")
+    cursor.close()
+
+
+def crear_engine(url: str) -> AsyncEngine:
+    if url.startswith("sqlite"):
+        # Los ajustes de asyncpg no aplican; el tamaño del pool sí
+        motor = create_async_engine(url, echo=DB_ECHO, pool_size=DB_POOL_SIZE,
+                                    max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+        event.listen(motor.sync_engine, "connect", _aplicar_pragmas_sqlite)
+        return motor
+    return create_async_engine(url, **opciones_engine())
 
-engine : AsyncEngine = create_async_engine(CLEVER_DB, echo=True)
+
+def estadisticas_pool(motor: AsyncEngine) -> dict:
+    """Estado actual del pool y cuántas conexiones puede llegar a abrir el despliegue completo."""
+    pool = motor.pool
+    por_worker = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    return {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "desborde": pool.overflow(),
+        "estado": pool.status(),
+        "configuracion": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+            "statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+            "jit": DB_JIT,
+            "application_name": DB_APPLICATION_NAME,
+        },
+        "workers": WEB_CONCURRENCY,
+        "conexiones_maximas_por_worker": por_worker,
+        "conexiones_maximas_totales": por_worker * WEB_CONCURRENCY,
+    }
+
+
+engine : AsyncEngine = crear_engine(DATABASE_URL if DB_BACKEND == "sqlite" else CLEVER_DB)
 async_session =sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 async def init_db():
@@ -25,4 +130,45 @@ async def init_db():
 
 async def get_session():
     async with async_session() as session:
+        yield session
+
+
+# ----- Réplica de lectura (opcional) -----
+# DB_REPLICA_URL: URL completa de la réplica (postgresql+asyncpg://... o sqlite+aiosqlite:///... para pruebas)
+DB_REPLICA_URL = os.getenv("DB_REPLICA_URL")
+# Durante estos segundos tras una escritura, el mismo cliente lee de la primaria (lee lo que acaba de escribir)
+DB_REPLICA_VENTANA_ESCRITURA = float(os.getenv("DB_REPLICA_VENTANA_ESCRITURA", "5"))
+COOKIE_ULTIMA_ESCRITURA = "ultima_escritura"
+
+engine_lectura: AsyncEngine | None = crear_engine(DB_REPLICA_URL) if DB_REPLICA_URL else None
+async_session_lectura = (
+    sessionmaker(engine_lectura, class_=AsyncSession, expire_on_commit=False) if engine_lectura else None
+)
+
+
+def escribio_hace_poco(request: Request) -> bool:
+    try:
+        return time.time() - float(request.cookies.get(COOKIE_ULTIMA_ESCRITURA, "")) < DB_REPLICA_VENTANA_ESCRITURA
+    except ValueError:
+        return False
+
+
+def marcar_escritura(response: Response) -> None:
+    """Deja en el cliente la hora de su última escritura para que sus próximas lecturas vayan a la primaria."""
+    response.set_cookie(COOKIE_ULTIMA_ESCRITURA, f"{time.time():.3f}",
+                        max_age=max(1, int(DB_REPLICA_VENTANA_ESCRITURA) + 1), httponly=True, samesite="lax")
+
+
+async def get_read_session(request: Request, sesion_primaria: AsyncSession = Depends(get_session)):
+    """
+    Sesión para endpoints de solo lectura: usa la réplica si está configurada, salvo que el cliente
+    haya escrito hace menos de DB_REPLICA_VENTANA_ESCRITURA segundos. La sesión primaria no abre
+    conexión hasta usarse, así que pedirla como respaldo no cuesta nada.
+    """
+    if async_session_lectura is None or escribio_hace_poco(request):
+        yield sesion_primaria
+        return
+    async with async_session_lectura() as session:
+        vincular_primaria(session, sesion_primaria)  # Las cachés compartidas se llenan desde la primaria
+        request.state.lectura_replica = True
         yield session
\ No newline at end of file
@@ -0,0 +1,151 @@
+'''Migraciones versionadas del esquema. Se aplican al arrancar la app o desde consola:
+
+    python -m utils.migraciones           # aplica las pendientes
+    python -m utils.migraciones estado    # lista aplicadas y pendientes
+'''
+import asyncio
+import sys
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+TABLA_VERSIONES = "esquema_migraciones"
+# Clave del candado consultivo de PostgreSQL: con varios workers, solo uno migra a la vez
+CANDADO_MIGRACIONES = 20240601
+
+
+def _activo(dialecto: str, columna: str = "esta_activo") -> str:
+    # SQLite solo usa un índice parcial si la consulta repite el mismo término; SQLAlchemy compara con "= 1"
+    return f"{columna} = 1" if dialecto == "sqlite" else columna
+
+
+def _m001_indices_filtros_activos(dialecto: str) -> List[str]:
+    activo = _activo(dialecto)
+    return [
+        # Partidos de un equipo (estadísticas, posiciones, baja de equipo) y agregados por fase
+        f"CREATE INDEX IF NOT EXISTS ix_partidosql_local_activo ON partidosql (equipo_local_id) WHERE {activo}",
+        f"CREATE INDEX IF NOT EXISTS ix_partidosql_visitante_activo ON partidosql (equipo_visitante_id) WHERE {activo}",
+        f"CREATE INDEX IF NOT EXISTS ix_partidosql_fase_activo ON partidosql (fase) WHERE {activo}",
+        # Equipos por país (reportes), por grupo (cubo, posiciones) y por nombre (altas y búsquedas)
+        f"CREATE INDEX IF NOT EXISTS ix_equiposql_pais_activo ON equiposql (pais) WHERE {activo}",
+        f"CREATE INDEX IF NOT EXISTS ix_equiposql_grupo_activo ON equiposql (grupo) WHERE {activo}",
+        f"CREATE INDEX IF NOT EXISTS ix_equiposql_nombre_activo ON equiposql (nombre) WHERE {activo}",
+    ]
+
+
+def _m002_indices_clasificacion(dialecto: str) -> List[str]:
+    # Los índices (esta_activo, estadística) de EquipoSQL: create_all solo los crea en tablas nuevas
+    from models import EstadisticasEquipo
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_equiposql_activo_{e.value} ON equiposql (esta_activo, {e.value})"
+        for e in EstadisticasEquipo
+    ]
+
+
+def _m003_versiones_datos(dialecto: str) -> List[str]:
+    # Filas iniciales de los contadores de ETag; la tabla la crea create_all
+    from utils.versiones import AMBITOS
+    ahora = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")  # UTC como el resto de las fechas, no la zona del servidor
+    return [
+        f"INSERT INTO versiondatossql (ambito, version, updated_at) VALUES ('{ambito}', 0, '{ahora}') "
+        "ON CONFLICT (ambito) DO NOTHING"
+        for ambito in AMBITOS
+    ]
+
+
+def _m004_indices_clasificacion_parciales(dialecto: str) -> List[str]:
+    # Sustituye los de m002 por parciales (estadística, nombre): el mismo orden que el ORDER BY de la clasificación
+    from models import EstadisticasEquipo
+    activo = _activo(dialecto)
+    sentencias = []
+    for e in EstadisticasEquipo:
+        sentencias.append(f"DROP INDEX IF EXISTS ix_equiposql_activo_{e.value}")
+        sentencias.append(
+            f"CREATE INDEX IF NOT EXISTS ix_equiposql_clasificacion_{e.value} ON equiposql ({e.value}, nombre) "
+            f"WHERE {activo}"
+        )
+    return sentencias
+
+
+# (versión, descripción, sentencias por dialecto). Nunca se edita una migración ya publicada: se agrega otra.
+MIGRACIONES: List[Tuple[int, str, Callable[[str], List[str]]]] = [
+    (1, "Índices parciales sobre los filtros por esta_activo", _m001_indices_filtros_activos),
+    (2, "Índices de clasificación (esta_activo, estadística) en equipos existentes", _m002_indices_clasificacion),
+    (3, "Contadores de versión por ámbito para ETag y Last-Modified", _m003_versiones_datos),
+    (4, "Índices de clasificación parciales (estadística, nombre) sobre equipos activos",
+     _m004_indices_clasificacion_parciales),
+]
+
+
+async def _crear_tabla_versiones(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} ("
+        "version INTEGER PRIMARY KEY, descripcion VARCHAR(200) NOT NULL, aplicada_en TIMESTAMP NOT NULL)"
+    ))
+
+
+async def versiones_aplicadas(conn: AsyncConnection) -> set:
+    await _crear_tabla_versiones(conn)
+    result = await conn.execute(text(f"SELECT version FROM {TABLA_VERSIONES}"))
+    return set(result.scalars().all())
+
+
+async def aplicar_migraciones(motor: AsyncEngine) -> List[int]:
+    """Aplica en orden las migraciones pendientes, cada una en su propia transacción. Retorna las aplicadas."""
+    aplicadas: List[int] = []
+    async with motor.connect() as conn:
+        dialecto = conn.dialect.name
+        if dialecto == "postgresql":
+            await conn.execute(text("SELECT pg_advisory_lock(:clave)"), {"clave": CANDADO_MIGRACIONES})
+            await conn.commit()
+        try:
+            async with conn.begin():
+                ya_aplicadas = await versiones_aplicadas(conn)
+            for version, descripcion, sentencias in MIGRACIONES:
+                if version in ya_aplicadas:
+                    continue
+                async with conn.begin():
+                    for sentencia in sentencias(dialecto):
+                        await conn.execute(text(sentencia))
+                    await conn.execute(
+                        text(f"INSERT INTO {TABLA_VERSIONES} (version, descripcion, aplicada_en) "
+                             "VALUES (:version, :descripcion, :aplicada_en)"),
+                        {"version": version, "descripcion": descripcion, "aplicada_en": datetime.utcnow()},
+                    )
+                aplicadas.append(version)
+                print(f"DEBUG (migraciones): Migración {version} aplicada: {descripcion}")
+        finally:
+            if dialecto == "postgresql":
+                await conn.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": CANDADO_MIGRACIONES})
+                await conn.commit()
+    return aplicadas
+
+
+async def estado_migraciones(motor: AsyncEngine) -> List[dict]:
+    async with motor.begin() as conn:
+        ya_aplicadas = await versiones_aplicadas(conn)
+    return [{"version": version, "descripcion": descripcion, "aplicada": version in ya_aplicadas}
+            for version, descripcion, _ in MIGRACIONES]
+
+
+async def _main(argumentos: List[str]) -> None:
+    from sqlmodel import SQLModel
+    import models  # noqa: F401  (registra las tablas en SQLModel.metadata)
+    from utils.connection_db import engine
+
+    if argumentos[:1] == ["estado"]:
+        for migracion in await estado_migraciones(engine):
+            marca = "x" if migracion["aplicada"] else " "
+            print(f"[{marca}] {migracion['version']:03d} {migracion['descripcion']}")
+    else:
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        aplicadas = await aplicar_migraciones(engine)
+        print(f"Migraciones aplicadas: {aplicadas or 'ninguna pendiente'}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,96 @@
+'''
+Caché de páginas HTML ya renderizadas (reportes y listado de partidos).
+
+Cada entrada guarda el cuerpo de una página junto con la versión de los datos con que se renderizó:
+el ETag que calcula la dependencia condicional() de utils/versiones.py a partir de los contadores de
+versiondatossql. Las escrituras suben esos contadores al confirmar, así que una página solo se sirve
+de la caché mientras sus datos no cambiaron, también cuando la escritura la hizo otro worker.
+
+    CACHE_PAGINAS_MAXIMO_BYTES     # techo de memoria de los cuerpos guardados (por defecto 16 MiB)
+    CACHE_PAGINAS_MAXIMO_ENTRADAS  # por defecto 512
+'''
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+
+from utils.versiones import CABECERAS_CONDICIONALES
+
+CACHE_PAGINAS_MAXIMO_BYTES = int(os.getenv("CACHE_PAGINAS_MAXIMO_BYTES", str(16 * 1024 * 1024)))
+CACHE_PAGINAS_MAXIMO_ENTRADAS = int(os.getenv("CACHE_PAGINAS_MAXIMO_ENTRADAS", "512"))
+
+
+class CachePaginas:
+    def __init__(self, maximo_bytes: int = CACHE_PAGINAS_MAXIMO_BYTES,
+                 maximo_entradas: int = CACHE_PAGINAS_MAXIMO_ENTRADAS):
+        self.maximo_bytes = maximo_bytes
+        self.maximo_entradas = maximo_entradas
+        # Una página que ocupe más de un cuarto del techo no se guarda: desalojaría a casi todas las demás
+        self.maximo_por_pagina = maximo_bytes // 4
+        # (plantilla, url) -> (versión, cuerpo), en orden de uso para desalojar la más antigua.
+        # Una sola versión por página: la nueva reemplaza a la vieja en lugar de convivir con ella.
+        self._paginas: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+        self.bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.omitidas = 0
+
+    def obtener(self, llave: Tuple[str, str], version: str) -> Optional[bytes]:
+        entrada = self._paginas.get(llave)
+        if entrada is None or entrada[0] != version:
+            self.fallos += 1
+            return None
+        self.aciertos += 1
+        self._paginas.move_to_end(llave)
+        return entrada[1]
+
+    def guardar(self, llave: Tuple[str, str], version: str, cuerpo: bytes) -> None:
+        self._quitar(llave)
+        if len(cuerpo) > self.maximo_por_pagina:
+            self.omitidas += 1
+            return
+        self._paginas[llave] = (version, cuerpo)
+        self.bytes += len(cuerpo)
+        while self.bytes > self.maximo_bytes or len(self._paginas) > self.maximo_entradas:
+            _, (_, desalojado) = self._paginas.popitem(last=False)
+            self.bytes -= len(desalojado)
+            self.desalojos += 1
+
+    def _quitar(self, llave: Tuple[str, str]) -> None:
+        entrada = self._paginas.pop(llave, None)
+        if entrada is not None:
+            self.bytes -= len(entrada[1])
+
+    def vaciar(self) -> None:
+        self._paginas.clear()
+        self.bytes = 0
+
+    def estadisticas(self) -> Dict[str, object]:
+        total = self.aciertos + self.fallos
+        return {
+            "paginas": len(self._paginas),
+            "bytes": self.bytes,
+            "maximo_bytes": self.maximo_bytes,
+            "maximo_entradas": self.maximo_entradas,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else None,
+            "desalojos": self.desalojos,
+            "omitidas_por_tamano": self.omitidas,
+        }
+
+
+CACHE_PAGINAS = CachePaginas()
+
+
+def version_de_peticion(request: Request) -> Optional[str]:
+    """ETag que dejó condicional() para esta petición, o None si el endpoint no lo calculó."""
+    cabeceras = getattr(request.state, CABECERAS_CONDICIONALES, None)
+    return cabeceras.get("ETag") if cabeceras else None
+
+
+def llave_pagina(request: Request, plantilla: str) -> Tuple[str, str]:
+    # La URL completa: las plantillas arman enlaces con request.url y url_for (host y parámetros incluidos)
+    return plantilla, str(request.url)
@@ -0,0 +1,43 @@
+'''Registro de sentencias preconstruidas para las consultas de una fila que se ejecutan en cada petición.'''
+from functools import wraps
+from typing import Callable, Dict
+
+
+class RegistroSentencias:
+    """
+    Cada sentencia se construye una sola vez, con bindparam() en lugar de valores, y se reutiliza el
+    mismo objeto en todas las llamadas. SQLAlchemy memoriza la clave de caché en el objeto, así que
+    tampoco se vuelve a recorrer el árbol de la consulta para encontrar su forma compilada.
+    """
+
+    def __init__(self):
+        self._sentencias: Dict[str, object] = {}
+        self.aciertos = 0
+        self.fallos = 0
+
+    def registrar(self, construir: Callable[[], object]) -> Callable[[], object]:
+        nombre = construir.__name__
+
+        @wraps(construir)
+        def obtener():
+            sentencia = self._sentencias.get(nombre)
+            if sentencia is None:
+                self.fallos += 1
+                sentencia = self._sentencias[nombre] = construir()
+            else:
+                self.aciertos += 1
+            return sentencia
+
+        return obtener
+
+    def estadisticas(self) -> Dict[str, object]:
+        total = self.aciertos + self.fallos
+        return {
+            "sentencias": sorted(self._sentencias),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / total, 4) if total else None,
+        }
+
+
+SENTENCIAS = RegistroSentencias()
@@ -0,0 +1,146 @@
+'''Unidad de trabajo: una operación de negocio = un commit, con savepoints para las operaciones anidadas.'''
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+_NIVEL = "nivel_unidad_de_trabajo"
+_TABLAS = "tablas_escritas"
+
+# Contadores de la petición HTTP en curso (None fuera de una petición)
+_contadores: ContextVar[Optional[Dict[str, int]]] = ContextVar("contadores_bd", default=None)
+
+
+def iniciar_contadores() -> Dict[str, int]:
+    contadores = {"commits": 0, "refrescos": 0}
+    _contadores.set(contadores)
+    return contadores
+
+
+@event.listens_for(Session, "after_commit")
+def _contar_commit(session):
+    # after_commit también se dispara al liberar un savepoint: solo cuenta la transacción principal
+    contadores = _contadores.get()
+    if contadores is not None and not session.in_nested_transaction():
+        contadores["commits"] += 1
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _contar_refresco(estado):
+    # Consultas que vuelven a leer objetos ya cargados: session.refresh(), atributos expirados, populate_existing
+    contadores = _contadores.get()
+    if contadores is not None and (estado.is_column_load or estado.execution_options.get("populate_existing")):
+        contadores["refrescos"] += 1
+
+
+# Tablas escritas en la transacción (None = sentencia sin tabla conocida, p. ej. text()); las usan
+# los ganchos de commit para saber qué versiones subir y qué cachés invalidar
+def _registrar_tabla(session, tabla: Optional[str]) -> None:
+    session.info.setdefault(_TABLAS, set()).add(tabla)
+
+
+@event.listens_for(Session, "after_flush")
+def _registrar_flush(session, contexto_flush):
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        _registrar_tabla(session, getattr(objeto, "__tablename__", None))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _registrar_sentencia(estado):
+    if estado.is_insert or estado.is_update or estado.is_delete:
+        mapper = estado.bind_mapper
+        _registrar_tabla(estado.session, mapper.local_table.name if mapper is not None else None)
+
+
+def tablas_escritas(session: AsyncSession) -> Set[Optional[str]]:
+    return session.info.get(_TABLAS, set())
+
+
+# Una sesión de la réplica lleva la sesión primaria de la misma petición. Las cachés compartidas entre
+# peticiones (catálogo, reportes, páginas) se llenan solo desde la primaria: una réplica atrasada tras
+# una escritura dejaría guardados los datos de antes con la generación o versión nueva.
+_PRIMARIA = "sesion_primaria"
+
+
+def vincular_primaria(replica: AsyncSession, primaria: AsyncSession) -> None:
+    replica.info[_PRIMARIA] = primaria
+
+
+def sesion_primaria(session: AsyncSession) -> AsyncSession:
+    """La sesión primaria de la petición: la misma 'session' si no es de la réplica."""
+    return session.info.get(_PRIMARIA, session)
+
+
+def lee_de_replica(session: AsyncSession) -> bool:
+    return _PRIMARIA in session.info
+
+
+# Ganchos de la transacción principal: los 'antes' corren dentro de ella (pueden escribir), los 'después'
+# reciben las tablas escritas una vez confirmada (p. ej. para invalidar cachés)
+_antes_de_confirmar: List[Callable[[AsyncSession], Awaitable[None]]] = []
+_tras_confirmar: List[Callable[[AsyncSession, Set[Optional[str]]], Awaitable[None]]] = []
+
+
+def antes_de_confirmar(funcion: Callable[[AsyncSession], Awaitable[None]]):
+    _antes_de_confirmar.append(funcion)
+    return funcion
+
+
+def despues_de_confirmar(funcion: Callable[[AsyncSession, Set[Optional[str]]], Awaitable[None]]):
+    _tras_confirmar.append(funcion)
+    return funcion
+
+
+async def _commit(session: AsyncSession) -> None:
+    for funcion in _antes_de_confirmar:
+        await funcion(session)
+    await session.commit()
+    tablas = session.info.pop(_TABLAS, set())
+    for funcion in _tras_confirmar:
+        await funcion(session, tablas)
+
+
+def en_unidad_de_trabajo(session: AsyncSession) -> bool:
+    return session.info.get(_NIVEL, 0) > 0
+
+
+@asynccontextmanager
+async def unidad_de_trabajo(session: AsyncSession):
+    """
+    Agrupa varias operaciones en una transacción. La unidad más externa hace un único commit al
+    salir (o rollback si hubo error); las anidadas abren un savepoint, así que si fallan solo se
+    deshace su parte y el error sigue hacia quien la abrió.
+    """
+    nivel = session.info.get(_NIVEL, 0)
+    session.info[_NIVEL] = nivel + 1
+    try:
+        if nivel:
+            async with session.begin_nested():
+                yield session
+        else:
+            try:
+                yield session
+                await _commit(session)
+            except BaseException:
+                await session.rollback()
+                raise
+    finally:
+        session.info[_NIVEL] = nivel
+
+
+async def confirmar_cambios(session: AsyncSession, *objetos) -> None:
+    """
+    Cierre de una operación de escritura. Dentro de una unidad de trabajo solo hace flush (el commit
+    lo hace la unidad); fuera de ella hace commit. Los objetos indicados solo se refrescan si la
+    sesión los expira al confirmar; con expire_on_commit=False siguen válidos sin otra consulta.
+    """
+    if en_unidad_de_trabajo(session):
+        await session.flush()
+        return
+    await _commit(session)
+    if session.sync_session.expire_on_commit:
+        for objeto in objetos:
+            await session.refresh(objeto)
@@ -0,0 +1,134 @@
+'''Verificación del backend Redis de la caché con dos "workers" que comparten servidor:
+
+    pip install -r requirements-dev.txt                              # fakeredis
+    python -m utils.verificar_cache_redis                            # contra fakeredis, sin servidor
+    python -m utils.verificar_cache_redis redis://localhost:6379/15  # contra un redis-server (usa un prefijo propio)
+
+Comprueba que una invalidación llega al otro worker y deja sin efecto sus entradas, que la app arranca
+con Redis caído y que la escucha se recupera de un corte avisando a los oyentes. Con fakeredis el corte
+se simula apagando el servidor falso; con un redis-server, cerrando las conexiones pub/sub (CLIENT KILL).
+'''
+import asyncio
+import sys
+import uuid
+from typing import List, Tuple
+
+from utils.cache import ESPACIO_EQUIPOS, ESPACIO_REPORTES, ESPACIOS, BackendRedis, Cache, CodecJSON
+
+LATIDO = 0.2  # Segundos: corto para que los cortes se noten enseguida
+ESPERA_MAXIMA = 5.0
+
+
+class Worker:
+    """Un BackendRedis con su propio cliente, como un proceso de uvicorn, y las invalidaciones que oyó."""
+
+    def __init__(self, crear_cliente, prefijo: str):
+        self.backend = BackendRedis(cliente=crear_cliente(), prefijo=prefijo, latido=LATIDO, reintento_maximo=0.5)
+        self.cache = Cache(self.backend)
+        self.oidas: List[Tuple[List[str], bool]] = []
+        self.backend.al_invalidar(lambda espacios, propio: self.oidas.append((sorted(espacios), propio)))
+
+    async def esperar_conexion(self) -> None:
+        await asyncio.wait_for(self.backend.conectado.wait(), ESPERA_MAXIMA)
+
+    async def esperar_aviso(self, espacios: List[str], propio: bool) -> None:
+        async def oido():
+            while (sorted(espacios), propio) not in self.oidas:
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(oido(), ESPERA_MAXIMA)
+
+
+def _comprobar(condicion: bool, descripcion: str) -> None:
+    if not condicion:
+        raise SystemExit(f"FALLA: {descripcion}")
+    print(f"ok  {descripcion}")
+
+
+async def _calcular(valor):
+    return valor
+
+
+async def invalidacion_entre_workers(a: Worker, b: Worker) -> None:
+    codec = CodecJSON(int)
+    await b.cache.obtener_o_calcular(ESPACIO_REPORTES, "clave", lambda: _calcular(1), codec)
+    _comprobar(await b.cache.obtener_o_calcular(ESPACIO_REPORTES, "clave", lambda: _calcular(2), codec) == 1,
+               "el worker B lee de la caché lo que guardó")
+    await a.cache.invalidar(ESPACIO_REPORTES)
+    await b.esperar_aviso([ESPACIO_REPORTES], propio=False)
+    _comprobar(True, "la invalidación del worker A le llega a B como ajena")
+    _comprobar(([ESPACIO_REPORTES], False) not in a.oidas, "A no recibe su propia invalidación como ajena")
+    _comprobar(await b.cache.obtener_o_calcular(ESPACIO_REPORTES, "clave", lambda: _calcular(3), codec) == 3,
+               "la entrada de B queda obsoleta tras la invalidación de A")
+
+
+async def arranque_con_redis_caido(crear_cliente, servidor, prefijo: str) -> None:
+    servidor.connected = False
+    worker = Worker(crear_cliente, prefijo)
+    await worker.cache.iniciar()
+    _comprobar(True, "la caché inicia con Redis caído sin lanzar")
+    valor = await worker.cache.obtener_o_calcular(ESPACIO_REPORTES, "clave", lambda: _calcular(7), CodecJSON(int))
+    _comprobar(valor == 7 and worker.cache.errores > 0, "con Redis caído las lecturas se calculan sin caché")
+    await asyncio.sleep(LATIDO)  # Que la escucha falle al menos una vez antes de que vuelva Redis
+    servidor.connected = True
+    await worker.esperar_conexion()
+    await worker.esperar_aviso(list(ESPACIOS), propio=False)
+    _comprobar(True, "al volver Redis la escucha se suscribe y avisa que pudo perder invalidaciones")
+    await worker.cache.cerrar()
+
+
+async def recuperacion_tras_corte(a: Worker, b: Worker, servidor, cliente_admin) -> None:
+    b.oidas.clear()
+    if servidor is not None:
+        servidor.connected = False
+        await asyncio.sleep(LATIDO * 3)
+        servidor.connected = True
+    else:
+        await cliente_admin.client_kill_filter(_type="pubsub")
+    await b.esperar_aviso(list(ESPACIOS), propio=False)
+    await b.esperar_conexion()
+    _comprobar(b.backend.reconexiones > 0, "tras el corte la escucha se reconecta y avisa a los oyentes")
+    await a.cache.invalidar(ESPACIO_EQUIPOS)
+    await b.esperar_aviso([ESPACIO_EQUIPOS], propio=False)
+    _comprobar(True, "las invalidaciones vuelven a llegar después de reconectar")
+
+
+async def _main(argumentos: List[str]) -> None:
+    prefijo = f"verificacion-{uuid.uuid4().hex[:8]}"
+    servidor = None
+    if argumentos:
+        import redis.asyncio as redis
+
+        url = argumentos[0]
+        crear_cliente = lambda: redis.from_url(url)  # noqa: E731
+        print(f"Contra {url} (prefijo {prefijo})")
+    else:
+        import fakeredis  # Solo hace falta para esta verificación
+
+        servidor = fakeredis.FakeServer()
+        crear_cliente = lambda: fakeredis.FakeAsyncRedis(server=servidor)  # noqa: E731
+        print("Contra fakeredis")
+
+    cliente_admin = crear_cliente()
+    a, b = Worker(crear_cliente, prefijo), Worker(crear_cliente, prefijo)
+    try:
+        for worker in (a, b):
+            await worker.cache.iniciar()
+            await worker.esperar_conexion()
+        await invalidacion_entre_workers(a, b)
+        await recuperacion_tras_corte(a, b, servidor, cliente_admin)
+        if servidor is not None:
+            await arranque_con_redis_caido(crear_cliente, servidor, prefijo)
+        else:
+            print("--  arranque con Redis caído: solo con fakeredis")
+    finally:
+        await a.cache.cerrar()
+        await b.cache.cerrar()
+        claves = [clave async for clave in cliente_admin.scan_iter(f"{prefijo}:*")]
+        if claves:
+            await cliente_admin.delete(*claves)
+        await cliente_admin.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main(sys.argv[1:]))
@@ -0,0 +1,160 @@
+'''
+Versiones de los datos por ámbito para las peticiones condicionales (ETag / Last-Modified).
+
+Cada commit que escribe en una tabla sube después, en una transacción propia y corta, el contador de
+los ámbitos que esa tabla alimenta. Las lecturas comparan If-None-Match / If-Modified-Since con esos
+contadores (una consulta por clave primaria) y responden 304 sin consultar ni renderizar nada más.
+
+El contador no se sube dentro de la transacción de datos: el UPDATE de versiondatossql bloquearía esas
+filas hasta el commit y todas las escrituras de un mismo ámbito quedarían en fila. A cambio, entre el
+commit de los datos y la subida hay una ventana de milisegundos en la que una lectura puede ver datos
+nuevos con la versión anterior; la siguiente revalidación, ya con la versión nueva, los vuelve a pedir.
+'''
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from fastapi import Depends, Request
+from sqlalchemy import select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models import VersionDatosSQL
+from utils.transacciones import despues_de_confirmar
+
+AMBITO_EQUIPOS = "equipos"
+AMBITO_PARTIDOS = "partidos"
+AMBITO_REPORTES = "reportes"
+AMBITOS = (AMBITO_EQUIPOS, AMBITO_PARTIDOS, AMBITO_REPORTES)
+
+# Qué ámbitos cambian con una escritura en cada tabla; las tablas no listadas no afectan a ninguno
+AMBITOS_POR_TABLA: Dict[str, Set[str]] = {
+    "equiposql": {AMBITO_EQUIPOS, AMBITO_REPORTES},
+    "partidosql": {AMBITO_PARTIDOS, AMBITO_REPORTES},
+    "posiciongruposql": {AMBITO_REPORTES},
+    "reporteporpaissql": {AMBITO_REPORTES},
+    "reporteporfasesql": {AMBITO_REPORTES},
+    "cuboestadisticassql": {AMBITO_REPORTES},
+}
+
+# Forma parte del ETag: al desplegar plantillas nuevas, APP_VERSION distinto invalida lo que tengan los clientes
+SEMILLA_ETAG = os.getenv("APP_VERSION", "1")
+CABECERAS_CONDICIONALES = "cabeceras_condicionales"
+
+
+class NoModificado(Exception):
+    """El cliente ya tiene la versión vigente; main.py la convierte en un 304 sin cuerpo."""
+
+    def __init__(self, cabeceras: Dict[str, str]):
+        super().__init__("304 Not Modified")
+        self.cabeceras = cabeceras
+
+
+def ambitos_de_tablas(tablas: Iterable[Optional[str]]) -> Set[str]:
+    ambitos: Set[str] = set()
+    for tabla in tablas:
+        # None: sentencia sin tabla conocida, se asume que cambió todo
+        ambitos |= set(AMBITOS) if tabla is None else AMBITOS_POR_TABLA.get(tabla, set())
+    return ambitos
+
+
+@despues_de_confirmar
+async def subir_versiones(session: AsyncSession, tablas) -> None:
+    ambitos = ambitos_de_tablas(tablas)
+    if not ambitos:
+        return
+    # Conexión propia del engine: una transacción de una sola sentencia, fuera de la de los datos (y sin
+    # contar como otro commit de la petición). Siempre en el mismo orden, para no bloquearse cruzadas.
+    try:
+        async with session.bind.begin() as conexion:
+            await conexion.execute(
+                update(VersionDatosSQL)
+                .where(VersionDatosSQL.ambito.in_(sorted(ambitos)))
+                .values(version=VersionDatosSQL.version + 1, updated_at=datetime.utcnow())
+            )
+    except Exception as e:
+        # Los datos ya están confirmados: la escritura no falla, pero hasta la próxima los ETag no cambian
+        print(f"ADVERTENCIA: no se pudieron subir las versiones de {sorted(ambitos)}: {e}")
+
+
+async def obtener_versiones(session: AsyncSession, ambitos: Iterable[str]) -> Optional[List[tuple]]:
+    """(ámbito, versión, updated_at) ordenados por ámbito, o None si falta alguna fila (migración pendiente)."""
+    ambitos = sorted(set(ambitos))
+    result = await session.execute(
+        select(VersionDatosSQL.ambito, VersionDatosSQL.version, VersionDatosSQL.updated_at)
+        .where(VersionDatosSQL.ambito.in_(ambitos))
+        .order_by(VersionDatosSQL.ambito)
+    )
+    filas = [tuple(fila) for fila in result.all()]
+    return filas if len(filas) == len(ambitos) else None
+
+
+def _etag_coincide(if_none_match: str, etag: str) -> bool:
+    # Comparación débil (RFC 9110): se ignora el prefijo W/
+    if if_none_match.strip() == "*":
+        return True
+    propio = etag.removeprefix("W/")
+    return any(candidato.strip().removeprefix("W/") == propio for candidato in if_none_match.split(","))
+
+
+def _siguiente_segundo(fecha: datetime) -> datetime:
+    # Last-Modified tiene resolución de segundos: se redondea hacia arriba (estrictamente), así una
+    # escritura posterior en el mismo segundo nunca queda "antes" de la fecha que ya tiene el cliente
+    return fecha.replace(microsecond=0) + timedelta(seconds=1)
+
+
+def _no_modificado_desde(if_modified_since: str, ultima_modificacion: datetime, ahora: datetime) -> bool:
+    try:
+        desde = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if desde.tzinfo is None:
+        desde = desde.replace(tzinfo=timezone.utc)
+    # Una fecha posterior a la hora del servidor no vale como validador (RFC 9110, 13.1.3)
+    return ultima_modificacion <= desde <= ahora
+
+
+async def responder_304_si_no_cambio(request: Request, session: AsyncSession, ambitos: Iterable[str]) -> None:
+    """
+    Lanza NoModificado si el cliente ya tiene la versión vigente; si no, deja ETag y Last-Modified
+    en request.state para que el middleware los agregue a la respuesta.
+    """
+    versiones = await obtener_versiones(session, ambitos)
+    if versiones is None:
+        return  # Sin contadores no hay forma segura de decir "no cambió": respuesta normal, sin cabeceras
+    etag = 'W/"' + "-".join([SEMILLA_ETAG, *(f"{ambito}.{version}" for ambito, version, _ in versiones)]) + '"'
+    ultima_modificacion = _siguiente_segundo(max(fecha for _, _, fecha in versiones).replace(tzinfo=timezone.utc))
+    ahora = datetime.now(timezone.utc)
+    cabeceras = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",  # Se puede guardar, pero hay que revalidar en cada uso
+    }
+    # Mientras no termine el segundo de la última escritura puede llegar otra con la misma fecha
+    # redondeada: en ese lapso no se anuncia Last-Modified y solo valida el ETag
+    if ultima_modificacion <= ahora:
+        cabeceras["Last-Modified"] = format_datetime(ultima_modificacion, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:  # If-None-Match manda sobre If-Modified-Since
+        no_cambio = _etag_coincide(if_none_match, etag)
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        no_cambio = if_modified_since is not None and _no_modificado_desde(if_modified_since, ultima_modificacion, ahora)
+    if no_cambio:
+        raise NoModificado(cabeceras)
+    setattr(request.state, CABECERAS_CONDICIONALES, cabeceras)
+
+
+def condicional(*ambitos: str, lectura: bool = True):
+    """
+    Dependencia para dependencies=[...]: corta con 304 antes de ejecutar el endpoint. Usa la misma sesión
+    que el endpoint (lectura=False para los que leen de la primaria).
+    """
+    from utils.connection_db import get_read_session, get_session  # operations importa este módulo sin el engine
+
+    obtener_sesion = get_read_session if lectura else get_session
+
+    async def dependencia(request: Request, session: AsyncSession = Depends(obtener_sesion)):
+        await responder_304_si_no_cambio(request, session, ambitos)
+
+    return Depends(dependencia)
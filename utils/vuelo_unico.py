@@ -0,0 +1,119 @@
+'''
+Cálculos coalescidos ("single flight"): si varias peticiones piden el mismo reporte con los mismos
+parámetros mientras se está calculando, solo la primera lo calcula y las demás esperan su resultado.
+
+Los vuelos se agrupan por generación. Cada commit con escrituras (propio, o de otro worker avisado por
+la caché) abre una generación nueva, así que quien llega después de una escritura nunca se suma a un
+cálculo que empezó antes de ella.
+
+El resultado se comparte tal cual entre las peticiones coalescidas: no hay que modificarlo.
+'''
+import asyncio
+import os
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from utils.cache import CACHE, clave_de_llamada
+from utils.transacciones import despues_de_confirmar
+
+MAXIMO_CLAVES_METRICAS = int(os.getenv("MAXIMO_CLAVES_VUELO_UNICO", "256"))
+
+
+class _LiderCancelado(Exception):
+    """El cálculo compartido se canceló junto con la petición que lo hacía; cada espera calcula por su cuenta."""
+
+
+class VueloUnico:
+    def __init__(self, maximo_claves_metricas: int = MAXIMO_CLAVES_METRICAS):
+        self.maximo_claves_metricas = maximo_claves_metricas
+        self.generacion = 0
+        self._en_vuelo: Dict[Tuple[str, int], asyncio.Future] = {}
+        # Por clave: vuelos (cálculos hechos), coalescidas (esperas que se sumaron a uno), reintentos
+        # (esperas cuyo líder se canceló) y el máximo de esperas en un mismo vuelo
+        self._metricas: "OrderedDict[str, Dict[str, int]]" = OrderedDict()
+        self._esperas: Dict[Tuple[str, int], int] = {}
+
+    def _metricas_de(self, clave: str) -> Dict[str, int]:
+        metricas = self._metricas.get(clave)
+        if metricas is None:
+            metricas = self._metricas[clave] = {"vuelos": 0, "coalescidas": 0, "reintentos": 0, "maximo_esperas": 0}
+            while len(self._metricas) > self.maximo_claves_metricas:
+                self._metricas.popitem(last=False)
+        self._metricas.move_to_end(clave)
+        return metricas
+
+    async def ejecutar(self, clave: str, calcular: Callable[[], Awaitable[Any]]):
+        metricas = self._metricas_de(clave)
+        llave = (clave, self.generacion)
+        futuro = self._en_vuelo.get(llave)
+        if futuro is not None:
+            metricas["coalescidas"] += 1
+            self._esperas[llave] += 1
+            metricas["maximo_esperas"] = max(metricas["maximo_esperas"], self._esperas[llave])
+            try:
+                # shield: si se cancela esta espera, el cálculo sigue para el líder y las demás
+                return await asyncio.shield(futuro)
+            except _LiderCancelado:
+                metricas["reintentos"] += 1
+                return await self.ejecutar(clave, calcular)
+
+        futuro = asyncio.get_running_loop().create_future()
+        self._en_vuelo[llave] = futuro
+        self._esperas[llave] = 0
+        metricas["vuelos"] += 1
+        try:
+            valor = await calcular()
+        except BaseException as e:
+            # La cancelación del líder no se contagia: las esperas reintentan en lugar de cancelarse
+            futuro.set_exception(_LiderCancelado() if isinstance(e, asyncio.CancelledError) else e)
+            futuro.exception()  # Queda marcada como recuperada aunque nadie la espere: sin avisos en el log
+            raise
+        else:
+            futuro.set_result(valor)
+            return valor
+        finally:
+            del self._en_vuelo[llave]
+            del self._esperas[llave]
+
+    def nueva_generacion(self) -> None:
+        self.generacion += 1
+
+    def estadisticas(self) -> Dict[str, Any]:
+        return {
+            "generacion": self.generacion,
+            "en_vuelo": len(self._en_vuelo),
+            "vuelos": sum(metricas["vuelos"] for metricas in self._metricas.values()),
+            "coalescidas": sum(metricas["coalescidas"] for metricas in self._metricas.values()),
+            "por_clave": {clave: dict(metricas) for clave, metricas in self._metricas.items()},
+        }
+
+
+VUELO_UNICO = VueloUnico()
+
+
+def coalescido(funcion):
+    """
+    Decora una lectura async (session, *args) con la misma clave que cacheado(). Va por encima de
+    @cacheado, así las peticiones simultáneas comparten también la consulta a la caché. Las esperas
+    reciben el resultado calculado con la sesión del líder.
+    """
+
+    @wraps(funcion)
+    async def envoltura(session, *args, **kwargs):
+        clave = clave_de_llamada(funcion, args, kwargs)
+        return await VUELO_UNICO.ejecutar(clave, lambda: funcion(session, *args, **kwargs))
+
+    return envoltura
+
+
+@despues_de_confirmar
+async def _generacion_por_escritura(session, tablas) -> None:
+    if tablas:
+        VUELO_UNICO.nueva_generacion()
+
+
+@CACHE.al_invalidar
+def _generacion_por_otro_worker(espacios, propio):
+    if not propio:
+        VUELO_UNICO.nueva_generacion()